@@ -7,6 +7,8 @@ CHUNK_SIZE=${2:-1000}
 CHUNK_DIGITS=${3:-6}
 CASE_SENSITIVE=${4:-false}
 FILE_PATTERN=${5:-'*.txt'}
+QUERY=${6:-}
+FULL_DETAIL=${7:-false}
 
 SOURCE_DIR=$(readlink -f "$SOURCE_DIR")
 if [ ! -d "$SOURCE_DIR" ]; then
@@ -24,6 +26,12 @@ if ! [[ "$CHUNK_DIGITS" =~ ^[0-9]+$ ]] || [ "$CHUNK_DIGITS" -le 0 ]; then
     exit 1
 fi
 
+# Single-quoted YAML scalar; a quote inside the value is written twice
+yaml_quote() {
+    local value=$1
+    printf "'%s'" "${value//\'/\'\'}"
+}
+
 WORK_DIR=$(pwd)
 FILE_LIST_DIR="$WORK_DIR/file_lists"
 INPUT_DIR="$WORK_DIR/inputs"
@@ -33,8 +41,16 @@ mkdir -p "$FILE_LIST_DIR" "$INPUT_DIR"
 
 MASTER_LIST="$FILE_LIST_DIR/all_files.txt"
 
-echo "Collecting files matching pattern $FILE_PATTERN under $SOURCE_DIR ..."
-find "$SOURCE_DIR" -type f -name "$FILE_PATTERN" | sort > "$MASTER_LIST"
+# Shards written by the move stage (storage: shard) are listed from their indexes, one row per paper,
+# so no paper is touched here; the shard column is made absolute for the filter runner. Flat files
+# (storage: files, e.g. left by earlier runs into the same directory) are listed alongside; the shards,
+# their indexes and unpublished temporaries are not papers themselves
+echo "Collecting files matching pattern $FILE_PATTERN and shard members under $SOURCE_DIR ..."
+{
+    find "$SOURCE_DIR" -type f -name "$FILE_PATTERN" ! -name '*.tar' ! -name '*.idx.tsv' ! -name '.*.part' | sort
+    find "$SOURCE_DIR" -type f -name '*.idx.tsv' -print0 | sort -z \
+        | xargs -0 -r awk -F'\t' -v OFS='\t' '{ dir = FILENAME; sub(/\/[^\/]*$/, "", dir); $2 = dir "/" $2; print }'
+} > "$MASTER_LIST"
 
 if [ ! -s "$MASTER_LIST" ]; then
     echo "Error: No files found in $SOURCE_DIR matching pattern $FILE_PATTERN" >&2
@@ -50,9 +66,13 @@ for chunk_file in "$FILE_LIST_DIR"/chunk_*; do
     yaml_file="$INPUT_DIR/input_${chunk_base}.yaml"
     file_list_abs=$(readlink -f "$chunk_file")
     cat > "$yaml_file" <<EOL
-file_list: '$file_list_abs'
+file_list: $(yaml_quote "$file_list_abs")
 case_sensitive: $CASE_SENSITIVE
+full_detail: $FULL_DETAIL
 EOL
+    if [ -n "$QUERY" ]; then
+        echo "query: $(yaml_quote "$QUERY")" >> "$yaml_file"
+    fi
     echo "Created $yaml_file"
 done
 
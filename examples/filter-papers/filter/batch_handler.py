@@ -0,0 +1,66 @@
+"""In-process equivalent of ``run_one_batch.sh`` for ``src/run_batch.py``.
+
+``run_input`` parses one input YAML and calls ``run_keyword_search`` directly,
+so a task's chunks share one interpreter (and its imports and compiled keyword
+matcher) instead of starting two ``python3`` processes per chunk. Outputs and
+``info.txt`` are the same as from ``run_one_batch.sh``.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+from keyword_filter_runner import default_workers, load_input_spec, run_keyword_search
+from run_metrics import RunMetrics
+
+
+def run_input(input_spec: Path, output_dir: Path) -> None:
+    if not input_spec.is_file():
+        raise FileNotFoundError(f"Input spec {input_spec} not found")
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    config = load_input_spec(input_spec)
+    file_list = config.get("file_list", "")
+    case_sensitive = config.get("case_sensitive", "false").lower()
+    query = config.get("query", "")
+    full_detail = config.get("full_detail", "false").lower()
+    if not file_list or not os.path.isfile(file_list):
+        raise FileNotFoundError(f"File list {file_list} missing or unreadable")
+
+    # Optional per-chunk result cache that survives reruns (outputs are wiped on setup)
+    cache_path = None
+    cache_dir = os.environ.get("FILTER_CACHE_DIR", "")
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_path = Path(cache_dir, os.path.basename(file_list) + ".sqlite").expanduser().resolve()
+
+    metrics = RunMetrics(output_dir / "metrics.jsonl", "keyword_filter_runner")
+    try:
+        run_keyword_search(
+            Path(file_list).expanduser().resolve(),
+            output_dir.expanduser().resolve(),
+            case_sensitive in {"1", "true", "yes", "on"},
+            workers=default_workers(),
+            cache_path=cache_path,
+            query=query or None,
+            full_detail=full_detail in {"1", "true", "yes", "on"},
+            output_format=os.environ.get("FILTER_OUTPUT_FORMAT") or "json",
+            metrics=metrics,
+        )
+    except BaseException:
+        metrics.write("error")
+        raise
+    metrics.write()
+
+    (output_dir / "info.txt").write_text(
+        f"Keyword batch completed at {time.strftime('%a %b %e %H:%M:%S %Z %Y')}\n"
+        f"Input spec: {input_spec}\n"
+        f"File list: {file_list}\n"
+        f"Case sensitive: {case_sensitive}\n"
+        f"Query: {query or 'any category'}\n"
+        f"Full detail: {full_detail}\n",
+        encoding="utf-8",
+    )
+    print(f"Completed keyword filtering for {file_list}")
@@ -0,0 +1,339 @@
+"""Throughput benchmark for the keyword filter on a reproducible synthetic corpus.
+
+``generate`` writes a corpus from a seed, with control over file count, the
+file-size distribution (log-normal around a median) and keyword density,
+including phrase terms and case variants. ``run`` scans that corpus once per
+matcher mode, each in a fresh process, and reports files/s, MB/s, peak RSS and
+per-phase timings (read, lowercase, match, write). Results are saved as JSON so
+runs can be compared over time with ``--compare``.
+
+Modes:
+    per-term   the original loop: one word-boundary regex per term per file
+    whole      KeywordMatcher over the whole file
+    stream     KeywordMatcher over fixed-size windows
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import math
+import multiprocessing
+import platform
+import random
+import re
+import resource
+import string
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from queue import Empty
+from typing import Iterable
+
+from keyword_filter import DEFAULT_WINDOW_SIZE, PK_KEYWORDS, KeywordMatcher
+from keyword_filter_runner import load_file_list, write_outputs
+
+MODES = ("per-term", "whole", "stream")
+PHASES = ("read", "lowercase", "match", "write")
+
+
+def generate_corpus(
+    corpus_dir: Path,
+    files: int = 1000,
+    seed: int = 0,
+    median_kb: float = 40.0,
+    size_sigma: float = 1.0,
+    density: float = 0.002,
+    case_variant_rate: float = 0.3,
+    keywords: dict[str, list[str]] = PK_KEYWORDS,
+) -> Path:
+    """
+    Write a reproducible synthetic corpus and the file list that points at it.
+
+    Args:
+        corpus_dir: Directory to write ``paper_XXXXXX.txt`` files and ``file_list.txt`` into
+        files: Number of files
+        seed: Random seed; the same arguments always produce the same corpus
+        median_kb: Median file size in KiB
+        size_sigma: Sigma of the log-normal file-size distribution
+        density: Probability that any given word is a keyword term (phrases included)
+        case_variant_rate: Fraction of inserted terms written upper-, lower- or title-cased
+        keywords: Keyword dictionary to draw terms from
+
+    Returns:
+        Path of the written file list
+    """
+    rng = random.Random(seed)
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    terms = [term for category_terms in keywords.values() for term in category_terms]
+    filler = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 10))) for _ in range(5000)]
+    separators = [" "] * 12 + ["\n", ", ", ". ", " (", ") "]
+    variants = (str.upper, str.lower, str.title)
+
+    paths: list[str] = []
+    for index in range(files):
+        target = int(rng.lognormvariate(math.log(median_kb * 1024), size_sigma))
+        parts: list[str] = []
+        size = 0
+        while size < target:
+            if rng.random() < density:
+                word = rng.choice(terms)
+                if rng.random() < case_variant_rate:
+                    word = rng.choice(variants)(word)
+            else:
+                word = rng.choice(filler)
+            parts.append(word)
+            parts.append(rng.choice(separators))
+            size += len(word) + 1
+        path = corpus_dir / f"paper_{index:06d}.txt"
+        path.write_text("".join(parts), encoding="utf-8")
+        paths.append(str(path))
+
+    file_list = corpus_dir / "file_list.txt"
+    file_list.write_text("\n".join(paths) + "\n", encoding="utf-8")
+    return file_list
+
+
+class _PhaseTimer:
+    def __init__(self) -> None:
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+
+class _TimedMatcher(KeywordMatcher):
+    """KeywordMatcher that charges lowercasing and matching to their phases."""
+
+    def __init__(self, keywords: dict[str, list[str]], case_sensitive: bool, timer: _PhaseTimer) -> None:
+        super().__init__(keywords, case_sensitive)
+        self.timer = timer
+
+    def prepare(self, content: str) -> str:
+        with self.timer.phase("lowercase"):
+            return super().prepare(content)
+
+    def find_forms(self, text, pending=None, start=0, end=None, stop=None):
+        with self.timer.phase("match"):
+            return super().find_forms(text, pending, start, end, stop)
+
+
+class _TimedHandle:
+    def __init__(self, handle, timer: _PhaseTimer) -> None:
+        self.handle = handle
+        self.timer = timer
+
+    def read(self, size: int = -1) -> str:
+        with self.timer.phase("read"):
+            return self.handle.read(size)
+
+
+def _per_term_search(content: str, keywords: dict[str, list[str]], case_sensitive: bool,
+                     timer: _PhaseTimer) -> dict[str, list[str]]:
+    """The search loop keyword_filter used before KeywordMatcher, kept as a baseline."""
+    with timer.phase("lowercase"):
+        content_lower = content if case_sensitive else content.lower()
+    found: dict[str, list[str]] = {category: [] for category in keywords}
+    with timer.phase("match"):
+        for category, terms in keywords.items():
+            for term in terms:
+                search_term = term if case_sensitive else term.lower()
+                pattern = r"\b" + re.escape(search_term) + r"\b"
+                if re.search(pattern, content_lower, re.IGNORECASE if not case_sensitive else 0):
+                    found[category].append(term)
+    return found
+
+
+def _run_mode(mode: str, file_list: str, output_dir: str, case_sensitive: bool, window_size: int) -> dict:
+    """Scan the corpus once in ``mode``; runs in its own process so peak RSS is per mode."""
+    timer = _PhaseTimer()
+    matcher = _TimedMatcher(PK_KEYWORDS, case_sensitive, timer)
+    candidates = load_file_list(Path(file_list))
+    results: dict[str, dict[str, list[str]]] = {}
+    total_bytes = 0
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    for candidate in candidates:
+        total_bytes += candidate.stat().st_size
+        with open(candidate, "r", encoding="utf-8", errors="ignore") as handle:
+            if mode == "stream":
+                found = matcher.results_for(matcher.find_forms_stream(_TimedHandle(handle, timer), window_size=window_size))
+            else:
+                with timer.phase("read"):
+                    content = handle.read()
+                if mode == "per-term":
+                    found = _per_term_search(content, PK_KEYWORDS, case_sensitive, timer)
+                else:
+                    found = matcher.results_for(matcher.find_forms(matcher.prepare(content)))
+        if any(found[category] for category in found):
+            results[str(candidate)] = found
+
+    with timer.phase("write"), contextlib.redirect_stdout(io.StringIO()):
+        mode_dir = Path(output_dir) / mode
+        mode_dir.mkdir(parents=True, exist_ok=True)
+        write_outputs(results, mode_dir, len(candidates), [])
+    elapsed = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "files": len(candidates),
+        "bytes": total_bytes,
+        "matches": len(results),
+        "seconds": elapsed,
+        "cpu_seconds": time.process_time() - cpu_start,
+        "files_per_second": len(candidates) / elapsed if elapsed else 0.0,
+        "mb_per_second": total_bytes / 1e6 / elapsed if elapsed else 0.0,
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "phases": timer.seconds,
+        "results_digest": hashlib.sha256(json.dumps(results, sort_keys=True).encode("utf-8")).hexdigest(),
+    }
+
+
+def _mode_worker(queue, *args) -> None:
+    queue.put(_run_mode(*args))
+
+
+def run_benchmark(
+    file_list: Path,
+    output_dir: Path,
+    modes: Iterable[str] = MODES,
+    case_sensitive: bool = False,
+    window_size: int = DEFAULT_WINDOW_SIZE,
+) -> dict:
+    """Run every mode in a fresh process and collect the measurements."""
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for mode in modes:
+        queue = context.Queue()
+        process = context.Process(
+            target=_mode_worker,
+            args=(queue, mode, str(file_list), str(output_dir), case_sensitive, window_size),
+        )
+        process.start()
+        while True:
+            try:
+                runs.append(queue.get(timeout=1))
+                break
+            except Empty:
+                if not process.is_alive():
+                    raise RuntimeError(f"Benchmark mode {mode!r} exited with code {process.exitcode}")
+        process.join()
+
+    digests = {run["results_digest"] for run in runs}
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "host": platform.node(),
+        "file_list": str(file_list),
+        "case_sensitive": case_sensitive,
+        "window_size": window_size,
+        "results_agree": len(digests) <= 1,
+        "runs": runs,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_report(report: dict, baseline: dict | None = None) -> str:
+    previous = {run["mode"]: run for run in baseline["runs"]} if baseline else {}
+    lines = [
+        f"{'mode':<9} {'files/s':>9} {'MB/s':>7} {'RSS MB':>7} "
+        + " ".join(f"{phase + ' s':>11}" for phase in PHASES)
+        + ("  vs baseline" if baseline else "")
+    ]
+    for run in report["runs"]:
+        line = (
+            f"{run['mode']:<9} {run['files_per_second']:>9.1f} {run['mb_per_second']:>7.2f} {run['peak_rss_mb']:>7.1f} "
+            + " ".join(f"{run['phases'][phase]:>11.3f}" for phase in PHASES)
+        )
+        if run["mode"] in previous and previous[run["mode"]]["files_per_second"]:
+            line += f"  {run['files_per_second'] / previous[run['mode']]['files_per_second']:.2f}x"
+        lines.append(line)
+    if not report["results_agree"]:
+        lines.append("WARNING: modes produced different results")
+    return "\n".join(lines)
+
+
+def parse_args(argv: Iterable[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark keyword filter throughput on a synthetic corpus.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate = subparsers.add_parser("generate", help="Write a reproducible synthetic corpus.")
+    generate.add_argument("--corpus-dir", required=True)
+    generate.add_argument("--files", type=int, default=1000)
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--median-kb", type=float, default=40.0, help="Median file size in KiB.")
+    generate.add_argument("--size-sigma", type=float, default=1.0, help="Log-normal sigma of file sizes.")
+    generate.add_argument("--density", type=float, default=0.002, help="Probability that a word is a keyword term.")
+    generate.add_argument("--case-variants", type=float, default=0.3, help="Fraction of terms with altered case.")
+
+    run = subparsers.add_parser("run", help="Benchmark each matcher mode on a corpus.")
+    run.add_argument("--file-list", required=True, help="File list written by 'generate' (or any chunk list).")
+    run.add_argument("--output-dir", default="benchmark_outputs", help="Where each mode writes its results.")
+    run.add_argument("--modes", default=",".join(MODES), help=f"Comma separated subset of {', '.join(MODES)}.")
+    run.add_argument("--case-sensitive", action="store_true")
+    run.add_argument("--window-size", type=int, default=DEFAULT_WINDOW_SIZE)
+    run.add_argument("--save", default=None, help="Write the measurements to this JSON file.")
+    run.add_argument("--compare", default=None, help="Earlier saved JSON to compare throughput against.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Iterable[str] | None = None) -> None:
+    args = parse_args(argv)
+    if args.command == "generate":
+        file_list = generate_corpus(
+            Path(args.corpus_dir),
+            files=args.files,
+            seed=args.seed,
+            median_kb=args.median_kb,
+            size_sigma=args.size_sigma,
+            density=args.density,
+            case_variant_rate=args.case_variants,
+        )
+        print(f"Wrote {args.files} files; file list at {file_list}")
+        return
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = sorted(set(modes) - set(MODES))
+    if unknown:
+        sys.exit(f"Unknown modes: {', '.join(unknown)}")
+    report = run_benchmark(
+        Path(args.file_list).expanduser().resolve(),
+        Path(args.output_dir).expanduser().resolve(),
+        modes,
+        args.case_sensitive,
+        args.window_size,
+    )
+    baseline = json.loads(Path(args.compare).read_text(encoding="utf-8")) if args.compare else None
+    print(format_report(report, baseline))
+    if args.save:
+        Path(args.save).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Saved measurements to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Boolean queries over keyword categories, e.g. ``compartment AND (modeling OR parameters) AND NOT kinetics``.
+
+A category is true for a file when any of its terms matches. ``AND``, ``OR`` and
+``NOT`` (any case) combine categories, with ``NOT`` binding tightest and ``AND``
+tighter than ``OR``; parentheses group. Evaluation is three-valued so a scan can
+stop as soon as the outcome no longer depends on the rest of the text.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Callable, Optional, Union
+
+from keyword_filter import KeywordMatcher
+
+# ('cat', name) | ('not', node) | ('and', [nodes]) | ('or', [nodes])
+Node = tuple
+
+_TOKEN = re.compile(r"\(|\)|[^\s()]+")
+_OPERATORS = {"AND", "OR", "NOT"}
+
+
+class QueryError(ValueError):
+    """Raised for malformed queries or unknown category names."""
+
+
+class _Parser:
+    def __init__(self, expression: str, categories: set[str]) -> None:
+        self.tokens = _TOKEN.findall(expression)
+        self.position = 0
+        self.categories = categories
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _keyword(self) -> Optional[str]:
+        token = self._peek()
+        return token.upper() if token is not None and token.upper() in _OPERATORS else None
+
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise QueryError("Empty query")
+        node = self._or()
+        if self._peek() is not None:
+            raise QueryError(f"Unexpected token {self._peek()!r}")
+        return node
+
+    def _or(self) -> Node:
+        nodes = [self._and()]
+        while self._keyword() == "OR":
+            self.position += 1
+            nodes.append(self._and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def _and(self) -> Node:
+        nodes = [self._not()]
+        while self._keyword() == "AND":
+            self.position += 1
+            nodes.append(self._not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def _not(self) -> Node:
+        if self._keyword() == "NOT":
+            self.position += 1
+            return ("not", self._not())
+        return self._atom()
+
+    def _atom(self) -> Node:
+        token = self._peek()
+        if token is None:
+            raise QueryError("Query ended unexpectedly")
+        self.position += 1
+        if token == "(":
+            node = self._or()
+            if self._peek() != ")":
+                raise QueryError("Missing closing parenthesis")
+            self.position += 1
+            return node
+        if token == ")" or token.upper() in _OPERATORS:
+            raise QueryError(f"Unexpected token {token!r}")
+        if token not in self.categories:
+            raise QueryError(f"Unknown category {token!r}; expected one of {', '.join(sorted(self.categories))}")
+        return ("cat", token)
+
+
+def _evaluate(node: Node, matched: set[str], complete: bool) -> Optional[bool]:
+    kind = node[0]
+    if kind == "cat":
+        if node[1] in matched:
+            return True
+        return False if complete else None
+    if kind == "not":
+        value = _evaluate(node[1], matched, complete)
+        return None if value is None else not value
+    values = [_evaluate(child, matched, complete) for child in node[1]]
+    decisive = kind == "or"
+    if decisive in values:
+        return decisive
+    return None if None in values else not decisive
+
+
+def _categories(node: Node) -> set[str]:
+    if node[0] == "cat":
+        return {node[1]}
+    if node[0] == "not":
+        return _categories(node[1])
+    return set().union(*(_categories(child) for child in node[1]))
+
+
+class CategoryQuery:
+    """Parsed boolean query over the categories of a keyword dictionary."""
+
+    def __init__(self, expression: str, keywords: dict[str, list[str]]) -> None:
+        self.expression = expression
+        self.tree = _Parser(expression, set(keywords)).parse()
+        self.categories = _categories(self.tree)
+
+    def evaluate(self, matched: set[str], complete: bool = True) -> Optional[bool]:
+        """
+        Evaluate against the categories matched so far.
+
+        Args:
+            matched: Categories with at least one matching term
+            complete: Whether the whole text has been scanned; if not, unmatched
+                categories are unknown rather than false
+
+        Returns:
+            True or False once decided, or None while the outcome depends on unseen text
+        """
+        return _evaluate(self.tree, matched, complete)
+
+    def stopper(self, matcher: KeywordMatcher, already_found: Union[set, frozenset] = frozenset()) -> Callable[[set], bool]:
+        """Early-exit callback for the matcher: True once the outcome is decided."""
+        return lambda found: self.evaluate(matcher.categories_for(already_found | found), complete=False) is not None
+
+
+def parse_query(expression: Optional[str], keywords: dict[str, list[str]]) -> Optional[CategoryQuery]:
+    """Parse ``expression`` (None or blank means no query)."""
+    if expression is None or not expression.strip():
+        return None
+    return CategoryQuery(expression, keywords)
@@ -1,7 +1,11 @@
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, TextIO, Tuple
 import re
 
+# Characters read per window when streaming large files (about 8 MB of ASCII)
+DEFAULT_WINDOW_SIZE = 8 * 1024 * 1024
+
 # Define keywords related to pharmacokinetic compartment modeling
 PK_KEYWORDS = {
     'compartment': ['compartment', 'compartmental', 'multi-compartment', 'one-compartment', 'two-compartment', 'three-compartment'],
@@ -12,7 +16,222 @@ PK_KEYWORDS = {
     'distribution': ['central compartment', 'peripheral compartment', 'distribution phase', 'elimination phase']
 }
 
-def search_file_for_keywords(file_path: Path, keywords: Dict[str, List[str]], case_sensitive: bool = False) -> Dict[str, List[str]]:
+class KeywordMatcher:
+    """
+    Precompiled matcher that finds every category and term in a single pass.
+
+    All terms are folded into one alternation regex wrapped in a lookahead, so
+    each position of the text is visited once and overlapping matches (e.g.
+    'compartment' inside 'two-compartment') are still reported. When the
+    alternation fires, only the terms that share a prefix with the matched
+    term can also match at that position, so just those are verified with
+    their own compiled pattern. Word-boundary and case rules are the same as
+    the original per-term ``re.search`` loop.
+    """
+
+    def __init__(self, keywords: Dict[str, List[str]], case_sensitive: bool = False):
+        self.keywords = {category: list(terms) for category, terms in keywords.items()}
+        self.case_sensitive = case_sensitive
+        self.flags = 0 if case_sensitive else re.IGNORECASE
+
+        forms: List[str] = []
+        for terms in self.keywords.values():
+            for term in terms:
+                form = self._search_form(term)
+                if form not in forms:
+                    forms.append(form)
+        self.forms = forms
+        self.patterns = {form: re.compile(r'\b' + re.escape(form) + r'\b', self.flags) for form in forms}
+
+        # Longest first so the reported group is the most specific term. Each form gets its own
+        # named group: under IGNORECASE the matched text ('ſ' for 's', 'ı' for 'i') need not equal
+        # any form, so hits are keyed by the group that fired rather than by their text
+        ordered = sorted(forms, key=len, reverse=True)
+        self.group_forms = {f'f{index}': form for index, form in enumerate(ordered)}
+        alternation = '|'.join(
+            rf'(?P<{name}>\b' + re.escape(form) + r'\b)' for name, form in self.group_forms.items()
+        )
+        self.trigger = re.compile(r'(?=' + alternation + r')', self.flags) if forms else None
+        self.related = {form: [other for other in ordered if self._shares_prefix(form, other)] for form in forms}
+
+    def _search_form(self, term: str) -> str:
+        return term if self.case_sensitive else term.lower()
+
+    def _shares_prefix(self, first: str, second: str) -> bool:
+        shorter, longer = sorted((first, second), key=len)
+        return re.fullmatch(re.escape(shorter), longer[:len(shorter)], self.flags) is not None
+
+    def prepare(self, content: str) -> str:
+        """Apply the same case folding to the text that the terms received."""
+        return content if self.case_sensitive else content.lower()
+
+    def find_forms(self, text: str, pending: Optional[set] = None, start: int = 0, end: Optional[int] = None,
+                   stop: Optional[Callable[[set], bool]] = None) -> set:
+        """
+        Return the search forms that occur in an already prepared text.
+
+        Args:
+            text: Text returned by ``prepare``
+            pending: Forms still worth looking for; defaults to every form
+            start: Only report matches that begin at or after this index
+            end: Only report matches that begin before this index
+            stop: Called with the forms found so far after each new find;
+                returning True ends the scan early
+
+        Returns:
+            Set of search forms found in the text
+        """
+        remaining = set(self.forms) if pending is None else set(pending)
+        found = set()
+        if self.trigger is None or not remaining:
+            return found
+        limit = len(text) if end is None else end
+        for hit in self.trigger.finditer(text, start):
+            position = hit.start()
+            if position >= limit:
+                break
+            for form in self.related[self.group_forms[hit.lastgroup]]:
+                if form in remaining and self.patterns[form].match(text, position):
+                    remaining.discard(form)
+                    found.add(form)
+                    if stop is not None and stop(found):
+                        return found
+            if not remaining:
+                break
+        return found
+
+    def results_for(self, found_forms: set) -> Dict[str, List[str]]:
+        """Expand found search forms back into the category -> terms layout."""
+        return {
+            category: [term for term in terms if self._search_form(term) in found_forms]
+            for category, terms in self.keywords.items()
+        }
+
+    def search(self, content: str) -> Dict[str, List[str]]:
+        """
+        Search raw text for every keyword category.
+
+        Args:
+            content: Text to search
+
+        Returns:
+            Dictionary with categories as keys and list of found keywords as values
+        """
+        return self.results_for(self.find_forms(self.prepare(content)))
+
+    def categories_for(self, found_forms: set) -> set:
+        """Names of the categories with at least one found search form."""
+        return {
+            category for category, terms in self.keywords.items()
+            if any(self._search_form(term) in found_forms for term in terms)
+        }
+
+    def forms_for(self, categories: set) -> set:
+        """Search forms belonging to the given categories."""
+        return {self._search_form(term) for category in categories for term in self.keywords.get(category, [])}
+
+    def search_stream(self, handle: TextIO, window_size: int = DEFAULT_WINDOW_SIZE) -> Dict[str, List[str]]:
+        """
+        Search an open text handle window by window with bounded memory.
+
+        Args:
+            handle: Text-mode file object to read from
+            window_size: Number of characters to read per window
+
+        Returns:
+            Dictionary with categories as keys and list of found keywords as values
+        """
+        return self.results_for(self.find_forms_stream(handle, window_size=window_size))
+
+    def find_forms_stream(self, handle: TextIO, pending: Optional[set] = None,
+                          window_size: int = DEFAULT_WINDOW_SIZE,
+                          stop: Optional[Callable[[set], bool]] = None) -> set:
+        """
+        Return the search forms found in an open text handle, one window at a time.
+
+        Consecutive windows overlap by the longest term plus one character, so
+        matches (and their word boundaries) that straddle a window edge are
+        still found. Reading stops early once every pending form has been seen.
+
+        Args:
+            handle: Text-mode file object to read from
+            pending: Forms still worth looking for; defaults to every form
+            window_size: Number of characters to read per window
+            stop: Called with the forms found so far; returning True ends the
+                scan early (see ``find_forms``)
+
+        Returns:
+            Set of search forms found in the handle
+        """
+        remaining = set(self.forms) if pending is None else set(pending)
+        tail = max((len(form) for form in remaining), default=0)
+        window_size = max(window_size, 2 * tail + 1)
+        found = set()
+        buffer = ''
+        start = 0
+
+        while remaining:
+            window = handle.read(window_size)
+            at_end = len(window) < window_size
+            buffer = buffer + self.prepare(window)
+            limit = len(buffer) if at_end else len(buffer) - tail
+            window_stop = None if stop is None else (lambda hits: stop(found | hits))
+            hits = self.find_forms(buffer, remaining, start, limit, window_stop)
+            found |= hits
+            remaining -= hits
+            if at_end or (stop is not None and hits and stop(found)):
+                break
+            # Keep one character before the next start for the leading \b
+            buffer = buffer[limit - 1:]
+            start = 1
+
+        return found
+
+@lru_cache(maxsize=32)
+def _cached_matcher(frozen_keywords: Tuple[Tuple[str, Tuple[str, ...]], ...], case_sensitive: bool) -> KeywordMatcher:
+    return KeywordMatcher({category: list(terms) for category, terms in frozen_keywords}, case_sensitive)
+
+def build_matcher(keywords: Dict[str, List[str]], case_sensitive: bool = False) -> KeywordMatcher:
+    """
+    Return a compiled matcher for a keyword dictionary, reusing earlier builds.
+
+    Args:
+        keywords: Dictionary of keyword categories and their terms
+        case_sensitive: Whether to perform case-sensitive search
+
+    Returns:
+        KeywordMatcher for the given keywords
+    """
+    frozen = tuple((category, tuple(terms)) for category, terms in keywords.items())
+    return _cached_matcher(frozen, case_sensitive)
+
+def scan_file_forms(file_path: Path, matcher: KeywordMatcher, pending: Optional[set] = None,
+                    window_size: Optional[int] = None,
+                    stop: Optional[Callable[[set], bool]] = None) -> set:
+    """
+    Return the matcher's search forms found in a file, letting read errors propagate.
+
+    Args:
+        file_path: Path to the text file
+        matcher: Compiled matcher to search with
+        pending: Forms still worth looking for; defaults to every form
+        window_size: Stream the file in windows of this many characters instead
+            of reading it whole; None or 0 reads the whole file
+        stop: Early-exit callback passed through to the matcher
+
+    Returns:
+        Set of search forms found in the file
+    """
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        if window_size:
+            return matcher.find_forms_stream(f, pending, window_size, stop)
+        content = f.read()
+
+    return matcher.find_forms(matcher.prepare(content), pending, stop=stop)
+
+def search_file_for_keywords(file_path: Path, keywords: Dict[str, List[str]], case_sensitive: bool = False,
+                             matcher: Optional[KeywordMatcher] = None,
+                             window_size: Optional[int] = None) -> Dict[str, List[str]]:
     """
     Search a text file for specified keywords.
 
@@ -20,6 +239,9 @@ def search_file_for_keywords(file_path: Path, keywords: Dict[str, List[str]], ca
         file_path: Path to the text file
         keywords: Dictionary of keyword categories and their terms
         case_sensitive: Whether to perform case-sensitive search
+        matcher: Prebuilt matcher for ``keywords``; built (and cached) if omitted
+        window_size: Stream the file in windows of this many characters instead
+            of reading it whole; None or 0 reads the whole file
 
     Returns:
         Dictionary with categories as keys and list of found keywords as values
@@ -27,23 +249,10 @@ def search_file_for_keywords(file_path: Path, keywords: Dict[str, List[str]], ca
     found_keywords = {category: [] for category in keywords.keys()}
 
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-
-            if not case_sensitive:
-                content_lower = content.lower()
-
-            for category, terms in keywords.items():
-                for term in terms:
-                    search_term = term if case_sensitive else term.lower()
-                    search_content = content if case_sensitive else content_lower
+        if matcher is None:
+            matcher = build_matcher(keywords, case_sensitive)
 
-                    # Use word boundary regex for more accurate matching
-                    pattern = r'\b' + re.escape(search_term) + r'\b'
-                    if re.search(pattern, search_content, re.IGNORECASE if not case_sensitive else 0):
-                        found_keywords[category].append(term)
-
-        return found_keywords
+        return matcher.results_for(scan_file_forms(file_path, matcher, window_size=window_size))
 
     except Exception as e:
         print(f"Error reading {file_path}: {e}")
@@ -71,10 +280,12 @@ def search_directory(root_dir: str, keywords: Dict[str, List[str]],
         print(f"Error: Directory '{root_dir}' does not exist")
         return results
 
+    matcher = build_matcher(keywords, case_sensitive)
+
     # Walk through all subdirectories
     for file_path in root_path.rglob('*'):
         if file_path.is_file() and file_path.suffix.lower() in file_extensions:
-            found = search_file_for_keywords(file_path, keywords, case_sensitive)
+            found = search_file_for_keywords(file_path, keywords, case_sensitive, matcher)
 
             # Only include files that have at least one keyword match
             if any(found[category] for category in found):
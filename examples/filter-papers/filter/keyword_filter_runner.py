@@ -3,46 +3,316 @@
 from __future__ import annotations
 
 import argparse
-import json
+import os
+import stat
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Iterable
+from typing import Callable, Iterable, NamedTuple, Optional
+
+# run_metrics and input_yaml are shared with the framework scripts in src/
+_SRC_DIR = Path(__file__).resolve().parents[3] / "src"
+if str(_SRC_DIR) not in sys.path:
+    sys.path.append(str(_SRC_DIR))
 
 from keyword_filter import (
+    DEFAULT_WINDOW_SIZE,
     PK_KEYWORDS,
+    KeywordMatcher,
+    build_matcher,
     export_results_to_file,
     save_relevant_filenames,
-    search_file_for_keywords,
+    scan_file_forms,
 )
+from category_query import CategoryQuery, parse_query
+from input_yaml import read_input_yaml
+from result_io import RESULT_FORMATS, ResultWriter, write_results
+from run_metrics import RunMetrics
+from scan_cache import CachedScan, ScanCache
+from shard_reader import ShardMember, parse_shard_line, scan_member_forms, shard_available
 
 
-def load_file_list(file_list_path: Path) -> list[Path]:
-    lines: list[Path] = []
+def load_file_list(file_list_path: Path) -> list[Path | ShardMember]:
+    """Paths of a chunk file list; shard index rows (see ``shard_reader``) become ``ShardMember``s."""
+    lines: list[Path | ShardMember] = []
     with file_list_path.open("r", encoding="utf-8") as handle:
         for raw in handle:
             candidate = raw.strip()
             if not candidate:
                 continue
-            lines.append(Path(candidate))
+            member = parse_shard_line(candidate) if "\t" in candidate else None
+            lines.append(member or Path(candidate))
     return lines
 
 
-def run_keyword_search(file_list: Path, output_dir: Path, case_sensitive: bool) -> dict[str, dict[str, list[str]]]:
+def load_input_spec(input_spec: Path) -> dict[str, str]:
+    """``key: value`` pairs of an input YAML (comments and surrounding quotes stripped)."""
+    return read_input_yaml(input_spec)
+
+
+def default_workers() -> int:
+    """This sim's share of the task's CPUs (``SIM_CPUS`` from run.sh), else the CPUs SLURM granted, else 1."""
+    for name in ("SIM_CPUS", "SLURM_CPUS_PER_TASK"):
+        value = os.environ.get(name, "")
+        if value.isdigit() and int(value) > 0:
+            return int(value)
+    return 1
+
+
+class ScanOutcome(NamedTuple):
+    found: dict[str, list[str]] | None  # None marks a file that is not on disk
+    entry: CachedScan | None  # what to write back to the cache, if anything
+    status: str  # cache "hit", "partial" (only new terms scanned), "miss" or "missing"
+    matched: bool
+
+
+class FormMatch(NamedTuple):
+    results: dict[str, list[str]]  # category -> terms found
+    matched: bool
+    found: frozenset  # search forms present in the text
+    evaluated: frozenset  # search forms known to be present or absent (what a cache may keep)
+    pending: frozenset  # forms that were still undecided before this scan
+
+
+# Scans a text for the given forms, calling stop (when set) with the hits so far; returns the forms found
+FormScan = Callable[[set, Optional[Callable[[set], bool]]], set]
+
+
+def match_forms(
+    scan: FormScan,
+    matcher: KeywordMatcher,
+    query: CategoryQuery | None = None,
+    full_detail: bool = False,
+    found: frozenset = frozenset(),
+    evaluated: frozenset = frozenset(),
+) -> FormMatch:
+    """Scan for the forms not yet decided and apply the any-category rule or ``query``.
+
+    ``found`` and ``evaluated`` carry what an earlier scan of the same text
+    (a cache entry) already knows. With a query and without ``full_detail``
+    only the queried categories are searched and the scan stops once the
+    query outcome is decided, so the returned terms may be a subset of
+    everything the text contains.
+    """
+    hits = set(found)
+    pending = frozenset(matcher.forms) - evaluated - hits
+    short_circuit = query is not None and not full_detail
+    if short_circuit:
+        pending &= matcher.forms_for(query.categories)
+
+    stopped = False
+    if pending and not (short_circuit and query.evaluate(matcher.categories_for(hits), complete=False) is not None):
+        stopper = query.stopper(matcher, hits) if short_circuit else None
+
+        def stop(new_hits: set) -> bool:
+            nonlocal stopped
+            stopped = stopper(new_hits)
+            return stopped
+
+        hits |= scan(set(pending), stop if stopper else None)
+        if not stopped:
+            evaluated = evaluated | pending
+
+    results = matcher.results_for(hits)
+    if query is None:
+        matched = any(results[category] for category in results)
+    else:
+        complete = not (short_circuit and pending - evaluated)
+        matched = bool(query.evaluate(matcher.categories_for(hits), complete=complete))
+    return FormMatch(results, matched, frozenset(hits), frozenset(evaluated), pending)
+
+
+def match_text(
+    text: str,
+    matcher: KeywordMatcher,
+    query: CategoryQuery | None = None,
+    full_detail: bool = False,
+) -> FormMatch:
+    """``match_forms`` for a text already in memory (e.g. a file read from a stream)."""
+    prepared = matcher.prepare(text)
+    return match_forms(lambda pending, stop: matcher.find_forms(prepared, pending, stop=stop), matcher, query, full_detail)
+
+
+def _scan_candidate(
+    item: tuple[Path | ShardMember, CachedScan | None],
+    case_sensitive: bool,
+    window_size: int | None,
+    query: CategoryQuery | None = None,
+    full_detail: bool = False,
+) -> ScanOutcome:
+    """Search one listed file, reusing a cached scan when the file is unchanged.
+
+    Matching follows ``match_forms``. Shard members take their size and mtime
+    from the index instead of a stat.
+    """
+    candidate, cached = item
+    if isinstance(candidate, ShardMember):
+        if not shard_available(candidate):
+            return ScanOutcome(None, None, "missing", False)
+        size, mtime_ns = candidate.length, candidate.mtime_ns
+    else:
+        try:
+            info = candidate.stat()
+        except OSError:
+            return ScanOutcome(None, None, "missing", False)
+        if not stat.S_ISREG(info.st_mode):
+            return ScanOutcome(None, None, "missing", False)
+        size, mtime_ns = info.st_size, info.st_mtime_ns
+
+    matcher = build_matcher(PK_KEYWORDS, case_sensitive)
+    fresh = cached is not None and (cached.size, cached.mtime_ns) == (size, mtime_ns)
+    if isinstance(candidate, ShardMember):
+        scan = partial(_scan_member, candidate, matcher)
+    else:
+        scan = partial(_scan_file, candidate, matcher, window_size)
+    try:
+        match = match_forms(
+            scan,
+            matcher,
+            query,
+            full_detail,
+            cached.found if fresh else frozenset(),
+            cached.evaluated if fresh else frozenset(),
+        )
+    except Exception as e:
+        print(f"Error reading {candidate}: {e}")
+        return ScanOutcome(matcher.results_for(set()), None, "miss", False)
+    if not fresh:
+        status = "miss"
+    else:
+        status = "partial" if match.pending else "hit"
+    entry = CachedScan(size, mtime_ns, match.evaluated, match.found)
+    return ScanOutcome(match.results, entry, status, match.matched)
+
+
+def _scan_file(
+    path: Path, matcher: KeywordMatcher, window_size: int | None, pending: set, stop: Optional[Callable[[set], bool]]
+) -> set:
+    return scan_file_forms(path, matcher, pending, window_size, stop)
+
+
+def _scan_member(member: ShardMember, matcher: KeywordMatcher, pending: set, stop: Optional[Callable[[set], bool]]) -> set:
+    return scan_member_forms(member, matcher, pending, stop)
+
+
+def _scan_all(
+    items: list[tuple[Path | ShardMember, CachedScan | None]],
+    case_sensitive: bool,
+    window_size: int | None,
+    workers: int,
+    batch_size: int | None,
+    query: CategoryQuery | None = None,
+    full_detail: bool = False,
+) -> Iterable[ScanOutcome]:
+    scan = partial(
+        _scan_candidate,
+        case_sensitive=case_sensitive,
+        window_size=window_size,
+        query=query,
+        full_detail=full_detail,
+    )
+    if workers <= 1 or len(items) <= 1:
+        yield from map(scan, items)
+        return
+    workers = min(workers, len(items))
+    # Several batches per worker keeps the pool busy when file sizes vary
+    chunksize = batch_size or max(1, len(items) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Executor.map yields in submission order, so merging stays deterministic
+        yield from pool.map(scan, items, chunksize=chunksize)
+
+
+def run_keyword_search(
+    file_list: Path,
+    output_dir: Path,
+    case_sensitive: bool,
+    window_size: int | None = DEFAULT_WINDOW_SIZE,
+    workers: int = 1,
+    batch_size: int | None = None,
+    cache_path: Path | None = None,
+    query: str | None = None,
+    full_detail: bool = False,
+    output_format: str = "json",
+    metrics: RunMetrics | None = None,
+) -> dict[str, dict[str, list[str]]]:
+    metrics = metrics or RunMetrics()
     output_dir.mkdir(parents=True, exist_ok=True)
     results: dict[str, dict[str, list[str]]] = {}
     missing_files: list[str] = []
-    candidates = load_file_list(file_list)
+    with metrics.phase("load_file_list"):
+        candidates = load_file_list(file_list)
+    category_query = parse_query(query, PK_KEYWORDS)
+
+    with metrics.phase("cache_load"):
+        cache = ScanCache(cache_path, case_sensitive) if cache_path else None
+        cached = cache.load() if cache else {}
+    items = [(candidate, cached.get(str(candidate))) for candidate in candidates]
+    cache_counts = {"hit": 0, "partial": 0, "miss": 0}
+    updates: list[tuple[str, CachedScan]] = []
+    bytes_scanned = 0
+
+    # Matches are written to the results file as each scan outcome arrives
+    with metrics.phase("scan"), ResultWriter(output_dir, output_format) as writer:
+        for candidate, (found, entry, status, matched) in zip(
+            candidates,
+            _scan_all(items, case_sensitive, window_size, workers, batch_size, category_query, full_detail),
+        ):
+            if found is None:
+                missing_files.append(str(candidate))
+                continue
+            cache_counts[status] += 1
+            if entry is not None and status != "hit":
+                bytes_scanned += entry.size
+            if entry is not None and entry != cached.get(str(candidate)):
+                updates.append((str(candidate), entry))
+            if matched:
+                results[str(candidate)] = found
+                writer.add(str(candidate), found)
+
+    if cache:
+        with metrics.phase("cache_store"):
+            cache.store(updates)
+            cache.close()
+
+    extra_stats = (
+        "Cache hits: {hit}\nCache partial hits: {partial}\nCache misses: {miss}\n".format(**cache_counts)
+        if cache
+        else ""
+    )
+    with metrics.phase("write_outputs"):
+        write_summaries(results, output_dir, len(candidates), missing_files, extra_stats)
+    metrics.count(
+        files_listed=len(candidates),
+        files_processed=len(candidates) - len(missing_files),
+        files_matched=len(results),
+        bytes_scanned=bytes_scanned,
+    )
+
+    return results
+
 
-    for candidate in candidates:
-        if not candidate.is_file():
-            missing_files.append(str(candidate))
-            continue
-        found = search_file_for_keywords(candidate, PK_KEYWORDS, case_sensitive)
-        if any(found[category] for category in found):
-            results[str(candidate)] = found
+def write_outputs(
+    results: dict[str, dict[str, list[str]]],
+    output_dir: Path,
+    total: int,
+    missing_files: list[str],
+    extra_stats: str = "",
+    output_format: str = "json",
+) -> None:
+    """Write the per-chunk result files (results in ``output_format``, summaries and stats.txt)."""
+    write_results(results, output_dir, output_format)
+    write_summaries(results, output_dir, total, missing_files, extra_stats)
 
-    json_path = output_dir / "results.json"
-    json_path.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
 
+def write_summaries(
+    results: dict[str, dict[str, list[str]]],
+    output_dir: Path,
+    total: int,
+    missing_files: list[str],
+    extra_stats: str = "",
+) -> None:
+    """Write the per-chunk summaries and stats.txt next to an already written results file."""
     summary_path = output_dir / "keyword_summary.txt"
     export_results_to_file(results, str(summary_path)) if results else summary_path.write_text(
         "No files contained the target keywords.\n", encoding="utf-8"
@@ -58,29 +328,78 @@ def run_keyword_search(file_list: Path, output_dir: Path, case_sensitive: bool)
         (output_dir / "missing_files.txt").write_text("\n".join(missing_files) + "\n", encoding="utf-8")
 
     stats_path = output_dir / "stats.txt"
-    processed_count = len(candidates) - len(missing_files)
+    processed_count = total - len(missing_files)
     stats_path.write_text(
         "Total listed files: {total}\nProcessed: {processed}\nMatches: {matches}\nMissing: {missing}\n".format(
-            total=len(candidates),
+            total=total,
             processed=processed_count,
             matches=len(results),
             missing=len(missing_files),
-        ),
+        )
+        + extra_stats,
         encoding="utf-8",
     )
 
-    return results
-
 
 def parse_args(argv: Iterable[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Run keyword filtering for a subset of files.")
-    parser.add_argument("--file-list", required=True, help="Path to the chunk file containing absolute paths.")
+    parser.add_argument(
+        "--file-list",
+        required=True,
+        help="Path to the chunk file containing absolute paths (or shard index rows).",
+    )
     parser.add_argument("--output-dir", required=True, help="Directory to write results into.")
     parser.add_argument(
         "--case-sensitive",
         default="false",
         help="Whether to treat keyword matching as case sensitive (true/false).",
     )
+    parser.add_argument(
+        "--window-size",
+        type=int,
+        default=DEFAULT_WINDOW_SIZE,
+        help="Characters read per window when streaming files; 0 reads each file whole.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=default_workers(),
+        help="Number of worker processes (defaults to SIM_CPUS, else SLURM_CPUS_PER_TASK, else 1).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Files handed to a worker at a time (defaults to an even split into 8 batches per worker).",
+    )
+    parser.add_argument(
+        "--cache",
+        default=None,
+        help="SQLite file holding per-file results from earlier runs; unchanged files are not rescanned.",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=RESULT_FORMATS,
+        default="json",
+        help="Format of the per-file results: indented json, compact jsonl (written as matches are found), "
+        "or parquet (needs pyarrow).",
+    )
+    parser.add_argument(
+        "--query",
+        default=None,
+        help="Boolean category query, e.g. 'compartment AND (modeling OR parameters) AND NOT kinetics'. "
+        "Defaults to matching any category.",
+    )
+    parser.add_argument(
+        "--full-detail",
+        action="store_true",
+        help="With --query, keep scanning to record every matched term instead of stopping once decided.",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        default=None,
+        help="Append a JSON line of timings and resource use for this chunk to this file.",
+    )
     return parser.parse_args(argv)
 
 
@@ -89,7 +408,25 @@ def main(argv: Iterable[str] | None = None) -> None:
     case_sensitive = str(args.case_sensitive).strip().lower() in {"1", "true", "yes", "on"}
     file_list = Path(args.file_list).expanduser().resolve()
     output_dir = Path(args.output_dir).expanduser().resolve()
-    run_keyword_search(file_list, output_dir, case_sensitive)
+    metrics = RunMetrics(args.metrics_file, "keyword_filter_runner")
+    try:
+        run_keyword_search(
+            file_list,
+            output_dir,
+            case_sensitive,
+            window_size=args.window_size,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            cache_path=Path(args.cache).expanduser().resolve() if args.cache else None,
+            query=args.query,
+            full_detail=args.full_detail,
+            output_format=args.output_format,
+            metrics=metrics,
+        )
+    except BaseException:
+        metrics.write("error")
+        raise
+    metrics.write()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,175 @@
+"""Merge per-chunk keyword filter outputs in one pass.
+
+Reads every ``output_*`` chunk directory in parallel and writes the merged list
+of filtered files, the merged stats file (same layout as the original
+``merge_filtered_files.sh``: aggregate totals followed by each chunk's stats) and
+the number of matching files per keyword category.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+from result_io import find_results_file, iter_results
+
+STAT_FIELDS = {
+    "Total listed files": "listed",
+    "Processed": "processed",
+    "Matches": "matches",
+    "Missing": "missing",
+}
+
+
+@dataclass
+class ChunkSummary:
+    chunk_dir: str
+    filtered: str = ""
+    stats_text: str = ""
+    totals: Counter = field(default_factory=Counter)
+    categories: Counter = field(default_factory=Counter)
+
+
+def _parse_stats(text: str) -> Counter:
+    totals: Counter = Counter()
+    for line in text.splitlines():
+        label, _, value = line.partition(":")
+        key = STAT_FIELDS.get(label.strip())
+        if key and value.strip().isdigit():
+            totals[key] = int(value.strip())
+    return totals
+
+
+def summarize_chunk(chunk_dir: str, filtered_filename: str = "filtered_files.txt") -> ChunkSummary:
+    """Read one chunk's file list, stats and per-category match counts."""
+    directory = Path(chunk_dir)
+    summary = ChunkSummary(chunk_dir)
+
+    filter_file = directory / filtered_filename
+    legacy_file = directory / "matching_files.txt"
+    if not filter_file.exists() and legacy_file.exists():
+        legacy_file.rename(filter_file)
+    if filter_file.exists():
+        summary.filtered = filter_file.read_text(encoding="utf-8")
+
+    stats_file = directory / "stats.txt"
+    if stats_file.exists():
+        summary.stats_text = stats_file.read_text(encoding="utf-8")
+        summary.totals = _parse_stats(summary.stats_text)
+
+    results_file = find_results_file(directory)
+    if results_file is not None:
+        for _, found in iter_results(results_file):
+            summary.categories.update(category for category, terms in found.items() if terms)
+    return summary
+
+
+def list_chunk_dirs(output_root: str) -> list[str]:
+    with os.scandir(output_root) as entries:
+        names = [entry.name for entry in entries if entry.name.startswith("output_") and entry.is_dir()]
+    return [os.path.join(output_root, name) for name in sorted(names)]
+
+
+def merge_outputs(
+    output_root: str,
+    filtered_filename: str = "filtered_files.txt",
+    merged_filtered_file: str = "merge_filtered_files.txt",
+    merged_stats_file: str = "merged_stats.txt",
+    category_counts_file: str = "merged_category_counts.txt",
+    workers: int | None = None,
+) -> Counter:
+    """
+    Merge every chunk under ``output_root`` and write the merged files.
+
+    Args:
+        output_root: Directory holding the ``output_*`` chunk directories
+        filtered_filename: Name of each chunk's list of matching files
+        merged_filtered_file: Where to write the concatenated file list
+        merged_stats_file: Where to write aggregate and per-chunk stats
+        category_counts_file: Where to write matching files per category
+        workers: Processes reading chunks (defaults to the CPU count)
+
+    Returns:
+        Aggregate totals (listed, processed, matches, missing)
+    """
+    if not os.path.isdir(output_root):
+        raise FileNotFoundError(f"Output root {output_root} not found")
+
+    chunk_dirs = list_chunk_dirs(output_root)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(chunk_dirs) or 1))
+    totals: Counter = Counter()
+    categories: Counter = Counter()
+    chunk_stats: list[str] = []
+
+    with open(merged_filtered_file, "w", encoding="utf-8") as merged:
+        if workers == 1:
+            summaries: Iterable[ChunkSummary] = (summarize_chunk(d, filtered_filename) for d in chunk_dirs)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            filenames = [filtered_filename] * len(chunk_dirs)
+            summaries = pool.map(summarize_chunk, chunk_dirs, filenames, chunksize=max(1, len(chunk_dirs) // (workers * 8)))
+        try:
+            for summary in summaries:
+                merged.write(summary.filtered)
+                categories.update(summary.categories)
+                if summary.stats_text:
+                    totals.update(summary.totals)
+                    chunk_stats.append(f"{summary.chunk_dir}\n{summary.stats_text}\n")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    with open(merged_stats_file, "w", encoding="utf-8") as handle:
+        handle.write(
+            "Aggregate totals\n"
+            f"Total listed files: {totals['listed']}\n"
+            f"Processed: {totals['processed']}\n"
+            f"Matches: {totals['matches']}\n"
+            f"Missing: {totals['missing']}\n\n"
+        )
+        handle.writelines(chunk_stats)
+
+    with open(category_counts_file, "w", encoding="utf-8") as handle:
+        for category, count in sorted(categories.items()):
+            handle.write(f"{category}\t{count}\n")
+
+    return totals
+
+
+def parse_args(argv: Iterable[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Merge keyword filter outputs from every chunk directory.")
+    parser.add_argument("output_root", nargs="?", default="filter_outputs", help="Directory holding output_* chunks.")
+    parser.add_argument("filtered_filename", nargs="?", default="filtered_files.txt", help="Per-chunk file list name.")
+    parser.add_argument("merged_filtered_file", nargs="?", default="merge_filtered_files.txt")
+    parser.add_argument("merged_stats_file", nargs="?", default="merged_stats.txt")
+    parser.add_argument("--category-counts", default="merged_category_counts.txt", help="Per-category count output.")
+    parser.add_argument("--workers", type=int, default=None, help="Processes reading chunks (defaults to CPU count).")
+    return parser.parse_args(argv)
+
+
+def main(argv: Iterable[str] | None = None) -> None:
+    args = parse_args(argv)
+    start = time.perf_counter()
+    merge_outputs(
+        args.output_root,
+        args.filtered_filename,
+        args.merged_filtered_file,
+        args.merged_stats_file,
+        args.category_counts,
+        args.workers,
+    )
+    print(f"Merged filtered file list saved to {args.merged_filtered_file}")
+    print(f"Merged stats saved to {args.merged_stats_file}")
+    print(f"Per-category counts saved to {args.category_counts}")
+    print(f"Merge took {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
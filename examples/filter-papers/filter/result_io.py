@@ -0,0 +1,174 @@
+"""Writers and readers for per-chunk keyword results in each supported format.
+
+``json`` is the original ``indent=2`` document, ``jsonl`` streams one compact
+``{"path": ..., "matches": {...}}`` object per line as matches are found, and
+``parquet`` writes one row per file with a list-of-terms column per category
+(needs ``pyarrow``).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Iterator
+
+RESULT_FILENAMES = {
+    "json": "results.json",
+    "jsonl": "results.jsonl",
+    "parquet": "results.parquet",
+}
+RESULT_FORMATS = tuple(RESULT_FILENAMES)
+
+# Rows buffered per Parquet row group
+_PARQUET_BATCH = 10_000
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("The parquet output format requires pyarrow (pip install pyarrow).") from e
+    return pyarrow, pyarrow.parquet
+
+
+class ResultWriter:
+    """Writes a chunk's results in ``output_format`` as they are added.
+
+    ``jsonl`` rows go to disk as each one arrives and ``parquet`` rows one row
+    group at a time; ``json`` is a single document, so it is written on close.
+    The file is written under a temporary name and renamed on close, when
+    results files the chunk left in other formats are removed, so readers
+    only ever find the latest complete one. Use as a context manager: leaving
+    with an exception deletes the partial file.
+    """
+
+    def __init__(self, output_dir: Path, output_format: str = "json") -> None:
+        if output_format not in RESULT_FILENAMES:
+            raise ValueError(f"Unknown output format {output_format!r}; expected one of {', '.join(RESULT_FORMATS)}")
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.path = output_dir / RESULT_FILENAMES[output_format]
+        self._temp_path = output_dir / f".{self.path.name}.part"
+        self._rows: list[tuple[str, dict[str, list[str]]]] = []
+        self._handle = self._temp_path.open("w", encoding="utf-8") if output_format == "jsonl" else None
+        self._parquet = _ParquetRows(self._temp_path) if output_format == "parquet" else None
+
+    def add(self, file_path: str, found: dict[str, list[str]]) -> None:
+        if self._handle is not None:
+            self._handle.write(json.dumps({"path": file_path, "matches": found}, ensure_ascii=False, separators=(",", ":")))
+            self._handle.write("\n")
+        elif self._parquet is not None:
+            self._parquet.add(file_path, found)
+        else:
+            self._rows.append((file_path, found))
+
+    def close(self) -> Path:
+        if self._handle is not None:
+            self._handle.close()
+        elif self._parquet is not None:
+            self._parquet.close()
+        else:
+            self._temp_path.write_text(json.dumps(dict(self._rows), indent=2, ensure_ascii=False), encoding="utf-8")
+        os.replace(self._temp_path, self.path)
+        for name in RESULT_FILENAMES.values():
+            if name != self.path.name:
+                (self.output_dir / name).unlink(missing_ok=True)
+        return self.path
+
+    def abort(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+        elif self._parquet is not None:
+            self._parquet.abort()
+        self._temp_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> ResultWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_results(
+    results: dict[str, dict[str, list[str]]],
+    output_dir: Path,
+    output_format: str = "json",
+) -> Path:
+    """Write matched files and their keywords to ``output_dir`` in ``output_format``."""
+    with ResultWriter(output_dir, output_format) as writer:
+        for file_path, found in results.items():
+            writer.add(file_path, found)
+    return writer.path
+
+
+class _ParquetRows:
+    """Buffers rows and writes them to ``path`` one Parquet row group at a time."""
+
+    def __init__(self, path: Path) -> None:
+        self.pa, self.pq = _require_pyarrow()
+        self.path = path
+        self.writer = None
+        self.batch: list[tuple[str, dict[str, list[str]]]] = []
+
+    def add(self, file_path: str, found: dict[str, list[str]]) -> None:
+        self.batch.append((file_path, found))
+        if len(self.batch) >= _PARQUET_BATCH:
+            self._flush()
+
+    def _flush(self) -> None:
+        pa = self.pa
+        categories = list(self.batch[0][1])
+        columns = {"path": pa.array([file_path for file_path, _ in self.batch], pa.string())}
+        for category in categories:
+            columns[category] = pa.array([found.get(category, []) for _, found in self.batch], pa.list_(pa.string()))
+        table = pa.table(columns)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(str(self.path), table.schema)
+        self.writer.write_table(table)
+        self.batch.clear()
+
+    def close(self) -> None:
+        if self.batch:
+            self._flush()
+        if self.writer is not None:
+            self.writer.close()
+        else:
+            # No matches: still leave an (empty) file so readers see the chunk finished
+            self.pq.write_table(self.pa.table({"path": self.pa.array([], self.pa.string())}), str(self.path))
+
+    def abort(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+def find_results_file(output_dir: Path) -> Path | None:
+    """The results file a chunk wrote, whichever format it used (the newest, if several are left over)."""
+    candidates = [output_dir / name for name in RESULT_FILENAMES.values() if (output_dir / name).exists()]
+    return max(candidates, key=lambda path: path.stat().st_mtime_ns, default=None)
+
+
+def iter_results(path: Path) -> Iterator[tuple[str, dict[str, list[str]]]]:
+    """Yield ``(file path, {category: terms})`` from any results file."""
+    if path.suffix == ".json":
+        yield from json.loads(path.read_text(encoding="utf-8")).items()
+    elif path.suffix == ".jsonl":
+        with path.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record["path"], record["matches"]
+    elif path.suffix == ".parquet":
+        _, pq = _require_pyarrow()
+        parquet_file = pq.ParquetFile(str(path))
+        for batch in parquet_file.iter_batches():
+            columns = batch.to_pydict()
+            paths = columns.pop("path")
+            for index, file_path in enumerate(paths):
+                yield file_path, {category: values[index] or [] for category, values in columns.items()}
+    else:
+        raise ValueError(f"Unrecognised results file {path}")
@@ -13,46 +13,63 @@ fi
 
 mkdir -p "$OUTPUT_DIR"
 
-readarray -t CONFIG < <(python3 - "$INPUT_SPEC" <<'PY'
-import sys, os
-from pathlib import Path
-path = Path(sys.argv[1])
-config = {}
-for raw in path.read_text().splitlines():
-    raw = raw.split("#", 1)[0].strip()
-    if not raw or ":" not in raw:
-        continue
-    key, value = raw.split(":", 1)
-    key = key.strip()
-    value = value.strip()
-    if value and value[0] in {'"', "'"} and value[-1] == value[0]:
-        value = value[1:-1]
-    config[key] = value
+readarray -t CONFIG < <(python3 - "$INPUT_SPEC" "$SCRIPT_DIR/../../../src" <<'PY'
+import sys
+sys.path.append(sys.argv[2])
+from input_yaml import read_input_yaml
+config = read_input_yaml(sys.argv[1])
 file_list = config.get("file_list", "")
 case_sensitive = config.get("case_sensitive", "false").lower()
+query = config.get("query", "")
+full_detail = config.get("full_detail", "false").lower()
 print(file_list)
 print(case_sensitive)
+print(query)
+print(full_detail)
 PY
 )
 
 FILE_LIST=${CONFIG[0]:-}
 CASE_SENSITIVE=${CONFIG[1]:-false}
+QUERY=${CONFIG[2]:-}
+FULL_DETAIL=${CONFIG[3]:-false}
 
 if [ -z "$FILE_LIST" ] || [ ! -f "$FILE_LIST" ]; then
     echo "Error: File list $FILE_LIST missing or unreadable" >&2
     exit 1
 fi
 
+# Optional per-chunk result cache that survives reruns (outputs are wiped on setup)
+CACHE_ARGS=()
+if [ -n "${FILTER_CACHE_DIR:-}" ]; then
+    mkdir -p "$FILTER_CACHE_DIR"
+    CACHE_ARGS=(--cache "$FILTER_CACHE_DIR/$(basename "$FILE_LIST").sqlite")
+fi
+
+QUERY_ARGS=()
+if [ -n "$QUERY" ]; then
+    QUERY_ARGS=(--query "$QUERY")
+fi
+case "$FULL_DETAIL" in
+    1|true|yes|on) QUERY_ARGS+=(--full-detail) ;;
+esac
+
 python3 "$SCRIPT_DIR/keyword_filter_runner.py" \
     --file-list "$FILE_LIST" \
     --output-dir "$OUTPUT_DIR" \
-    --case-sensitive "$CASE_SENSITIVE"
+    --case-sensitive "$CASE_SENSITIVE" \
+    --output-format "${FILTER_OUTPUT_FORMAT:-json}" \
+    --metrics-file "$OUTPUT_DIR/metrics.jsonl" \
+    "${CACHE_ARGS[@]}" \
+    "${QUERY_ARGS[@]}"
 
 cat > "$OUTPUT_DIR/info.txt" <<EOL
 Keyword batch completed at $(date)
 Input spec: $INPUT_SPEC
 File list: $FILE_LIST
 Case sensitive: $CASE_SENSITIVE
+Query: ${QUERY:-any category}
+Full detail: $FULL_DETAIL
 EOL
 
 echo "Completed keyword filtering for $FILE_LIST"
@@ -0,0 +1,78 @@
+"""Persistent per-file keyword results so reruns only rescan what changed."""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+
+@dataclass(frozen=True)
+class CachedScan:
+    """What a previous run learned about one file.
+
+    ``evaluated`` holds every search form the file was checked for and ``found``
+    the subset that matched, so a changed keyword dictionary only needs the
+    forms that are new since the file was last scanned.
+    """
+
+    size: int
+    mtime_ns: int
+    evaluated: frozenset[str]
+    found: frozenset[str]
+
+
+class ScanCache:
+    """SQLite store of ``CachedScan`` rows keyed on file path and case sensitivity."""
+
+    def __init__(self, path: Path, case_sensitive: bool) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.case_sensitive = int(case_sensitive)
+        self.connection = sqlite3.connect(str(path))
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scans (
+                path TEXT NOT NULL,
+                case_sensitive INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                evaluated TEXT NOT NULL,
+                found TEXT NOT NULL,
+                PRIMARY KEY (path, case_sensitive)
+            )
+            """
+        )
+
+    def load(self) -> dict[str, CachedScan]:
+        rows = self.connection.execute(
+            "SELECT path, size, mtime_ns, evaluated, found FROM scans WHERE case_sensitive = ?",
+            (self.case_sensitive,),
+        )
+        return {
+            path: CachedScan(size, mtime_ns, frozenset(json.loads(evaluated)), frozenset(json.loads(found)))
+            for path, size, mtime_ns, evaluated, found in rows
+        }
+
+    def store(self, entries: Iterable[tuple[str, CachedScan]]) -> None:
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO scans (path, case_sensitive, size, mtime_ns, evaluated, found) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        path,
+                        self.case_sensitive,
+                        entry.size,
+                        entry.mtime_ns,
+                        json.dumps(sorted(entry.evaluated), ensure_ascii=False),
+                        json.dumps(sorted(entry.found), ensure_ascii=False),
+                    )
+                    for path, entry in entries
+                ),
+            )
+
+    def close(self) -> None:
+        self.connection.close()
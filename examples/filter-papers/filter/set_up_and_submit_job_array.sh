@@ -16,6 +16,8 @@ CHUNK_DIGITS=${FILTER_CHUNK_DIGITS:-6}
 JOB_PREFIX=${FILTER_JOB_PREFIX:-filter_}
 CASE_SENSITIVE=${CASE_SENSITIVE:-false}
 FILE_PATTERN=${FILE_PATTERN:-'*.txt'}
+QUERY=${FILTER_QUERY:-}  ### Optional boolean category query, e.g. 'compartment AND modeling' ###
+FULL_DETAIL=${FILTER_FULL_DETAIL:-false}  ### With a query, record every matched term instead of stopping once decided ###
 
 # Function to log and run commands
 log_and_run() {
@@ -36,10 +38,17 @@ log_and_run "Step 1/3: Preparing keyword input chunks" \
     "$CHUNK_SIZE" \
     "$CHUNK_DIGITS" \
     "$CASE_SENSITIVE" \
-    "$FILE_PATTERN"
+    "$FILE_PATTERN" \
+    "$QUERY" \
+    "$FULL_DETAIL"
 
 sleep 1
 
+# Run each task's chunks in one Python process (FILTER_BATCH_MODE=subprocess: one run_one_batch.sh per chunk)
+if [ "${FILTER_BATCH_MODE:-inprocess}" = "inprocess" ]; then
+    export BATCH_HANDLER="./batch_handler.py"
+fi
+
 log_and_run "Step 2/3: Generating job script" \
     bash _2_generate_job_script.sh \
     "./run_one_batch.sh" \
@@ -0,0 +1,82 @@
+"""Read papers straight out of the packed shards written by the move stage.
+
+With ``storage: shard`` the move stage packs each chunk into one uncompressed
+tar next to a ``<shard>.idx.tsv`` index of
+``remote_path<TAB>shard<TAB>offset<TAB>length<TAB>mtime`` rows.
+``_1_prepare_inputs.sh`` copies those rows into the chunk file lists with the
+shard path made absolute, and ``load_file_list`` turns each one into a
+``ShardMember``. A member's bytes are sliced from a per-process ``mmap`` of its
+shard, so a chunk is scanned with one open per shard and no per-paper open or
+stat.
+"""
+
+from __future__ import annotations
+
+import mmap
+from functools import lru_cache
+from typing import Callable, NamedTuple, Optional
+
+from keyword_filter import KeywordMatcher
+
+# Shards kept mapped per process; file lists are ordered by shard, so only the current one is hot
+_MAPPED_SHARDS = 16
+# Shards that failed to map in this process; lru_cache keeps only successes, so a missing
+# shard would otherwise be reopened once for every one of its members
+_UNAVAILABLE_SHARDS: set[str] = set()
+
+
+class ShardMember(NamedTuple):
+    path: str  # original remote path, used as the paper's name in results
+    shard: str
+    offset: int
+    length: int
+    mtime_ns: int
+
+    def __str__(self) -> str:
+        return self.path
+
+
+def parse_shard_line(line: str) -> ShardMember | None:
+    """The ``ShardMember`` of a five-column file-list line, or None for a plain path."""
+    fields = line.split("\t")
+    if len(fields) != 5:
+        return None
+    path, shard, offset, length, mtime = fields
+    return ShardMember(path, shard, int(offset), int(length), int(float(mtime) * 1_000_000_000))
+
+
+@lru_cache(maxsize=_MAPPED_SHARDS)
+def _map_shard(shard: str) -> mmap.mmap:
+    with open(shard, "rb") as handle:
+        return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def shard_available(member: ShardMember) -> bool:
+    """Whether the member's shard can be mapped (checked once per shard, not per member)."""
+    if member.shard in _UNAVAILABLE_SHARDS:
+        return False
+    try:
+        _map_shard(member.shard)
+    except (OSError, ValueError):
+        _UNAVAILABLE_SHARDS.add(member.shard)
+        return False
+    return True
+
+
+def read_member(member: ShardMember) -> bytes:
+    view = _map_shard(member.shard)
+    end = member.offset + member.length
+    if end > len(view):
+        raise OSError(f"{member.shard} is shorter than its index says ({end} > {len(view)} bytes)")
+    return view[member.offset : end]
+
+
+def scan_member_forms(
+    member: ShardMember,
+    matcher: KeywordMatcher,
+    pending: Optional[set] = None,
+    stop: Optional[Callable[[set], bool]] = None,
+) -> set:
+    """``scan_file_forms`` for a shard member: the matcher's forms found in its text."""
+    text = read_member(member).decode("utf-8", errors="ignore")
+    return matcher.find_forms(matcher.prepare(text), pending, stop=stop)
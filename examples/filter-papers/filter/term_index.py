@@ -0,0 +1,324 @@
+"""Persistent inverted term index so new keyword questions skip a full corpus scan.
+
+``build`` tokenizes every file of a chunk once and writes one shard per chunk::
+
+    <index_dir>/shard_<chunk>/
+        files.txt       file paths; line N is file id N
+        vocab.txt       sorted, newline separated tokens (UTF-8)
+        vocab.idx       uint64 byte offset of each token in vocab.txt, plus the end
+        postings.idx    uint32 offset of each token's postings, plus the end
+        postings.bin    uint32 sorted file ids, one run per token
+
+``query`` answers a ``PK_KEYWORDS``-style dictionary from every shard. Single
+word terms in case-insensitive mode come straight from the postings. Phrases
+(e.g. 'volume of distribution'), hyphenated terms and case-sensitive queries use
+the postings to narrow the candidates and then confirm them with a verification
+pass of ``KeywordMatcher`` over just those files, so results match a full scan.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Iterable, Iterator, TextIO
+
+from keyword_filter import DEFAULT_WINDOW_SIZE, PK_KEYWORDS, KeywordMatcher, build_matcher, scan_file_forms
+from keyword_filter_runner import load_file_list, write_outputs
+from result_io import RESULT_FORMATS
+from shard_reader import ShardMember
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Characters that survive str.lower() yet match an ASCII letter under re.IGNORECASE
+_ASCII_FOLD = str.maketrans({"ı": "i", "ſ": "s"})
+
+
+def _fold(token: str) -> str:
+    return token.translate(_ASCII_FOLD)
+
+
+def _iter_tokens(handle: TextIO, window_size: int = DEFAULT_WINDOW_SIZE) -> Iterator[str]:
+    """Yield folded, lowercased word tokens without holding the whole file in memory."""
+    carry = ""
+    while True:
+        window = handle.read(window_size)
+        text = carry + window.lower()
+        if not window:
+            break
+        # Hold back a trailing partial token until the next window completes it
+        cut = len(text)
+        while cut and TOKEN_PATTERN.fullmatch(text[cut - 1]):
+            cut -= 1
+        for token in TOKEN_PATTERN.findall(text, 0, cut):
+            yield _fold(token)
+        carry = text[cut:]
+    for token in TOKEN_PATTERN.findall(carry):
+        yield _fold(token)
+
+
+def build_shard(file_list: Path, shard_dir: Path, window_size: int = DEFAULT_WINDOW_SIZE) -> dict[str, int]:
+    """
+    Tokenize every file of a chunk once and write its inverted index shard.
+
+    Args:
+        file_list: Chunk file containing absolute paths (not shard index rows)
+        shard_dir: Directory to write the shard into
+        window_size: Characters read per window while tokenizing
+
+    Returns:
+        Counts of indexed files, missing files and distinct tokens
+
+    Raises:
+        ValueError: The file list names papers inside tar shards (move ``storage: shard``)
+    """
+    candidates = load_file_list(file_list)
+    if any(isinstance(candidate, ShardMember) for candidate in candidates):
+        raise ValueError(
+            f"{file_list} lists papers packed in tar shards; the term index needs one file per paper "
+            "(move them with storage: files)"
+        )
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    postings: dict[str, list[int]] = {}
+    indexed: list[str] = []
+    missing = 0
+
+    for candidate in candidates:
+        if not candidate.is_file():
+            missing += 1
+            continue
+        file_id = len(indexed)
+        indexed.append(str(candidate))
+        try:
+            with open(candidate, "r", encoding="utf-8", errors="ignore") as handle:
+                tokens = set(_iter_tokens(handle, window_size))
+        except Exception as e:
+            print(f"Error reading {candidate}: {e}")
+            continue
+        for token in tokens:
+            postings.setdefault(token, []).append(file_id)
+
+    vocab = sorted(postings, key=lambda token: token.encode("utf-8"))
+    vocab_offsets = array("Q", [0])
+    posting_offsets = array("I", [0])
+    posting_ids = array("I")
+    with open(shard_dir / "vocab.txt", "wb") as vocab_handle:
+        for token in vocab:
+            encoded = token.encode("utf-8") + b"\n"
+            vocab_handle.write(encoded)
+            vocab_offsets.append(vocab_offsets[-1] + len(encoded))
+            posting_ids.extend(postings[token])
+            posting_offsets.append(len(posting_ids))
+
+    with open(shard_dir / "vocab.idx", "wb") as handle:
+        vocab_offsets.tofile(handle)
+    with open(shard_dir / "postings.idx", "wb") as handle:
+        posting_offsets.tofile(handle)
+    with open(shard_dir / "postings.bin", "wb") as handle:
+        posting_ids.tofile(handle)
+    # files.txt goes last: its presence marks the shard as complete
+    (shard_dir / "files.txt").write_text("".join(f"{path}\n" for path in indexed), encoding="utf-8")
+
+    return {"files": len(indexed), "missing": missing, "tokens": len(vocab)}
+
+
+class IndexShard:
+    """Memory-mapped, read-only view of one shard."""
+
+    def __init__(self, shard_dir: Path) -> None:
+        self.shard_dir = shard_dir
+        self.files = (shard_dir / "files.txt").read_text(encoding="utf-8").splitlines()
+        self._maps = []
+        self.vocab = self._map("vocab.txt")
+        self.vocab_offsets = self._map("vocab.idx").cast("Q")
+        self.posting_offsets = self._map("postings.idx").cast("I")
+        self.posting_ids = self._map("postings.bin").cast("I")
+
+    def _map(self, name: str) -> memoryview:
+        with open(self.shard_dir / name, "rb") as handle:
+            if not handle.seek(0, 2):
+                return memoryview(b"")
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        self._maps.append((mapped, view))
+        return view
+
+    def _token(self, index: int) -> bytes:
+        return bytes(self.vocab[self.vocab_offsets[index]:self.vocab_offsets[index + 1] - 1])
+
+    def postings(self, token: str) -> memoryview:
+        """Sorted file ids containing ``token`` (empty when absent)."""
+        size = len(self.vocab_offsets) - 1
+        key = token.encode("utf-8")
+        index = bisect_left(range(size), key, key=self._token)
+        if index < size and self._token(index) == key:
+            return self.posting_ids[self.posting_offsets[index]:self.posting_offsets[index + 1]]
+        return memoryview(b"").cast("I")
+
+    def close(self) -> None:
+        for view in (self.vocab, self.vocab_offsets, self.posting_offsets, self.posting_ids):
+            view.release()
+        for mapped, view in self._maps:
+            view.release()
+            mapped.close()
+
+
+def _plan(form: str, case_sensitive: bool) -> tuple[str, list[str]]:
+    """Decide how a search form is answered: 'direct', 'verify' (candidates) or 'scan' (every file)."""
+    if not form.isascii():
+        return "scan", []
+    tokens = TOKEN_PATTERN.findall(form.lower())
+    if not tokens:
+        return "scan", []
+    if not case_sensitive and tokens == [form]:
+        return "direct", tokens
+    return "verify", tokens
+
+
+def query_shard(
+    shard: IndexShard,
+    matcher: KeywordMatcher,
+    window_size: int | None = DEFAULT_WINDOW_SIZE,
+) -> dict[str, dict[str, list[str]]]:
+    """
+    Answer every keyword of ``matcher`` for the files of one shard.
+
+    Args:
+        shard: Shard to query
+        matcher: Compiled matcher holding the keyword dictionary and case rules
+        window_size: Characters read per window during the verification pass
+
+    Returns:
+        Dictionary mapping file paths to found keywords, in file-list order
+    """
+    found: dict[int, set[str]] = {}
+    to_verify: dict[int, set[str]] = {}
+
+    for form in matcher.forms:
+        mode, tokens = _plan(form, matcher.case_sensitive)
+        if mode == "scan":
+            candidates: Iterable[int] = range(len(shard.files))
+        else:
+            candidates = set(shard.postings(tokens[0]))
+            for token in tokens[1:]:
+                if not candidates:
+                    break
+                candidates.intersection_update(shard.postings(token))
+        target = found if mode == "direct" else to_verify
+        for file_id in candidates:
+            target.setdefault(file_id, set()).add(form)
+
+    for file_id, forms in to_verify.items():
+        try:
+            confirmed = scan_file_forms(Path(shard.files[file_id]), matcher, forms, window_size)
+        except Exception as e:
+            print(f"Error reading {shard.files[file_id]}: {e}")
+            continue
+        if confirmed:
+            found.setdefault(file_id, set()).update(confirmed)
+
+    return {shard.files[file_id]: matcher.results_for(found[file_id]) for file_id in sorted(found)}
+
+
+def iter_shard_dirs(index_dir: Path) -> list[Path]:
+    """Complete shards under ``index_dir`` in name order."""
+    return sorted(path.parent for path in index_dir.glob("shard_*/files.txt"))
+
+
+def run_index_query(
+    index_dir: Path,
+    output_dir: Path,
+    keywords: dict[str, list[str]],
+    case_sensitive: bool,
+    window_size: int | None = DEFAULT_WINDOW_SIZE,
+    output_format: str = "json",
+) -> dict[str, dict[str, list[str]]]:
+    """Query every shard and write the same result files as ``run_keyword_search``."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    matcher = build_matcher(keywords, case_sensitive)
+    results: dict[str, dict[str, list[str]]] = {}
+    total = 0
+    for shard_dir in iter_shard_dirs(index_dir):
+        shard = IndexShard(shard_dir)
+        try:
+            total += len(shard.files)
+            results.update(query_shard(shard, matcher, window_size))
+        finally:
+            shard.close()
+    write_outputs(results, output_dir, total, [], output_format=output_format)
+    return results
+
+
+def _load_keywords(path: str | None) -> dict[str, list[str]]:
+    if not path:
+        return PK_KEYWORDS
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def parse_args(argv: Iterable[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build or query an inverted term index over the corpus.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Index the files of one chunk into its own shard.")
+    build.add_argument("--file-list", required=True, help="Path to the chunk file containing absolute paths.")
+    build.add_argument("--index-dir", required=True, help="Directory holding one shard per chunk.")
+    build.add_argument("--shard-name", default=None, help="Shard name (defaults to the file list's name).")
+
+    query = subparsers.add_parser("query", help="Answer a keyword dictionary from every shard.")
+    query.add_argument("--index-dir", required=True, help="Directory holding one shard per chunk.")
+    query.add_argument("--output-dir", required=True, help="Directory to write results into.")
+    query.add_argument(
+        "--keywords",
+        default=None,
+        help="JSON file mapping categories to terms (defaults to PK_KEYWORDS).",
+    )
+    query.add_argument(
+        "--case-sensitive",
+        default="false",
+        help="Whether to treat keyword matching as case sensitive (true/false).",
+    )
+    query.add_argument(
+        "--output-format",
+        choices=RESULT_FORMATS,
+        default="json",
+        help="Format of the per-file results (json, jsonl or parquet).",
+    )
+
+    for sub in (build, query):
+        sub.add_argument(
+            "--window-size",
+            type=int,
+            default=DEFAULT_WINDOW_SIZE,
+            help="Characters read per window when reading files.",
+        )
+    return parser.parse_args(argv)
+
+
+def main(argv: Iterable[str] | None = None) -> None:
+    args = parse_args(argv)
+    index_dir = Path(args.index_dir).expanduser().resolve()
+    if args.command == "build":
+        file_list = Path(args.file_list).expanduser().resolve()
+        shard_dir = index_dir / f"shard_{args.shard_name or file_list.name}"
+        try:
+            counts = build_shard(file_list, shard_dir, args.window_size or DEFAULT_WINDOW_SIZE)
+        except ValueError as error:
+            print(f"Error: {error}", file=sys.stderr)
+            raise SystemExit(1)
+        print(f"Indexed {counts['files']} files ({counts['tokens']} tokens, {counts['missing']} missing) into {shard_dir}")
+        return
+
+    case_sensitive = str(args.case_sensitive).strip().lower() in {"1", "true", "yes", "on"}
+    output_dir = Path(args.output_dir).expanduser().resolve()
+    results = run_index_query(
+        index_dir, output_dir, _load_keywords(args.keywords), case_sensitive, args.window_size, args.output_format
+    )
+    print(f"{len(results)} matching files written to {output_dir}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,8 @@ REMOTE_DIR_SPEC=${4:?"Remote directory (or list/file) required"}
 CHUNK=${5:-1000}
 NUM_ID_DIGITS=${6:-6}
 TRANSFERRED_FILES_DIR=${7:-}
+SSH_MAX_CONNECTIONS=${8:-}
+STORAGE=${9:-}
 
 # Expand a leading tilde in the key path so SSH/scp can read it.
 REMOTE_KEY_FILENAME=${REMOTE_KEY_FILENAME/#\~/$HOME}
@@ -20,6 +22,12 @@ trim_whitespace() {
     printf '%s' "$input"
 }
 
+# Single-quoted YAML scalar; a quote inside the value is written twice
+yaml_quote() {
+    local value=$1
+    printf "'%s'" "${value//\'/\'\'}"
+}
+
 REMOTE_DIRECTORIES=()
 if [ -f "$REMOTE_DIR_SPEC" ]; then
     while IFS= read -r line; do
@@ -57,18 +65,35 @@ dirs = sys.argv[3:]
 if not dirs:
     raise SystemExit("No remote directories provided")
 quoted_dirs = " ".join(shlex.quote(d) for d in dirs)
-print(f"set -euo pipefail; find {quoted_dirs} -type f -name '*.txt' | sort | split -l {chunk} -d -a {digits} - chunk_")
+# path<TAB>size<TAB>mtime per line; the size and mtime let reruns skip unchanged files
+print(
+    f"set -euo pipefail; find {quoted_dirs} -type f -name '*.txt' -printf '%p\\t%s\\t%T@\\n' "
+    f"| sort | split -l {chunk} -d -a {digits} - chunk_"
+)
 PY
 )
 
+# Share one connection between the find, copy and cleanup steps below.
+REMOTE_TARGET="$REMOTE_USERNAME@$REMOTE_HOSTNAME"
+SSH_OPTS=(-i "$REMOTE_KEY_FILENAME")
+if [ "${SSH_MULTIPLEX:-true}" = "true" ]; then
+    CONTROL_PATH="${TMPDIR:-/tmp}/prepare-$$.sock"
+    if ssh "${SSH_OPTS[@]}" -o ControlMaster=yes -o ControlPath="$CONTROL_PATH" -o ControlPersist=60 -f -N "$REMOTE_TARGET"; then
+        SSH_OPTS+=(-o ControlPath="$CONTROL_PATH" -o ControlMaster=no)
+        trap 'ssh -o ControlPath="$CONTROL_PATH" -O exit "$REMOTE_TARGET" >/dev/null 2>&1 || true' EXIT
+    else
+        echo "Warning: could not start a shared ssh connection; using one connection per command" >&2
+    fi
+fi
+
 echo "Splitting remote file list into chunks of $CHUNK entries..."
-ssh -i "$REMOTE_KEY_FILENAME" "$REMOTE_USERNAME@$REMOTE_HOSTNAME" "$REMOTE_FIND_COMMAND"
+ssh "${SSH_OPTS[@]}" "$REMOTE_TARGET" "$REMOTE_FIND_COMMAND"
 
 echo "Copying chunk manifests locally..."
-scp -i "$REMOTE_KEY_FILENAME" "$REMOTE_USERNAME@$REMOTE_HOSTNAME:${REMOTE_TEMP_PREFIX}*" "$LOCAL_LIST_DIR/"
+scp "${SSH_OPTS[@]}" "$REMOTE_TARGET:${REMOTE_TEMP_PREFIX}*" "$LOCAL_LIST_DIR/"
 
 echo "Cleaning up remote chunk manifests..."
-ssh -i "$REMOTE_KEY_FILENAME" "$REMOTE_USERNAME@$REMOTE_HOSTNAME" "rm -f ${REMOTE_TEMP_PREFIX}*"
+ssh "${SSH_OPTS[@]}" "$REMOTE_TARGET" "rm -f ${REMOTE_TEMP_PREFIX}*"
 
 for chunk_file in "$LOCAL_LIST_DIR"/${REMOTE_TEMP_PREFIX}*; do
     chunk_base=$(basename "$chunk_file")
@@ -76,19 +101,28 @@ for chunk_file in "$LOCAL_LIST_DIR"/${REMOTE_TEMP_PREFIX}*; do
     archive_name="archive_${chunk_base}.tar.gz"
     file_list_abs=$(readlink -f "$chunk_file")
     cat > "$yaml_file" <<EOL
-hostname: '$REMOTE_HOSTNAME'
-username: '$REMOTE_USERNAME'
-key_filename: '$REMOTE_KEY_FILENAME'
-file_list: '$file_list_abs'
-archive_basename: '$archive_name'
+hostname: $(yaml_quote "$REMOTE_HOSTNAME")
+username: $(yaml_quote "$REMOTE_USERNAME")
+key_filename: $(yaml_quote "$REMOTE_KEY_FILENAME")
+file_list: $(yaml_quote "$file_list_abs")
+archive_basename: $(yaml_quote "$archive_name")
 keep_archive: false
 EOL
     if [ -n "$TRANSFERRED_FILES_DIR" ]; then
 	transferred_abs=$(readlink -f "$TRANSFERRED_FILES_DIR")
 	cat >> "$yaml_file" <<EOL
-transferred_files_dir: '$transferred_abs'
+transferred_files_dir: $(yaml_quote "$transferred_abs")
 EOL
     fi
+    if [ -n "$SSH_MAX_CONNECTIONS" ]; then
+	cat >> "$yaml_file" <<EOL
+ssh_max_connections: $SSH_MAX_CONNECTIONS
+ssh_slots_dir: $(yaml_quote "$(pwd)/.ssh_slots")
+EOL
+    fi
+    if [ -n "$STORAGE" ]; then
+	echo "storage: $STORAGE" >> "$yaml_file"
+    fi
     echo "Created $yaml_file"
 done
 
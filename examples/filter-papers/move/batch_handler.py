@@ -0,0 +1,52 @@
+"""In-process equivalent of ``run_one_batch.sh`` for ``src/run_batch.py``.
+
+``run_input`` calls ``compress_pull_extract_from_yaml`` directly, so a task's
+chunks share one interpreter instead of starting ``python3`` per chunk, and
+writes the same ``info.txt``.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+from compress_pull_extract import compress_pull_extract_from_yaml
+from run_metrics import RunMetrics
+
+
+def run_input(input_yaml: Path, output_dir: Path) -> None:
+	if not input_yaml.is_file():
+		raise FileNotFoundError(f"Input file {input_yaml} does not exist")
+	if not output_dir.is_dir():
+		raise FileNotFoundError(f"Output directory {output_dir} does not exist")
+
+	transfer_dir = os.environ.get("TRANSFERRED_FILES_DIR", "")
+	if transfer_dir:
+		os.makedirs(transfer_dir, exist_ok=True)
+	else:
+		transfer_dir = str(output_dir)
+
+	print(f"Running simulation with input: {input_yaml}")
+	print(f"Output directory: {output_dir}")
+
+	stats_file = output_dir / "transfer_stats.txt"
+	metrics = RunMetrics(output_dir / "metrics.jsonl", "compress_pull_extract")
+	try:
+		compress_pull_extract_from_yaml(str(input_yaml), transfer_dir, str(stats_file), metrics)
+	except BaseException:
+		metrics.write("error")
+		raise
+	metrics.write()
+
+	info = [
+		f"Simulation completed at {time.strftime('%a %b %e %H:%M:%S %Z %Y')}\n",
+		f"Input file: {input_yaml}\n",
+		f"Transferred files dir: {transfer_dir}\n",
+	]
+	if stats_file.exists():
+		info.append(stats_file.read_text(encoding="utf-8"))
+	info.append(input_yaml.read_text(encoding="utf-8"))
+	(output_dir / "info.txt").write_text("".join(info), encoding="utf-8")
+
+	print("Simulation completed successfully!")
@@ -0,0 +1,215 @@
+"""Check ``ssh_max_connections`` against a stand-in transport, without a remote host.
+
+Writes a stand-in ``ssh``/``scp`` that runs the "remote" side locally and counts
+the connections open at once (a ControlMaster counts as one while it lives;
+commands riding on it count as none). Several tasks then transfer a small
+corpus with ``streams`` parallel streams into their own outputs, sharing one
+``ssh_slots_dir``, once per scenario:
+
+    multiplex     one master per task, streams ride on it
+    direct        ssh_multiplex: false, every stream opens its own connections
+    master-fails  the master cannot start, so the task falls back to direct
+
+A scenario passes when the peak never exceeds ``--max-connections`` and every
+file arrives. The script exits with status 1 if any scenario fails.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+TRANSFER_SCRIPT = Path(__file__).resolve().parent / "compress_pull_extract.py"
+
+SCENARIOS = ("multiplex", "direct", "master-fails")
+
+STANDIN = r"""#!/bin/bash
+# Stand-in ssh/scp: runs the remote side locally and counts open connections in $STANDIN_STATE
+state=$STANDIN_STATE
+count() {
+	(
+		flock 9
+		live=$(( $(cat "$state/live") + $1 ))
+		echo "$live" > "$state/live"
+		[ "$live" -le "$(cat "$state/peak")" ] || echo "$live" > "$state/peak"
+	) 9>> "$state/lock"
+}
+args=(); control=""; master=0; op=""
+while [ $# -gt 0 ]; do
+	case "$1" in
+		-o) case "$2" in ControlPath=*) control=${2#ControlPath=};; ControlMaster=yes) master=1;; esac; shift 2;;
+		-O) op=$2; shift 2;;
+		-i) shift 2;;
+		-*) shift;;
+		*) args+=("$1"); shift;;
+	esac
+done
+if [ "$master" = 1 ]; then
+	[ "${STANDIN_MASTER_FAILS:-0}" = 1 ] && exit 255
+	touch "$control"
+	count 1
+	exit 0
+fi
+if [ "$op" = exit ]; then
+	[ -e "$control" ] && rm -f "$control" && count -1
+	exit 0
+fi
+if [ -z "$control" ] || [ ! -e "$control" ]; then
+	count 1
+	trap 'count -1' EXIT
+	sleep "$STANDIN_DELAY"
+fi
+if [ "$(basename "$0")" = scp ]; then
+	cp "${args[0]#*:}" "${args[1]}"
+else
+	bash -c "${args[*]:1}"
+fi
+"""
+
+
+class ScenarioResult(NamedTuple):
+	name: str
+	peak: int
+	delivered: int
+	expected: int
+	failed_tasks: int
+
+
+def write_standin(bin_dir: Path) -> None:
+	bin_dir.mkdir(parents=True, exist_ok=True)
+	for name in ("ssh", "scp"):
+		path = bin_dir / name
+		path.write_text(STANDIN, encoding="utf-8")
+		path.chmod(0o755)
+
+
+def write_corpus(root: Path, tasks: int, files: int) -> list[Path]:
+	"""One manifest of ``files`` small "remote" files per task; returns the manifest paths."""
+	manifests = []
+	for task in range(tasks):
+		remote_dir = root / "remote" / f"task_{task:02d}"
+		remote_dir.mkdir(parents=True, exist_ok=True)
+		paths = []
+		for index in range(files):
+			path = remote_dir / f"paper_{index:04d}.txt"
+			path.write_text(f"task {task} paper {index}\n" * (index + 1), encoding="utf-8")
+			paths.append(str(path))
+		manifest = root / f"manifest_{task:02d}.txt"
+		manifest.write_text("".join(f"{path}\n" for path in paths), encoding="utf-8")
+		manifests.append(manifest)
+	return manifests
+
+
+def run_scenario(
+	work_dir: Path,
+	name: str,
+	manifests: list[Path],
+	files: int,
+	streams: int,
+	max_connections: int,
+	transfer_mode: str,
+	delay: float,
+) -> ScenarioResult:
+	"""Run one transfer task per manifest at once and read back the stand-in's peak count."""
+	scenario_dir = work_dir / name
+	state = scenario_dir / "state"
+	state.mkdir(parents=True, exist_ok=True)
+	(state / "live").write_text("0\n", encoding="utf-8")
+	(state / "peak").write_text("0\n", encoding="utf-8")
+	env = dict(
+		os.environ,
+		PATH=f"{work_dir / 'bin'}{os.pathsep}{os.environ.get('PATH', '')}",
+		STANDIN_STATE=str(state),
+		STANDIN_DELAY=str(delay),
+		STANDIN_MASTER_FAILS="1" if name == "master-fails" else "0",
+	)
+	processes = []
+	outputs = []
+	for task, manifest in enumerate(manifests):
+		output = scenario_dir / f"output_{task:02d}"
+		input_yaml = scenario_dir / f"input_{task:02d}.yaml"
+		input_yaml.write_text(
+			"hostname: standin\n"
+			"username: check\n"
+			"key_filename: /dev/null\n"
+			f"file_list: '{manifest}'\n"
+			f"streams: {streams}\n"
+			f"transfer_mode: {transfer_mode}\n"
+			f"remote_archive_dir: '{scenario_dir / 'remote_archives'}'\n"
+			f"ssh_multiplex: {'false' if name == 'direct' else 'true'}\n"
+			f"ssh_max_connections: {max_connections}\n"
+			f"ssh_slots_dir: '{scenario_dir / 'slots'}'\n",
+			encoding="utf-8",
+		)
+		log = open(scenario_dir / f"task_{task:02d}.log", "w", encoding="utf-8")
+		processes.append(
+			subprocess.Popen(
+				[sys.executable, str(TRANSFER_SCRIPT), "--input-yaml", str(input_yaml), "--local-output", str(output)],
+				env=env,
+				stdout=log,
+				stderr=subprocess.STDOUT,
+			)
+		)
+		log.close()
+		outputs.append(output)
+	failed_tasks = sum(process.wait() != 0 for process in processes)
+	delivered = sum(
+		1 for output in outputs if output.is_dir() for entry in output.iterdir() if entry.is_file() and not entry.name.startswith(".")
+	)
+	peak = int((state / "peak").read_text(encoding="utf-8"))
+	return ScenarioResult(name, peak, delivered, len(manifests) * files, failed_tasks)
+
+
+def parse_args(argv: Iterable[str] | None = None) -> argparse.Namespace:
+	parser = argparse.ArgumentParser(description="Check the ssh connection cap against a stand-in ssh/scp.")
+	parser.add_argument("--tasks", type=int, default=3, help="Transfer tasks run at once.")
+	parser.add_argument("--streams", type=int, default=3, help="Parallel streams per task.")
+	parser.add_argument("--max-connections", type=int, default=2, help="ssh_max_connections shared by the tasks.")
+	parser.add_argument("--files", type=int, default=12, help="Files per task.")
+	parser.add_argument("--transfer-mode", choices=("archive", "pipe"), default="pipe")
+	parser.add_argument("--delay", type=float, default=0.3, help="Seconds each stand-in connection stays open.")
+	parser.add_argument("--scenario", choices=SCENARIOS, action="append", help="Run only this scenario (repeatable).")
+	parser.add_argument("--work-dir", default=None, help="Keep the corpus, outputs and task logs here.")
+	return parser.parse_args(argv)
+
+
+def main(argv: Iterable[str] | None = None) -> None:
+	args = parse_args(argv)
+	with tempfile.TemporaryDirectory(prefix="check_ssh_cap_") as temp_dir:
+		work_dir = Path(args.work_dir).resolve() if args.work_dir else Path(temp_dir)
+		write_standin(work_dir / "bin")
+		manifests = write_corpus(work_dir, args.tasks, args.files)
+		results = [
+			run_scenario(
+				work_dir,
+				name,
+				manifests,
+				args.files,
+				args.streams,
+				args.max_connections,
+				args.transfer_mode,
+				args.delay,
+			)
+			for name in args.scenario or SCENARIOS
+		]
+	print(f"{args.tasks} tasks x {args.streams} streams, ssh_max_connections: {args.max_connections}")
+	failures = 0
+	for result in results:
+		ok = result.peak <= args.max_connections and result.delivered == result.expected and not result.failed_tasks
+		failures += not ok
+		print(
+			f"{result.name:<13} peak {result.peak} live connections, "
+			f"{result.delivered}/{result.expected} files, {result.failed_tasks} failed tasks: "
+			f"{'ok' if ok else 'FAILED'}"
+		)
+	if failures:
+		raise SystemExit(1)
+
+
+if __name__ == "__main__":
+	main()
@@ -3,21 +3,38 @@
 from __future__ import annotations
 
 import argparse
+import errno
 import os
 import posixpath
 import shlex
 import shutil
 import subprocess
+import sys
+import tarfile
 import tempfile
+import threading
+import time
 import uuid
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field, replace
+from functools import partial
 from pathlib import Path
-from typing import Iterable
+from typing import IO, Callable, Iterable, Iterator, TypeVar
 
+# run_metrics and input_yaml are shared with the framework scripts in src/
+_SRC_DIR = Path(__file__).resolve().parents[3] / "src"
+if str(_SRC_DIR) not in sys.path:
+	sys.path.append(str(_SRC_DIR))
 
-def _read_file_list(file_list_path: str) -> list[str]:
-	with open(file_list_path, encoding="utf-8") as handle:
-		return [line.strip() for line in handle if line.strip() and not line.lstrip().startswith("#")]
+from input_yaml import read_input_yaml
+from run_metrics import RunMetrics
+from shard_store import SHARD_SUFFIX, ShardWriter, remove_shard
+from ssh_pool import ConnectionSlots, SshConnection
+from transfer_codecs import REMOTE_PROGRAMS, Codec, local_programs, parse_codec, resolve_codec, usable_codecs
+from transfer_ledger import Manifest, TransferLedger, read_manifest
+
+T = TypeVar("T")
 
 
 def _run(cmd: list[str], *, capture_output: bool = False) -> subprocess.CompletedProcess:
@@ -26,26 +43,6 @@ def _run(cmd: list[str], *, capture_output: bool = False) -> subprocess.Complete
 	return subprocess.run(cmd, check=True, capture_output=capture_output)
 
 
-def _ssh_cmd(hostname: str, username: str, key: str, remote_command: str) -> list[str]:
-	return [
-		"ssh",
-		"-i",
-		key,
-		f"{username}@{hostname}",
-		remote_command,
-	]
-
-
-def _scp_pull_cmd(hostname: str, username: str, key: str, remote_path: str, local_path: str) -> list[str]:
-	return [
-		"scp",
-		"-i",
-		key,
-		f"{username}@{hostname}:{remote_path}",
-		local_path,
-	]
-
-
 @dataclass
 class TransferLayout:
 	hostname: str
@@ -57,7 +54,28 @@ class TransferLayout:
 	local_output_dir: Path
 	local_archive_path: Path
 	payload_dir: Path
+	destinations: DestinationRegistry
+	connection: SshConnection
 	keep_local_archive: bool
+	transfer_mode: str = "archive"
+	codec: Codec = Codec("gzip", decoder="gzip")
+	label: str = ""
+	storage: str = "files"
+	shard_name: str = ""
+	# Shared by every stream's copy of the layout
+	metrics: RunMetrics = field(default_factory=RunMetrics)
+
+
+TRANSFER_MODES = ("archive", "pipe")
+
+# files: one flattened file per remote file; shard: one packed tar plus offset index per stream
+STORAGE_MODES = ("files", "shard")
+
+# Files timed per candidate codec when codec is auto
+AUTO_CODEC_SAMPLE_FILES = 32
+
+# Failures worth retrying a stream for (ssh/scp/tar exits and truncated tar streams)
+_RETRYABLE_ERRORS = (subprocess.CalledProcessError, tarfile.TarError)
 
 
 def compress_pull_extract(
@@ -70,12 +88,33 @@ def compress_pull_extract(
 	archive_basename: str | None = None,
 	keep_local_archive: bool = False,
 	remote_archive_dir: str | None = None,
+	streams: int = 1,
+	stream_retries: int = 2,
+	transfer_mode: str = "archive",
+	codec: str = "gzip",
+	codec_level: int | str | None = None,
+	codec_threads: int | str | None = None,
+	ssh_multiplex: bool = True,
+	ssh_max_connections: int = 0,
+	ssh_slots_dir: str | None = None,
+	ledger_path: str | None = None,
+	stats_file: str | None = None,
+	metrics: RunMetrics | None = None,
+	storage: str = "files",
 ) -> Path:
-	file_names = _read_file_list(file_list_path)
-	if not file_names:
+	metrics = metrics or RunMetrics()
+	manifest = read_manifest(file_list_path)
+	if not manifest:
 		raise ValueError("No files found in manifest; nothing to transfer.")
-
-	layout = _build_layout(
+	if transfer_mode not in TRANSFER_MODES:
+		raise ValueError(f"Unknown transfer_mode {transfer_mode!r}; expected one of {', '.join(TRANSFER_MODES)}")
+	if storage not in STORAGE_MODES:
+		raise ValueError(f"Unknown storage {storage!r}; expected one of {', '.join(STORAGE_MODES)}")
+	if storage == "shard":
+		# Shards are filled straight from the tar stream
+		transfer_mode = "pipe"
+
+	layout = build_layout(
 		hostname=hostname,
 		username=username,
 		key_filename=key_filename,
@@ -83,54 +122,361 @@ def compress_pull_extract(
 		archive_basename=archive_basename,
 		keep_local_archive=keep_local_archive,
 		remote_archive_dir=remote_archive_dir,
+		transfer_mode=transfer_mode,
+		ssh_multiplex=ssh_multiplex,
+		ssh_max_connections=ssh_max_connections,
+		ssh_slots_dir=ssh_slots_dir,
+		metrics=metrics,
 	)
+	layout = replace(layout, storage=storage, shard_name=Path(file_list_path).name)
+	ledger = TransferLedger(
+		Path(ledger_path) if ledger_path else layout.local_output_dir / ".transfer_ledgers" / f"{Path(file_list_path).name}.tsv"
+	)
+	with metrics.phase("_plan_delta"):
+		file_names = _plan_delta(layout, manifest, ledger)
+	skipped = len(manifest) - len(file_names)
+	print(f"Delta: {len(file_names)} files to send, {skipped} already up to date")
+	sent = 0
+	if file_names:
+		previous = {entry.name for entry in ledger.entries.values()}
+		with ExitStack() as stack:
+			with metrics.phase("ssh_connect"):
+				stack.enter_context(layout.connection)
+			sent = _run_transfer(
+				layout, file_names, manifest, ledger, codec, codec_level, codec_threads, archive_basename, streams, stream_retries
+			)
+		if storage == "shard":
+			# Shards from an earlier run of this chunk (e.g. with another stream count) are now superseded
+			for name in previous - {entry.name for entry in ledger.entries.values()}:
+				if name.endswith(SHARD_SUFFIX):
+					remove_shard(layout.payload_dir / name)
+	metrics.count(files_listed=len(manifest), files_processed=sent, files_skipped=skipped)
+	if stats_file:
+		Path(stats_file).write_text(f"Files sent: {sent}\nFiles skipped: {skipped}\n", encoding="utf-8")
+	return layout.local_output_dir
+
+
+def _plan_delta(layout: TransferLayout, manifest: Manifest, ledger: TransferLedger) -> list[str]:
+	"""Manifest paths that are new or changed since the ledger last saw them.
+
+	Older copies are left in place until the new copy has arrived (see
+	``_replace_previous``), so a failed transfer still leaves the old one.
+	A shard is rewritten whole, so with shard storage any change resends the
+	whole manifest.
+	"""
+	present = layout.destinations.taken
+	if layout.storage == "shard":
+		current = all(ledger.is_current(remote_path, metadata, present) for remote_path, metadata in manifest.items())
+		return [] if current else list(manifest)
+	return [
+		remote_path for remote_path, metadata in manifest.items() if not ledger.is_current(remote_path, metadata, present)
+	]
 
+
+def _replace_previous(layout: TransferLayout, placed: dict[str, str], ledger: TransferLedger) -> None:
+	"""Move each newly placed file over the copy the ledger recorded for it, so it keeps its old name.
+
+	Only the name the ledger holds for that remote path is reused: a file under
+	the same flattened name may belong to another remote path.
+	"""
+	if layout.storage != "files":
+		return
+	present = layout.destinations.taken
+	for remote_path, name in placed.items():
+		previous = ledger.entries.get(remote_path)
+		if previous is not None and previous.name != name and previous.name in present:
+			layout.destinations.replace(layout.payload_dir / name, layout.payload_dir / previous.name)
+			placed[remote_path] = previous.name
+
+
+def _run_transfer(
+	layout: TransferLayout,
+	file_names: list[str],
+	manifest: Manifest,
+	ledger: TransferLedger,
+	codec: str,
+	codec_level: int | str | None,
+	codec_threads: int | str | None,
+	archive_basename: str | None,
+	streams: int,
+	stream_retries: int,
+) -> int:
+	"""Send ``file_names``, recording each finished stream in the ledger; returns the number of files placed."""
+	with layout.metrics.phase("_choose_codec"):
+		layout = choose_codec(layout, file_names, codec, codec_level, codec_threads, archive_basename)
+
+	def send(stream_layout: TransferLayout, group: list[str]) -> int:
+		placed = _transfer_stream(stream_layout, group, stream_retries)
+		_replace_previous(stream_layout, placed, ledger)
+		with layout.metrics.phase("ledger"):
+			ledger.record(placed, manifest)
+		return len(placed)
+
+	planned = plan_streams(layout, file_names, manifest, streams)
+	if len(planned) == 1:
+		return send(*planned[0])
+
+	print(f"Transferring {len(file_names)} files in {len(planned)} parallel streams...")
+	with ThreadPoolExecutor(max_workers=len(planned)) as pool:
+		futures = [pool.submit(in_stream_slot, send, stream_layout, group) for stream_layout, group in planned]
+		errors = [future.exception() for future in futures]
+	failed = [error for error in errors if error is not None]
+	if failed:
+		raise failed[0]
+	return sum(future.result() for future in futures)
+
+
+def _transfer_stream(layout: TransferLayout, file_names: list[str], retries: int) -> dict[str, str]:
+	"""Compress, fetch and extract one (sub-)manifest, retrying just this stream on failure.
+
+	Returns the local name each delivered remote path was placed under.
+	"""
+	return retry_stream(layout, partial(_attempt_stream, layout, file_names), retries)
+
+
+def _attempt_stream(layout: TransferLayout, file_names: list[str]) -> dict[str, str]:
 	try:
-		_create_remote_archive(layout, file_names)
-		_fetch_archive(layout)
-		_extract_flat(layout, file_names)
+		if layout.storage == "shard":
+			with layout.metrics.phase("_pipe_shard"):
+				return _pipe_shard(layout, file_names)
+		if layout.transfer_mode == "pipe":
+			with layout.metrics.phase("_pipe_extract"):
+				return _pipe_extract(layout, file_names)
+		with layout.metrics.phase("_create_remote_archive"):
+			_create_remote_archive(layout, file_names)
+		with layout.metrics.phase("_fetch_archive"):
+			_fetch_archive(layout)
+		with layout.metrics.phase("_extract_flat"):
+			return _extract_flat(layout, file_names)
 	finally:
-		_cleanup(layout)
+		if layout.transfer_mode != "pipe":
+			with layout.metrics.phase("_cleanup"):
+				_cleanup(layout)
+
+
+def retry_stream(layout: TransferLayout, attempt: Callable[[], T], retries: int) -> T:
+	"""Call ``attempt`` again, up to ``retries`` times, while it fails with a broken ssh or tar stream."""
+	for number in range(retries + 1):
+		try:
+			return attempt()
+		except _RETRYABLE_ERRORS as error:
+			if number == retries:
+				raise
+			print(f"{layout.label}Attempt {number + 1} failed ({error}); retrying...")
+
+
+def in_stream_slot(work: Callable[..., T], layout: TransferLayout, *args) -> T:
+	"""Run ``work(layout, *args)`` for one of several parallel streams, holding its connection slot.
+
+	See ``SshConnection.stream_slot``: without a shared master each stream
+	counts against ``ssh_max_connections`` on its own.
+	"""
+	with layout.connection.stream_slot():
+		return work(layout, *args)
+
+
+def plan_streams(
+	layout: TransferLayout,
+	remote_paths: list[str],
+	manifest: Manifest,
+	streams: int,
+) -> list[tuple[TransferLayout, list[str]]]:
+	"""Split ``remote_paths`` into up to ``streams`` groups of similar total size, each with its own layout.
+
+	Sizes come from the manifest when it lists them, else from one remote
+	``stat``. A single stream keeps ``layout`` itself; parallel ones get their
+	own archive name, log label and shard name.
+	"""
+	streams = max(1, min(streams, len(remote_paths)))
+	if streams == 1:
+		return [(layout, remote_paths)]
+	if all(manifest.get(name) is not None for name in remote_paths):
+		sizes = {name: int(manifest[name][0]) for name in remote_paths}  # type: ignore[index]
+	else:
+		with layout.metrics.phase("_remote_file_sizes"):
+			sizes = _remote_file_sizes(layout, remote_paths)
+	groups = _balance_by_size(remote_paths, sizes, streams)
+	return [(_stream_layout(layout, index), group) for index, group in enumerate(groups)]
+
+
+def _stream_layout(layout: TransferLayout, index: int) -> TransferLayout:
+	stem, dot, suffix = layout.archive_name.partition(".")
+	archive_name = f"{stem}_s{index:02d}{dot}{suffix}"
+	return replace(
+		layout,
+		archive_name=archive_name,
+		remote_archive_path=f"{layout.remote_archive_dir}/{archive_name}",
+		local_archive_path=layout.local_output_dir / archive_name,
+		label=f"[stream {index}] ",
+		shard_name=f"{layout.shard_name}_s{index:02d}",
+	)
 
-	return layout.local_output_dir
+
+def _remote_file_sizes(layout: TransferLayout, file_names: list[str]) -> dict[str, int]:
+	"""Look up remote file sizes in one ssh call; unreadable files count as size 0."""
+	remote_cmd = "xargs -d '\\n' stat --printf '%s\\t%n\\n' -- 2>/dev/null || true"
+	ssh_cmd = layout.connection.ssh(remote_cmd)
+	completed = subprocess.run(
+		ssh_cmd,
+		input="".join(f"{path}\n" for path in file_names),
+		capture_output=True,
+		text=True,
+		check=True,
+	)
+	sizes: dict[str, int] = {}
+	for line in completed.stdout.splitlines():
+		size, _, name = line.partition("\t")
+		if size.isdigit():
+			sizes[name] = int(size)
+	return sizes
+
+
+def _balance_by_size(file_names: list[str], sizes: dict[str, int], streams: int) -> list[list[str]]:
+	"""Split files into ``streams`` groups of similar total size (largest first, into the lightest group)."""
+	loads = [0] * streams
+	groups: list[list[str]] = [[] for _ in range(streams)]
+	# A repeated path must land in one stream only, as it would in a single archive
+	unique_names = list(dict.fromkeys(file_names))
+	for name in sorted(unique_names, key=lambda name: sizes.get(name, 0), reverse=True):
+		lightest = min(range(streams), key=lambda index: (loads[index], len(groups[index])))
+		groups[lightest].append(name)
+		loads[lightest] += sizes.get(name, 0)
+	return [group for group in groups if group]
+
+
+def choose_codec(
+	layout: TransferLayout,
+	remote_paths: list[str],
+	name: str | None,
+	level: str | int | None = None,
+	threads: str | int | None = None,
+	archive_basename: str | None = None,
+) -> TransferLayout:
+	"""``layout`` set up for the codec ``name`` (``auto`` times the candidates on a sample of ``remote_paths``)."""
+	return _with_codec(layout, _choose_codec(layout, remote_paths, name, level, threads), archive_basename)
+
+
+def _choose_codec(
+	layout: TransferLayout,
+	file_names: list[str],
+	name: str | None,
+	level: str | int | None,
+	threads: str | int | None,
+) -> Codec:
+	requested = parse_codec(name, level, threads)
+	local = local_programs()
+	if requested is not None and requested.name in ("gzip", "none"):
+		# tar -z always needed gzip on the remote side; skip the extra round trip
+		remote = {"gzip"}
+	else:
+		remote = _remote_programs(layout)
+	if requested is not None:
+		codec = resolve_codec(requested, remote, local)
+	else:
+		codec = _auto_codec(layout, file_names, remote, local, int(threads) if threads not in (None, "") else None)
+	print(f"Compression codec: {codec.describe()}")
+	return codec
+
+
+def _remote_programs(layout: TransferLayout) -> set[str]:
+	probe = "; ".join(f"command -v {program} >/dev/null 2>&1 && echo {program}" for program in REMOTE_PROGRAMS)
+	result = _run(layout.connection.ssh(f"{probe}; true"), capture_output=True)
+	return set(result.stdout.decode().split())
+
+
+def _auto_codec(
+	layout: TransferLayout,
+	file_names: list[str],
+	remote: set[str],
+	local: set[str],
+	threads: int | None,
+) -> Codec:
+	"""Pick the codec with the highest effective throughput (raw tar bytes per second of wall time) on a sample."""
+	step = max(1, len(file_names) // AUTO_CODEC_SAMPLE_FILES)
+	sample = file_names[::step][:AUTO_CODEC_SAMPLE_FILES]
+	best: tuple[float, Codec] | None = None
+	for name in usable_codecs(remote, local):
+		codec = resolve_codec(Codec(name, threads=threads if name in ("pigz", "zstd") else None), remote, local)
+		seconds, raw_bytes = _time_codec(layout, codec, sample)
+		throughput = raw_bytes / max(seconds, 1e-9)
+		print(f"Codec auto: {codec.describe()} moved {raw_bytes / 1e6:.1f} MB in {seconds:.2f}s ({throughput / 1e6:.1f} MB/s)")
+		if best is None or throughput > best[0]:
+			best = (throughput, codec)
+	assert best is not None
+	return best[1]
+
+
+def _time_codec(layout: TransferLayout, codec: Codec, sample: list[str]) -> tuple[float, int]:
+	start = time.perf_counter()
+	with _open_tar_stream(layout, codec, sample) as stream:
+		raw_bytes = 0
+		while chunk := stream.read(1 << 20):
+			raw_bytes += len(chunk)
+	return time.perf_counter() - start, raw_bytes
+
+
+def _with_codec(layout: TransferLayout, codec: Codec, archive_basename: str | None) -> TransferLayout:
+	archive_name = archive_basename or f"pull_{uuid.uuid4().hex}{codec.extension}"
+	return replace(
+		layout,
+		codec=codec,
+		archive_name=archive_name,
+		remote_archive_path=f"{layout.remote_archive_dir}/{archive_name}",
+		local_archive_path=layout.local_output_dir / archive_name,
+	)
 
 
-def _build_layout(
+def build_layout(
 	*,
 	hostname: str,
 	username: str,
 	key_filename: str,
 	local_output_dir: str,
-	archive_basename: str | None,
-	keep_local_archive: bool,
-	remote_archive_dir: str | None,
+	archive_basename: str | None = None,
+	keep_local_archive: bool = False,
+	remote_archive_dir: str | None = None,
+	transfer_mode: str = "archive",
+	ssh_multiplex: bool = True,
+	ssh_max_connections: int = 0,
+	ssh_slots_dir: str | None = None,
+	metrics: RunMetrics | None = None,
 ) -> TransferLayout:
+	"""Paths, destination registry and ssh connection of one transfer (enter ``layout.connection`` to connect)."""
 	archive_name = archive_basename or f"pull_{uuid.uuid4().hex}.tar.gz"
 	remote_dir = (remote_archive_dir or posixpath.join("/home", username, ".remote_transfer_archives")).rstrip("/")
 	local_dir = Path(local_output_dir).expanduser().resolve()
 	local_dir.mkdir(parents=True, exist_ok=True)
 	payload_dir = local_dir
+	slots = None
+	if ssh_max_connections > 0:
+		slots_dir = Path(os.path.expanduser(ssh_slots_dir)) if ssh_slots_dir else local_dir / ".ssh_slots"
+		slots = ConnectionSlots(slots_dir, ssh_max_connections)
+	key = os.path.expanduser(key_filename)
 	return TransferLayout(
 		hostname=hostname,
 		username=username,
-		key_filename=os.path.expanduser(key_filename),
+		key_filename=key,
 		archive_name=archive_name,
 		remote_archive_dir=remote_dir,
 		remote_archive_path=f"{remote_dir}/{archive_name}",
 		local_output_dir=local_dir,
 		local_archive_path=local_dir / archive_name,
 		payload_dir=payload_dir,
+		destinations=DestinationRegistry(payload_dir),
+		connection=SshConnection(hostname, username, key, multiplex=ssh_multiplex, slots=slots),
 		keep_local_archive=keep_local_archive,
+		transfer_mode=transfer_mode,
+		metrics=metrics or RunMetrics(),
 	)
 
 
 def _create_remote_archive(layout: TransferLayout, file_names: list[str]) -> None:
-	print("Creating remote archive...")
-	remote_cmd = (
-		f"set -euo pipefail; mkdir -p {shlex.quote(layout.remote_archive_dir)} && "
-		f"tar -czf {shlex.quote(layout.remote_archive_path)} -T -"
-	)
-	ssh_cmd = _ssh_cmd(layout.hostname, layout.username, layout.key_filename, remote_cmd)
+	print(f"{layout.label}Creating remote archive...")
+	compress = layout.codec.compress_command()
+	archive_path = shlex.quote(layout.remote_archive_path)
+	tar_cmd = f"tar -cf - -T - | {compress} > {archive_path}" if compress else f"tar -cf {archive_path} -T -"
+	remote_cmd = f"set -euo pipefail; mkdir -p {shlex.quote(layout.remote_archive_dir)} && {tar_cmd}"
+	ssh_cmd = layout.connection.ssh(remote_cmd)
 	with subprocess.Popen(ssh_cmd, stdin=subprocess.PIPE, text=True) as proc:
 		assert proc.stdin is not None
 		for path in file_names:
@@ -142,36 +488,172 @@ def _create_remote_archive(layout: TransferLayout, file_names: list[str]) -> Non
 
 
 def _fetch_archive(layout: TransferLayout) -> None:
-	print("Downloading archive...")
+	print(f"{layout.label}Downloading archive...")
 	_run(
-		_scp_pull_cmd(
-			layout.hostname,
-			layout.username,
-			layout.key_filename,
-			layout.remote_archive_path,
-			str(layout.local_archive_path),
-		)
+		layout.connection.scp_pull(layout.remote_archive_path, str(layout.local_archive_path))
 	)
 
 
-def _extract_flat(layout: TransferLayout, remote_paths: list[str]) -> None:
-	print("Extracting locally (flattened)...")
+def _extract_flat(layout: TransferLayout, remote_paths: list[str]) -> dict[str, str]:
+	print(f"{layout.label}Extracting locally (flattened)...")
 	temp_dir = Path(tempfile.mkdtemp(prefix="transfer_extract_", dir=layout.local_output_dir))
+	placed: dict[str, str] = {}
+	delivered_bytes = 0
 	try:
-		_run(["tar", "-xzf", str(layout.local_archive_path), "-C", str(temp_dir)])
+		decoder = ["-I", layout.codec.decoder] if layout.codec.decoder else []
+		_run(["tar", "-xf", str(layout.local_archive_path), *decoder, "-C", str(temp_dir)])
 		for original in remote_paths:
 			source = temp_dir / original.lstrip("/")
-			if not source.exists():
+			try:
+				delivered_bytes += source.stat().st_size
+			except FileNotFoundError:
 				print(f"Warning: expected file {original} missing in archive")
 				continue
-			dest = _next_destination(layout.payload_dir, _flattened_filename(original))
-			dest.parent.mkdir(parents=True, exist_ok=True)
-			shutil.move(str(source), dest)
+			dest, _ = layout.destinations.place(flattened_filename(original), partial(_move_exclusive, source))
+			placed[original] = dest.name
 	finally:
 		shutil.rmtree(temp_dir, ignore_errors=True)
+	layout.metrics.count(bytes_transferred=delivered_bytes)
+	return placed
+
+
+def _pipe_extract(layout: TransferLayout, remote_paths: list[str]) -> dict[str, str]:
+	"""Stream ``tar`` output over ssh and write each member straight to its flattened destination.
+
+	Nothing is staged: there is no remote archive, no local archive and no temp
+	dir. Files written by a failed attempt are removed so a retry starts clean.
+	"""
+	print(f"{layout.label}Streaming remote tar into flattened output...")
+	placed: dict[str, str] = {}
+	delivered_bytes = 0
+
+	try:
+		with open_remote_members(layout, remote_paths) as members:
+			for remote_path, member, source in members:
+				dest, handle = layout.destinations.place(flattened_filename(remote_path), partial(open, mode="xb"))
+				placed[remote_path] = dest.name
+				with handle:
+					shutil.copyfileobj(source, handle)
+				os.chmod(dest, member.mode)
+				os.utime(dest, (member.mtime, member.mtime))
+				delivered_bytes += member.size
+	except BaseException:
+		for name in placed.values():
+			layout.destinations.release(layout.payload_dir / name)
+		raise
+
+	_warn_missing(remote_paths, placed)
+	layout.metrics.count(bytes_transferred=delivered_bytes)
+	return placed
+
+
+def _pipe_shard(layout: TransferLayout, remote_paths: list[str]) -> dict[str, str]:
+	"""Stream ``tar`` output over ssh into one packed shard and its offset index.
+
+	Members are copied into the shard as they arrive; the shard and index only
+	replace an earlier copy once the whole stream has been read and checked, so
+	a failed attempt leaves nothing behind.
+	"""
+	print(f"{layout.label}Streaming remote tar into shard {layout.shard_name}{SHARD_SUFFIX}...")
+	placed: dict[str, str] = {}
+	delivered_bytes = 0
+
+	with ShardWriter(layout.payload_dir, layout.shard_name) as shard, open_remote_members(layout, remote_paths) as members:
+		for remote_path, member, source in members:
+			shard.add(remote_path, member, source)
+			placed[remote_path] = shard.path.name
+			delivered_bytes += member.size
+
+	_warn_missing(remote_paths, placed)
+	layout.metrics.count(bytes_transferred=delivered_bytes)
+	return placed
+
+
+@contextmanager
+def open_remote_members(
+	layout: TransferLayout, remote_paths: list[str]
+) -> Iterator[Iterator[tuple[str, tarfile.TarInfo, IO[bytes]]]]:
+	"""Stream ``remote_paths`` over ssh as one tar and yield an iterator of ``(remote path, member, file object)``.
+
+	Each listed regular file comes once, in stream order; read its file object
+	before moving on. A broken stream raises ``CalledProcessError`` or
+	``TarError`` (which ``retry_stream`` retries).
+	"""
+	wanted = {path.lstrip("/"): path for path in remote_paths}
+
+	def members(archive: tarfile.TarFile) -> Iterator[tuple[str, tarfile.TarInfo, IO[bytes]]]:
+		seen: set[str] = set()
+		for member in archive:
+			remote_path = wanted.get(member.name)
+			if not member.isfile() or remote_path is None or remote_path in seen:
+				continue
+			seen.add(remote_path)
+			source = archive.extractfile(member)
+			assert source is not None
+			yield remote_path, member, source
+
+	with _open_tar_stream(layout, layout.codec, remote_paths) as stream, tarfile.open(fileobj=stream, mode="r|") as archive:
+		yield members(archive)
+
+
+def _warn_missing(remote_paths: list[str], delivered: Iterable[str]) -> None:
+	delivered = set(delivered)
+	for original in dict.fromkeys(remote_paths):
+		if original not in delivered:
+			print(f"Warning: expected file {original} missing in archive")
+
+
+@contextmanager
+def _open_tar_stream(layout: TransferLayout, codec: Codec, remote_paths: list[str]) -> Iterator[IO[bytes]]:
+	"""Run ``tar`` plus the codec's compressor remotely and yield the locally decompressed tar stream.
+
+	Raises ``CalledProcessError`` on exit if ssh, the remote pipeline or the
+	local decompressor failed.
+	"""
+	compress = codec.compress_command()
+	remote_cmd = f"set -o pipefail; tar -cf - -T - | {compress}" if compress else "tar -cf - -T -"
+	ssh_cmd = layout.connection.ssh(remote_cmd)
+	ssh = subprocess.Popen(ssh_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+	processes = [ssh]
+	stream = ssh.stdout
+	decompress = codec.decompress_command()
+	if decompress:
+		decoder = subprocess.Popen(decompress, stdin=ssh.stdout, stdout=subprocess.PIPE)
+		ssh.stdout.close()
+		processes.append(decoder)
+		stream = decoder.stdout
+	assert stream is not None
+	# Feed the manifest from a thread: tar starts writing before it has read the whole list
+	feeder = threading.Thread(target=_write_manifest, args=(ssh.stdin, remote_paths), daemon=True)
+	feeder.start()
+	try:
+		yield stream
+		# Drain the end-of-archive padding so nothing upstream dies of SIGPIPE
+		while stream.read(1 << 16):
+			pass
+		stream.close()
+		for process in reversed(processes):
+			returncode = process.wait()
+			if returncode != 0:
+				raise subprocess.CalledProcessError(returncode, process.args)
+		feeder.join()
+	except BaseException:
+		for process in processes:
+			process.kill()
+			process.wait()
+		raise
+
+
+def _write_manifest(stdin, remote_paths: list[str]) -> None:
+	try:
+		for path in remote_paths:
+			stdin.write(f"{path}\n".encode("utf-8"))
+		stdin.close()
+	except BrokenPipeError:
+		pass
 
 
-def _flattened_filename(remote_path: str) -> str:
+def flattened_filename(remote_path: str) -> str:
 	"""Turn /a/b/file.txt into a___b___file.txt so the full path stays visible."""
 	cleaned = remote_path.strip().lstrip("/")
 	if not cleaned:
@@ -179,27 +661,88 @@ def _flattened_filename(remote_path: str) -> str:
 	return cleaned.replace("/", "___")
 
 
-def _next_destination(target_dir: Path, filename: str) -> Path:
-	base = Path(filename).name or "unnamed"
-	dest = target_dir / base
-	if not dest.exists():
-		return dest
-	stem = dest.stem
-	suffix = dest.suffix
-	idx = 1
-	while True:
-		candidate = target_dir / f"{stem}_{idx}{suffix}"
-		if not candidate.exists():
-			return candidate
-		idx += 1
+class DestinationRegistry:
+	"""Hands out unique flattened names in one output directory without probing the filesystem.
+
+	The directory is listed once; after that taken names live in a set and each
+	name's next collision suffix (``stem_1``, ``stem_2``, ...) comes from a counter.
+	Files are placed with exclusive creation (``link`` / ``O_EXCL``), so array tasks
+	sharing the directory never overwrite each other: a name another task claimed
+	since the listing fails with ``FileExistsError`` and the next suffix is tried.
+	"""
+
+	def __init__(self, target_dir: Path) -> None:
+		self.target_dir = target_dir
+		with os.scandir(target_dir) as entries:
+			self.taken = {entry.name for entry in entries}
+		self.counters: dict[str, int] = {}
+		self.lock = threading.Lock()
+
+	def place(self, filename: str, create: Callable[[Path], T]) -> tuple[Path, T]:
+		"""Call ``create(dest)`` on the first free name for ``filename``; ``create`` must fail if dest exists."""
+		base = Path(filename).name or "unnamed"
+		while True:
+			dest = self.target_dir / self._reserve(base)
+			try:
+				return dest, create(dest)
+			except FileExistsError:
+				continue
+
+	def release(self, path: Path) -> None:
+		"""Delete a placed file and make its name available again (used when a stream is retried)."""
+		with self.lock:
+			path.unlink(missing_ok=True)
+			self.taken.discard(path.name)
+			# Counters are only lower bounds; restarting them keeps the lowest free suffix
+			self.counters.clear()
+
+	def replace(self, path: Path, target: Path) -> None:
+		"""Atomically move a placed file over ``target``, freeing the file's own name."""
+		with self.lock:
+			os.replace(path, target)
+			self.taken.discard(path.name)
+			self.counters.clear()
+
+	def _reserve(self, base: str) -> str:
+		with self.lock:
+			if base not in self.taken:
+				name = base
+			else:
+				stem, suffix = os.path.splitext(base)
+				idx = self.counters.get(base, 1)
+				while f"{stem}_{idx}{suffix}" in self.taken:
+					idx += 1
+				self.counters[base] = idx + 1
+				name = f"{stem}_{idx}{suffix}"
+			self.taken.add(name)
+			return name
+
+
+def _move_exclusive(source: Path, dest: Path) -> None:
+	"""Move ``source`` to ``dest``, raising ``FileExistsError`` instead of replacing an existing file."""
+	try:
+		os.link(source, dest)
+	except OSError as error:
+		if isinstance(error, FileExistsError) or error.errno not in (errno.EXDEV, errno.EPERM, errno.ENOTSUP):
+			raise
+		# Different filesystem (or no hard links): copy into an exclusively created file
+		with open(source, "rb") as reader, open(dest, "xb") as writer:
+			shutil.copyfileobj(reader, writer)
+		shutil.copystat(source, dest)
+	os.unlink(source)
 
 
 def _cleanup(layout: TransferLayout) -> None:
-	print("Cleaning remote archive...")
+	print(f"{layout.label}Cleaning remote archive...")
 	cleanup_cmd = f"rm -f {shlex.quote(layout.remote_archive_path)}"
-	_run(_ssh_cmd(layout.hostname, layout.username, layout.key_filename, cleanup_cmd))
+	# Best effort: this runs after failed attempts too, often because the connection dropped,
+	# and must not hide that error from the retry loop
+	try:
+		_run(layout.connection.ssh(cleanup_cmd))
+	except (subprocess.CalledProcessError, OSError) as error:
+		print(f"{layout.label}Warning: could not remove remote archive {layout.remote_archive_path} ({error})")
 	if not layout.keep_local_archive and layout.local_archive_path.exists():
-		print("Removing local archive...")
+		print(f"{layout.label}Removing local archive...")
 		layout.local_archive_path.unlink()
 
 
@@ -218,6 +761,16 @@ def build_parser() -> argparse.ArgumentParser:
 		default="./downloaded_remote_files",
 		help="Directory where the downloaded files will be extracted.",
 	)
+	parser.add_argument(
+		"--stats-file",
+		default=None,
+		help="Optional file to write 'Files sent' / 'Files skipped' counts to.",
+	)
+	parser.add_argument(
+		"--metrics-file",
+		default=None,
+		help="Optional file to append a JSON line of timings and resource use for this transfer to.",
+	)
 	return parser
 
 
@@ -229,24 +782,12 @@ def _parse_bool(value: str | bool | None) -> bool:
 	return str(value).strip().lower() in {"1", "true", "yes", "on"}
 
 
-def _load_transfer_config(input_yaml: str) -> dict[str, str | bool | None]:
+def load_transfer_config(input_yaml: str) -> dict[str, str | bool | None]:
 	yaml_path = Path(input_yaml)
 	if not yaml_path.exists():
 		raise FileNotFoundError(f"YAML file not found: {input_yaml}")
 
-	config: dict[str, str] = {}
-	for raw_line in yaml_path.read_text(encoding="utf-8").splitlines():
-		line = raw_line.split("#", 1)[0].strip()
-		if not line:
-			continue
-		if ":" not in line:
-			continue
-		key, value = line.split(":", 1)
-		key = key.strip()
-		value = value.strip()
-		if value and value[0] in {"'", '"'} and value[-1] == value[0]:
-			value = value[1:-1]
-		config[key] = value
+	config = read_input_yaml(yaml_path)
 
 	required_keys = ["hostname", "username", "key_filename", "file_list"]
 	missing = [k for k in required_keys if not config.get(k)]
@@ -263,6 +804,23 @@ def _load_transfer_config(input_yaml: str) -> dict[str, str | bool | None]:
 	archive_basename = config.get("archive_basename") or None
 	keep_archive = _parse_bool(config.get("keep_archive"))
 	remote_archive_dir = config.get("remote_archive_dir") or None
+	streams = int(config.get("streams") or 1)
+	stream_retries = int(config.get("stream_retries") or 2)
+	transfer_mode = config.get("transfer_mode") or "archive"
+	storage = config.get("storage") or "files"
+	codec = config.get("codec") or "gzip"
+	codec_level = config.get("codec_level") or None
+	codec_threads = config.get("codec_threads") or None
+	ledger_value = config.get("ledger") or None
+	ledger_path: str | None = None
+	if ledger_value:
+		candidate = Path(os.path.expanduser(ledger_value))
+		ledger_path = str(candidate if candidate.is_absolute() else (yaml_path.parent / candidate).resolve())
+	ssh_multiplex = _parse_bool(config.get("ssh_multiplex") or "true")
+	ssh_max_connections = int(config.get("ssh_max_connections") or 0)
+	ssh_slots_dir = config.get("ssh_slots_dir") or None
+	if ssh_slots_dir and not Path(os.path.expanduser(ssh_slots_dir)).is_absolute():
+		ssh_slots_dir = str((yaml_path.parent / ssh_slots_dir).resolve())
 	transferred_dir_value = config.get("transferred_files_dir") or config.get("shared_transfer_dir") or None
 	transferred_dir_path: str | None = None
 	if transferred_dir_value:
@@ -279,23 +837,47 @@ def _load_transfer_config(input_yaml: str) -> dict[str, str | bool | None]:
 		"archive_basename": archive_basename,
 		"keep_local_archive": keep_archive,
 		"remote_archive_dir": remote_archive_dir,
+		"streams": streams,
+		"stream_retries": stream_retries,
+		"transfer_mode": transfer_mode,
+		"storage": storage,
+		"codec": codec,
+		"codec_level": codec_level,
+		"codec_threads": codec_threads,
+		"ssh_multiplex": ssh_multiplex,
+		"ssh_max_connections": ssh_max_connections,
+		"ssh_slots_dir": ssh_slots_dir,
+		"ledger_path": ledger_path,
 		"transferred_files_dir": transferred_dir_path,
 	}
 
 
-def compress_pull_extract_from_yaml(input_yaml: str, local_output_dir: str) -> Path:
+def compress_pull_extract_from_yaml(
+	input_yaml: str,
+	local_output_dir: str,
+	stats_file: str | None = None,
+	metrics: RunMetrics | None = None,
+) -> Path:
 	"""Load connection settings from YAML and execute the transfer."""
 
-	config = _load_transfer_config(input_yaml)
+	config = load_transfer_config(input_yaml)
 	preferred_output = config.pop("transferred_files_dir", None)
 	config["local_output_dir"] = preferred_output or local_output_dir
+	config["stats_file"] = stats_file
+	config["metrics"] = metrics
 	return compress_pull_extract(**config)  # type: ignore[arg-type]
 
 
 def main(argv: Iterable[str] | None = None) -> None:
 	parser = build_parser()
 	args = parser.parse_args(argv)
-	compress_pull_extract_from_yaml(args.input_yaml, args.local_output_dir)
+	metrics = RunMetrics(args.metrics_file, "compress_pull_extract")
+	try:
+		compress_pull_extract_from_yaml(args.input_yaml, args.local_output_dir, args.stats_file, metrics)
+	except BaseException:
+		metrics.write("error")
+		raise
+	metrics.write()
 
 
 if __name__ == "__main__":
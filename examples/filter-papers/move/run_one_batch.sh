@@ -47,7 +47,9 @@ echo "Output directory: $OUTPUT_DIR"
 # Trigger the remote-to-local transfer for this batch
 python3 "$SCRIPT_DIR/compress_pull_extract.py" \
     --input-yaml "$INPUT_YAML" \
-    --local-output "$TRANSFER_DIR"
+    --local-output "$TRANSFER_DIR" \
+    --stats-file "$OUTPUT_DIR/transfer_stats.txt" \
+    --metrics-file "$OUTPUT_DIR/metrics.jsonl"
 ##########################################
 
 # Create an info file
@@ -56,6 +58,9 @@ echo "Input file: $INPUT_YAML" >> "$OUTPUT_DIR/info.txt"
 if [ -n "$TRANSFER_DIR" ]; then
     echo "Transferred files dir: $TRANSFER_DIR" >> "$OUTPUT_DIR/info.txt"
 fi
+if [ -f "$OUTPUT_DIR/transfer_stats.txt" ]; then
+    cat "$OUTPUT_DIR/transfer_stats.txt" >> "$OUTPUT_DIR/info.txt"
+fi
 cat "$INPUT_YAML" >> "$OUTPUT_DIR/info.txt"
 
 echo "Simulation completed successfully!"
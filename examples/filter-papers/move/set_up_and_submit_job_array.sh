@@ -19,14 +19,18 @@ REMOTE_DIRS_FILE=${REMOTE_DIRS_FILE:-"remote_dirs.txt"}
 TRANSFERRED_FILES_DIR=${TRANSFERRED_FILES_DIR:-"./transferred_files"}
 CHUNK_DIGITS=${MOVE_CHUNK_DIGITS:-6}
 JOB_PREFIX=${MOVE_JOB_PREFIX:-transfer_}
+SSH_MAX_CONNECTIONS=${MOVE_SSH_MAX_CONNECTIONS:-}  ### Cap on live ssh connections across the array (empty = no cap) ###
+STORAGE=${MOVE_STORAGE:-}  ### files (default): one file per paper; shard: one packed tar + index per chunk ###
 
 # Parse remote directories from file
 if [ -z "${REMOTE_DIRS:-}" ]; then
     REMOTE_DIRS=$(tr '\n' ',' < "$REMOTE_DIRS_FILE" | sed 's/,$//')
 fi
 
-# Clear contents of shared transfer directory
-rm -rf "$TRANSFERRED_FILES_DIR"
+# Keep earlier transfers so reruns only fetch new or changed files (MOVE_CLEAN=true starts fresh)
+if [ "${MOVE_CLEAN:-false}" = "true" ]; then
+    rm -rf "$TRANSFERRED_FILES_DIR"
+fi
 mkdir -p "$TRANSFERRED_FILES_DIR"
 
 # Function to log and run commands
@@ -50,10 +54,17 @@ log_and_run "Step 1/3: Creating input YAMLs" \
     "$REMOTE_DIRS" \
     "$CHUNK_SIZE" \
     "$CHUNK_DIGITS" \
-    "$TRANSFERRED_FILES_DIR"
+    "$TRANSFERRED_FILES_DIR" \
+    "$SSH_MAX_CONNECTIONS" \
+    "$STORAGE"
 
 sleep 1
 
+# Run each task's chunks in one Python process (MOVE_BATCH_MODE=subprocess: one run_one_batch.sh per chunk)
+if [ "${MOVE_BATCH_MODE:-inprocess}" = "inprocess" ]; then
+    export BATCH_HANDLER="./batch_handler.py"
+fi
+
 log_and_run "Step 2/3: Generating job script" \
     bash _2_generate_job_script.sh \
     "./run_one_batch.sh" \
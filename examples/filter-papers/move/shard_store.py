@@ -0,0 +1,84 @@
+"""Packed shard storage: one uncompressed tar per chunk plus a random-access index.
+
+With ``storage: shard`` a chunk's files are appended to ``<chunk>.tar`` in the
+output directory instead of being flattened into one file each, and
+``<chunk>.tar.idx.tsv`` lists ``remote_path<TAB>shard<TAB>offset<TAB>length<TAB>mtime``
+per member, where ``shard`` is the tar's file name next to the index and
+``offset`` is where the member's bytes start. Both are written under temporary
+names and renamed once the stream has completed, the index last, so a reader
+never sees a shard without its full index.
+"""
+
+from __future__ import annotations
+
+import copy
+import os
+import tarfile
+from pathlib import Path
+from typing import IO
+
+SHARD_SUFFIX = ".tar"
+INDEX_SUFFIX = ".idx.tsv"
+
+
+def index_path(shard_path: Path) -> Path:
+	return shard_path.with_name(shard_path.name + INDEX_SUFFIX)
+
+
+def remove_shard(shard_path: Path) -> None:
+	"""Delete a shard and its index (used when a rerun replaces a chunk's shards)."""
+	index_path(shard_path).unlink(missing_ok=True)
+	shard_path.unlink(missing_ok=True)
+
+
+class ShardWriter:
+	"""Appends stream members to ``<directory>/<name>.tar`` and records where each one's bytes landed.
+
+	Use as a context manager: leaving normally publishes the shard and index,
+	leaving with an exception deletes the partial shard.
+	"""
+
+	def __init__(self, directory: Path, name: str) -> None:
+		self.path = directory / f"{name}{SHARD_SUFFIX}"
+		self.index_path = index_path(self.path)
+		self._temp_path = directory / f".{self.path.name}.part"
+		self._handle = open(self._temp_path, "wb")
+		self._tar = tarfile.open(fileobj=self._handle, mode="w", format=tarfile.GNU_FORMAT)
+		self.rows: list[str] = []
+
+	def add(self, remote_path: str, member: tarfile.TarInfo, source: IO[bytes]) -> None:
+		info = copy.copy(member)
+		info.name = remote_path.lstrip("/")
+		self._tar.addfile(info, source)
+		# addfile leaves the archive offset after the member's data padded to whole blocks
+		blocks, remainder = divmod(info.size, tarfile.BLOCKSIZE)
+		padded = (blocks + (1 if remainder else 0)) * tarfile.BLOCKSIZE
+		offset = self._tar.offset - padded
+		self.rows.append(f"{remote_path}\t{self.path.name}\t{offset}\t{info.size}\t{int(info.mtime)}\n")
+
+	def commit(self) -> None:
+		self._tar.close()
+		self._handle.flush()
+		os.fsync(self._handle.fileno())
+		self._handle.close()
+		os.replace(self._temp_path, self.path)
+		temp_index = self.index_path.with_name(f".{self.index_path.name}.part")
+		with open(temp_index, "w", encoding="utf-8") as handle:
+			handle.writelines(self.rows)
+			handle.flush()
+			os.fsync(handle.fileno())
+		os.replace(temp_index, self.index_path)
+
+	def abort(self) -> None:
+		self._tar.close()
+		self._handle.close()
+		self._temp_path.unlink(missing_ok=True)
+
+	def __enter__(self) -> ShardWriter:
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback) -> None:
+		if exc_type is None:
+			self.commit()
+		else:
+			self.abort()
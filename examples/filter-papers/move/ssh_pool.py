@@ -0,0 +1,178 @@
+"""One multiplexed ssh connection per transfer, with a cap on live connections.
+
+``SshConnection`` starts an OpenSSH ControlMaster once and builds every ssh/scp
+command of the transfer to ride on it, so a chunk pays for one TCP and key
+handshake instead of one per command. ``ConnectionSlots`` limits how many of
+those masters exist at once across all array tasks sharing a slot directory,
+which keeps a large array under the login node's ``MaxStartups``. Without a
+master, each parallel stream of a transfer opens its own connections and
+counts against the cap on its own (``SshConnection.stream_slot``).
+"""
+
+from __future__ import annotations
+
+import fcntl
+import os
+import shlex
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator
+
+# Seconds an idle master outlives its last client (covers tasks killed before close())
+CONTROL_PERSIST_SECONDS = 60
+
+
+class ConnectionSlots:
+	"""Counting semaphore over ``limit`` lock files in ``directory``.
+
+	Slots are held with ``flock``, so a task that dies frees its slot
+	immediately. The directory must be shared by every task that should count
+	against the same limit (e.g. the shared ``transferred_files_dir``).
+	"""
+
+	def __init__(self, directory: Path, limit: int, poll_seconds: float = 2.0) -> None:
+		if limit < 1:
+			raise ValueError("Connection limit must be at least 1")
+		self.directory = directory
+		self.limit = limit
+		self.poll_seconds = poll_seconds
+
+	def acquire(self) -> IO[str]:
+		"""Block until a slot is free and return its (locked) handle."""
+		self.directory.mkdir(parents=True, exist_ok=True)
+		waited = False
+		while True:
+			for index in range(self.limit):
+				handle = open(self.directory / f"slot_{index:04d}.lock", "a")
+				try:
+					fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+				except BlockingIOError:
+					handle.close()
+					continue
+				return handle
+			if not waited:
+				print(f"All {self.limit} ssh connection slots are busy; waiting...")
+				waited = True
+			time.sleep(self.poll_seconds)
+
+	@staticmethod
+	def release(handle: IO[str]) -> None:
+		fcntl.flock(handle, fcntl.LOCK_UN)
+		handle.close()
+
+
+class SshConnection:
+	"""Builds ssh/scp commands for one host, sharing a ControlMaster while open.
+
+	Use as a context manager: entering takes a connection slot (if any) and
+	starts the master; leaving stops it and frees the slot. Outside the context,
+	or with ``multiplex=False``, commands open their own connections as before.
+	"""
+
+	def __init__(
+		self,
+		hostname: str,
+		username: str,
+		key_filename: str,
+		*,
+		multiplex: bool = True,
+		slots: ConnectionSlots | None = None,
+	) -> None:
+		self.hostname = hostname
+		self.username = username
+		self.key_filename = key_filename
+		self.multiplex = multiplex
+		self.slots = slots
+		self.control_path: str | None = None
+		self._slot: IO[str] | None = None
+		self._slot_lock = threading.Lock()
+
+	@property
+	def target(self) -> str:
+		return f"{self.username}@{self.hostname}"
+
+	def _options(self) -> list[str]:
+		options = ["-i", self.key_filename]
+		if self.control_path is not None:
+			options += ["-o", f"ControlPath={self.control_path}", "-o", "ControlMaster=no"]
+		return options
+
+	def ssh(self, remote_command: str) -> list[str]:
+		return ["ssh", *self._options(), self.target, remote_command]
+
+	def scp_pull(self, remote_path: str, local_path: str) -> list[str]:
+		return ["scp", *self._options(), f"{self.target}:{remote_path}", local_path]
+
+	def open(self) -> None:
+		if self.slots is not None:
+			self._slot = self.slots.acquire()
+		if not self.multiplex:
+			return
+		# Socket paths are limited to ~100 bytes, so keep them short and out of deep output dirs
+		control_path = os.path.join(tempfile.gettempdir(), f"cpe-{uuid.uuid4().hex[:12]}.sock")
+		master = [
+			"ssh",
+			"-i",
+			self.key_filename,
+			"-o",
+			"ControlMaster=yes",
+			"-o",
+			f"ControlPath={control_path}",
+			"-o",
+			f"ControlPersist={CONTROL_PERSIST_SECONDS}",
+			"-f",
+			"-N",
+			self.target,
+		]
+		print(f"Running: {' '.join(shlex.quote(part) for part in master)}")
+		if subprocess.run(master).returncode != 0:
+			print("Warning: could not start a shared ssh connection; using one connection per command")
+			return
+		self.control_path = control_path
+
+	@contextmanager
+	def stream_slot(self) -> Iterator[None]:
+		"""Hold a slot for one of several parallel streams while it runs.
+
+		Streams over the master share the task's slot. Without one (``multiplex``
+		off, or the master failed to start) every stream opens its own ssh/scp
+		connections, so each takes a slot of its own. The task's slot is handed
+		back first: a task that waited for slots while holding one could deadlock
+		with the other tasks doing the same.
+		"""
+		if self.slots is None or self.control_path is not None:
+			yield
+			return
+		with self._slot_lock:
+			if self._slot is not None:
+				ConnectionSlots.release(self._slot)
+				self._slot = None
+		slot = self.slots.acquire()
+		try:
+			yield
+		finally:
+			ConnectionSlots.release(slot)
+
+	def close(self) -> None:
+		if self.control_path is not None:
+			subprocess.run(
+				["ssh", "-o", f"ControlPath={self.control_path}", "-O", "exit", self.target],
+				stdout=subprocess.DEVNULL,
+				stderr=subprocess.DEVNULL,
+			)
+			self.control_path = None
+		if self._slot is not None:
+			ConnectionSlots.release(self._slot)
+			self._slot = None
+
+	def __enter__(self) -> SshConnection:
+		self.open()
+		return self
+
+	def __exit__(self, *exc_info) -> None:
+		self.close()
@@ -0,0 +1,124 @@
+"""Compression codecs for remote transfers.
+
+A codec names the remote compressor that ``tar`` output is piped through and the
+local program that decompresses it. ``resolve_codec`` falls back to codecs that
+are installed on both ends, so a YAML asking for ``zstd`` still works against a
+host that only has ``gzip``.
+"""
+
+from __future__ import annotations
+
+import shutil
+from dataclasses import dataclass, replace
+
+CODEC_NAMES = ("gzip", "pigz", "zstd", "lz4", "none")
+
+# Programs probed on the remote host
+REMOTE_PROGRAMS = ("gzip", "pigz", "zstd", "lz4")
+
+# Codecs tried, in order, when the requested one is not installed on both ends
+_FALLBACKS = {
+	"gzip": ("gzip", "none"),
+	"pigz": ("pigz", "gzip", "none"),
+	"zstd": ("zstd", "pigz", "gzip", "none"),
+	"lz4": ("lz4", "gzip", "none"),
+	"none": ("none",),
+}
+
+# Local programs able to decompress each codec's output (pigz writes plain gzip)
+_DECODERS = {
+	"gzip": ("pigz", "gzip"),
+	"pigz": ("pigz", "gzip"),
+	"zstd": ("zstd",),
+	"lz4": ("lz4",),
+}
+
+_EXTENSIONS = {
+	"gzip": ".tar.gz",
+	"pigz": ".tar.gz",
+	"zstd": ".tar.zst",
+	"lz4": ".tar.lz4",
+	"none": ".tar",
+}
+
+
+@dataclass(frozen=True)
+class Codec:
+	name: str
+	level: int | None = None
+	threads: int | None = None
+	decoder: str | None = None
+
+	@property
+	def extension(self) -> str:
+		return _EXTENSIONS[self.name]
+
+	@property
+	def is_gzip(self) -> bool:
+		return self.name in ("gzip", "pigz")
+
+	def compress_command(self) -> str | None:
+		"""Shell command compressing stdin to stdout on the remote host (None for a plain tar)."""
+		if self.name == "none":
+			return None
+		parts = [self.name, "-c"]
+		if self.name in ("zstd", "lz4"):
+			parts.append("-q")
+		if self.level is not None:
+			parts.append(f"-{self.level}")
+		if self.threads is not None:
+			if self.name == "pigz":
+				parts.append(f"-p{self.threads}")
+			elif self.name == "zstd":
+				parts.append(f"-T{self.threads}")
+		return " ".join(parts)
+
+	def decompress_command(self) -> list[str] | None:
+		"""Local command decompressing stdin to stdout (None for a plain tar)."""
+		return None if self.decoder is None else [self.decoder, "-dc"]
+
+	def describe(self) -> str:
+		threaded = self.threads is not None and self.name in ("pigz", "zstd")
+		settings = [f"level {self.level}" if self.level is not None else "", f"{self.threads} threads" if threaded else ""]
+		detail = ", ".join(setting for setting in settings if setting)
+		return f"{self.name} ({detail})" if detail else self.name
+
+
+def local_programs() -> set[str]:
+	return {program for program in REMOTE_PROGRAMS if shutil.which(program)}
+
+
+def usable_codecs(remote: set[str], local: set[str]) -> list[str]:
+	"""Codecs whose compressor exists remotely and whose decompressor exists locally."""
+	return [name for name in CODEC_NAMES if name == "none" or (name in remote and local.intersection(_DECODERS[name]))]
+
+
+def resolve_codec(codec: Codec, remote: set[str], local: set[str]) -> Codec:
+	"""``codec`` itself if installed on both ends, else the first installed fallback, with its decoder filled in."""
+	usable = usable_codecs(remote, local)
+	for name in _FALLBACKS[codec.name]:
+		if name not in usable:
+			continue
+		if name != codec.name:
+			print(f"Codec {codec.name} is not installed on both ends; falling back to {name}")
+			# Levels and thread counts do not carry over between codecs
+			codec = Codec(name)
+		if name == "none":
+			return replace(codec, decoder=None)
+		decoder = next(program for program in _DECODERS[name] if program in local)
+		return replace(codec, decoder=decoder)
+	raise ValueError(f"No usable codec for {codec.name}")
+
+
+def parse_codec(name: str | None, level: str | int | None = None, threads: str | int | None = None) -> Codec | None:
+	"""Codec from YAML values; returns None for ``auto`` (chosen later by timing a sample)."""
+	name = (name or "gzip").strip().lower()
+	if name == "auto":
+		return None
+	if name not in CODEC_NAMES:
+		raise ValueError(f"Unknown codec {name!r}; expected auto or one of {', '.join(CODEC_NAMES)}")
+	return Codec(
+		name,
+		level=int(level) if level not in (None, "") else None,
+		threads=int(threads) if threads not in (None, "") else None,
+	)
@@ -0,0 +1,84 @@
+"""Per-chunk record of delivered files, so reruns only ship new or changed ones.
+
+Manifests written by ``_1_prepare_inputs.sh`` carry each remote file's size and
+mtime (``path<TAB>size<TAB>mtime``). The ledger keeps, for every file a chunk
+has delivered, that size and mtime plus the flattened local name it landed
+under. It is rewritten atomically (temp file + rename) after every completed
+stream, so an interrupted task resumes from the last finished stream.
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import NamedTuple
+
+# Remote path -> (size, mtime) as listed by the remote find, or None for plain-path manifests
+Manifest = dict[str, tuple[str, str] | None]
+
+
+class LedgerEntry(NamedTuple):
+	size: str
+	mtime: str
+	name: str
+
+
+def read_manifest(path: str) -> Manifest:
+	"""Remote paths in manifest order (duplicates dropped) with their size/mtime when listed."""
+	manifest: Manifest = {}
+	with open(path, encoding="utf-8") as handle:
+		for line in handle:
+			if not line.strip() or line.lstrip().startswith("#"):
+				continue
+			remote_path, *metadata = line.rstrip("\n").split("\t")
+			remote_path = remote_path.strip()
+			if remote_path not in manifest:
+				manifest[remote_path] = (metadata[0], metadata[1]) if len(metadata) >= 2 else None
+	return manifest
+
+
+class TransferLedger:
+	"""Remote path -> ``LedgerEntry`` for every file a chunk has delivered."""
+
+	def __init__(self, path: Path) -> None:
+		self.path = path
+		self.entries: dict[str, LedgerEntry] = {}
+		self.lock = threading.Lock()
+		if path.exists():
+			for line in path.read_text(encoding="utf-8").splitlines():
+				fields = line.split("\t")
+				if len(fields) == 4:
+					self.entries[fields[0]] = LedgerEntry(*fields[1:])
+
+	def is_current(self, remote_path: str, metadata: tuple[str, str] | None, present: set[str]) -> bool:
+		"""Whether ``remote_path`` was delivered with this size/mtime and its local copy is still there."""
+		entry = self.entries.get(remote_path)
+		return metadata is not None and entry is not None and (entry.size, entry.mtime) == metadata and entry.name in present
+
+	def record(self, placed: dict[str, str], manifest: Manifest) -> None:
+		"""Add the files one stream delivered (remote path -> local name) and persist the ledger."""
+		with self.lock:
+			changed = False
+			for remote_path, name in placed.items():
+				metadata = manifest.get(remote_path)
+				if metadata is not None:
+					self.entries[remote_path] = LedgerEntry(metadata[0], metadata[1], name)
+					changed = True
+			if changed:
+				self._write()
+
+	def _write(self) -> None:
+		self.path.parent.mkdir(parents=True, exist_ok=True)
+		fd, temp_name = tempfile.mkstemp(prefix=f".{self.path.name}.", dir=self.path.parent)
+		try:
+			with os.fdopen(fd, "w", encoding="utf-8") as handle:
+				for remote_path, entry in self.entries.items():
+					handle.write(f"{remote_path}\t{entry.size}\t{entry.mtime}\t{entry.name}\n")
+				handle.flush()
+				os.fsync(handle.fileno())
+			os.replace(temp_name, self.path)
+		except BaseException:
+			Path(temp_name).unlink(missing_ok=True)
+			raise
@@ -6,4 +6,6 @@ export REMOTE_KEY_FILENAME=~/.ssh/id_rsa
 export MOVE_CHUNK_SIZE=5000  # Number of remote files per chunk
 export MOVE_SIMS_PER_JOB=1   # Number of chunks per SLURM job
 export FILTER_CHUNK_SIZE=100  # Number of files per chunk
-export FILTER_SIMS_PER_JOB=2  # Number of chunks per SLURM job
\ No newline at end of file
+export FILTER_SIMS_PER_JOB=2  # Number of chunks per SLURM job
+export STREAM_CHUNK_SIZE=5000  # Number of remote files per chunk (fused move-and-filter stage)
+export STREAM_SIMS_PER_JOB=1  # Number of chunks per SLURM job
@@ -0,0 +1,124 @@
+"""Compare a fused stream-filter run with the two-stage move + filter workflow.
+
+Reads the ``metrics.jsonl`` records each run leaves in its output directories
+(see ``src/metrics_report.py``) and reports, per workflow, the summed wall time
+of its inputs, the elapsed time from the first input starting to the last one
+finishing, and how many files it wrote to shared storage: papers placed by the
+move stage or matches kept by the fused stage, plus every per-chunk output file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import sys
+from typing import Iterable, NamedTuple
+
+JOB_SOURCES = ("run.sh", "run_batch")
+
+
+class StageTotals(NamedTuple):
+    inputs: int
+    wall_seconds: float
+    first_start: float
+    last_end: float
+    papers_written: int
+    output_files: int
+
+
+def stage_totals(prefix: str) -> StageTotals:
+    """Totals over the latest record of each kind in ``<prefix>outputs/output_*/metrics.jsonl``."""
+    outputs_folder = f"{prefix}outputs"
+    paths = sorted(glob.glob(os.path.join(outputs_folder, "output_*", "metrics.jsonl")))
+    if not paths:
+        raise FileNotFoundError(f"No metrics.jsonl files under {outputs_folder}/output_*")
+    wall = 0.0
+    starts: list[float] = []
+    ends: list[float] = []
+    papers = 0
+    output_files = 0
+    for path in paths:
+        job: dict = {}
+        entry: dict = {}
+        with open(path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                if line.strip():
+                    record = json.loads(line)
+                    if record.get("source") in JOB_SOURCES:
+                        job = record
+                    else:
+                        entry = record
+        timed = job or entry
+        if timed.get("wall_seconds") is not None:
+            wall += float(timed["wall_seconds"])
+            starts.append(float(timed["started_at"]))
+            ends.append(float(timed["started_at"]) + float(timed["wall_seconds"]))
+        # The move stage places every processed file; the fused stage only its matches
+        if entry.get("source") == "compress_pull_extract":
+            papers += int(entry.get("files_processed") or 0)
+        else:
+            papers += int(entry.get("files_written") or 0)
+        with os.scandir(os.path.dirname(path)) as entries:
+            output_files += sum(1 for item in entries if item.is_file())
+    return StageTotals(len(paths), wall, min(starts, default=0.0), max(ends, default=0.0), papers, output_files)
+
+
+def compare(two_stage_prefixes: list[str], fused_prefix: str) -> str:
+    stages = [(prefix, stage_totals(prefix)) for prefix in two_stage_prefixes]
+    fused = stage_totals(fused_prefix)
+
+    def row(label: str, totals: StageTotals | list[StageTotals]) -> tuple[str, float, float, int, int]:
+        parts = totals if isinstance(totals, list) else [totals]
+        elapsed = sum(part.last_end - part.first_start for part in parts)
+        return (
+            label,
+            sum(part.wall_seconds for part in parts),
+            elapsed,
+            sum(part.papers_written for part in parts),
+            sum(part.output_files for part in parts),
+        )
+
+    rows = [row(prefix, totals) for prefix, totals in stages]
+    rows.append(row("two-stage total", [totals for _, totals in stages]))
+    rows.append(row(fused_prefix, fused))
+    lines = [f"{'workflow':<28} {'wall_s':>10} {'elapsed_s':>10} {'papers':>9} {'outputs':>9} {'files':>9}"]
+    for label, wall, elapsed, papers, outputs in rows:
+        lines.append(f"{label:<28} {wall:>10.2f} {elapsed:>10.2f} {papers:>9} {outputs:>9} {papers + outputs:>9}")
+
+    _, two_wall, two_elapsed, two_papers, two_outputs = rows[-2]
+    _, fused_wall, fused_elapsed, fused_papers, fused_outputs = rows[-1]
+    lines.append("")
+    if fused_wall > 0:
+        lines.append(f"Summed wall time: {two_wall / fused_wall:.2f}x less with the fused stage")
+    if fused_elapsed > 0:
+        # Elapsed time of the two-stage workflow excludes the gap between submitting the stages
+        lines.append(f"Elapsed time (stages back to back): {two_elapsed / fused_elapsed:.2f}x less with the fused stage")
+    lines.append(f"Files written: {fused_papers + fused_outputs} instead of {two_papers + two_outputs}")
+    return "\n".join(lines)
+
+
+def parse_args(argv: Iterable[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare a stream-filter run with the move + filter runs it replaces.")
+    parser.add_argument(
+        "--two-stage",
+        nargs="+",
+        required=True,
+        help="Run prefixes of the two-stage workflow, e.g. ../move/transfer_ ../filter/filter_.",
+    )
+    parser.add_argument("--fused", required=True, help="Run prefix of the stream-filter run, e.g. stream_filter_.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Iterable[str] | None = None) -> None:
+    args = parse_args(argv)
+    try:
+        print(compare(args.two_stage, args.fused))
+    except FileNotFoundError as error:
+        print(f"Error: {error}", file=sys.stderr)
+        raise SystemExit(1) from error
+
+
+if __name__ == "__main__":
+    main()
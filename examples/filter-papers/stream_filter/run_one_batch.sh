@@ -0,0 +1,29 @@
+#!/bin/bash
+
+set -euo pipefail
+
+INPUT_YAML=${1:?"Input YAML required"}
+OUTPUT_DIR=${2:?"Output directory required"}
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
+if [ ! -f "$INPUT_YAML" ]; then
+    echo "Error: Input spec $INPUT_YAML not found" >&2
+    exit 1
+fi
+
+mkdir -p "$OUTPUT_DIR"
+
+# Stream the chunk's remote papers through the keyword matcher; only matches are written
+python3 "$SCRIPT_DIR/stream_filter.py" \
+    --input-yaml "$INPUT_YAML" \
+    --output-dir "$OUTPUT_DIR" \
+    --output-format "${FILTER_OUTPUT_FORMAT:-json}" \
+    --metrics-file "$OUTPUT_DIR/metrics.jsonl"
+
+cat > "$OUTPUT_DIR/info.txt" <<EOL
+Stream filter batch completed at $(date)
+Input spec: $INPUT_YAML
+EOL
+cat "$INPUT_YAML" >> "$OUTPUT_DIR/info.txt"
+
+echo "Completed stream filtering for $INPUT_YAML"
@@ -0,0 +1,99 @@
+#!/bin/bash
+
+# Sets up and submits a SLURM job array that streams papers from a remote
+# location through the keyword filter, writing only the matching papers.
+
+set -euo pipefail
+
+# Check required environment variables
+: "${REMOTE_USERNAME:?Environment variable REMOTE_USERNAME must be set}"
+: "${REMOTE_HOSTNAME:?Environment variable REMOTE_HOSTNAME must be set}"
+: "${REMOTE_KEY_FILENAME:?Environment variable REMOTE_KEY_FILENAME must be set}"
+: "${STREAM_CHUNK_SIZE:?Environment variable STREAM_CHUNK_SIZE must be set}"
+: "${STREAM_SIMS_PER_JOB:?Environment variable STREAM_SIMS_PER_JOB must be set}"
+
+# Define parameters
+CHUNK_SIZE=$STREAM_CHUNK_SIZE  ### Number of remote files per chunk ###
+SIMS_PER_JOB=$STREAM_SIMS_PER_JOB  ### Number of chunks per job ###
+REMOTE_DIRS_FILE=${REMOTE_DIRS_FILE:-"../move/remote_dirs.txt"}
+MATCHES_DIR=${STREAM_MATCHES_DIR-"./matched_papers"}  ### Where matching papers go (empty = write none) ###
+CHUNK_DIGITS=${STREAM_CHUNK_DIGITS:-6}
+JOB_PREFIX=${STREAM_JOB_PREFIX:-stream_filter_}
+CASE_SENSITIVE=${CASE_SENSITIVE:-false}
+QUERY=${FILTER_QUERY:-}  ### Optional boolean category query, e.g. 'compartment AND modeling' ###
+FULL_DETAIL=${FILTER_FULL_DETAIL:-false}  ### With a query, record every matched term instead of stopping once decided ###
+SSH_MAX_CONNECTIONS=${STREAM_SSH_MAX_CONNECTIONS:-}  ### Cap on live ssh connections across the array (empty = no cap) ###
+
+# Single-quoted YAML scalar; a quote inside the value is written twice
+yaml_quote() {
+    local value=$1
+    printf "'%s'" "${value//\'/\'\'}"
+}
+
+# Parse remote directories from file
+if [ -z "${REMOTE_DIRS:-}" ]; then
+    REMOTE_DIRS=$(tr '\n' ',' < "$REMOTE_DIRS_FILE" | sed 's/,$//')
+fi
+
+# Function to log and run commands
+log_and_run() {
+    local label=$1
+    shift
+    echo "==> $label" >&2
+    if ! "$@"; then
+        echo "ERROR: $label failed. Exiting workflow." >&2
+        exit 1
+    fi
+    echo "<== Completed $label" >&2
+}
+
+# The move stage's input preparation lists the remote files and writes one YAML per chunk
+log_and_run "Step 1/3: Creating input YAMLs" \
+    bash ../move/_1_prepare_inputs.sh \
+    "$REMOTE_USERNAME" \
+    "$REMOTE_HOSTNAME" \
+    "$REMOTE_KEY_FILENAME" \
+    "$REMOTE_DIRS" \
+    "$CHUNK_SIZE" \
+    "$CHUNK_DIGITS" \
+    "" \
+    "$SSH_MAX_CONNECTIONS"
+
+if [ -n "$MATCHES_DIR" ]; then
+    mkdir -p "$MATCHES_DIR"
+    MATCHES_DIR=$(readlink -f "$MATCHES_DIR")
+fi
+for yaml_file in ./inputs/input_*.yaml; do
+    echo "case_sensitive: $CASE_SENSITIVE" >> "$yaml_file"
+    echo "full_detail: $FULL_DETAIL" >> "$yaml_file"
+    if [ -n "$QUERY" ]; then
+        echo "query: $(yaml_quote "$QUERY")" >> "$yaml_file"
+    fi
+    if [ -n "$MATCHES_DIR" ]; then
+        echo "matches_dir: $(yaml_quote "$MATCHES_DIR")" >> "$yaml_file"
+    fi
+done
+
+sleep 1
+
+# Run each task's chunks in one Python process (STREAM_BATCH_MODE=subprocess: one run_one_batch.sh per chunk)
+if [ "${STREAM_BATCH_MODE:-inprocess}" = "inprocess" ]; then
+    export BATCH_HANDLER="./batch_handler.py"
+fi
+
+log_and_run "Step 2/3: Generating job script" \
+    bash ../filter/_2_generate_job_script.sh \
+    "./run_one_batch.sh" \
+    "slurm_defaults.txt" \
+    "./inputs" \
+    "$SIMS_PER_JOB" \
+    "$JOB_PREFIX"
+
+sleep 1
+
+echo "Step 3/3: Submitting job array"
+
+JOB_SCRIPT="${JOB_PREFIX}run.sh"
+sbatch "$JOB_SCRIPT"
+
+echo "Stream filter job array submitted."
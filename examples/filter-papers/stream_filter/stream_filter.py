@@ -0,0 +1,290 @@
+"""Fused move-and-filter stage: keyword-filter remote papers straight off the tar stream.
+
+The two-stage workflow extracts every remote file into ``transferred_files``
+(``move``) and then lists and re-reads each one from shared storage
+(``filter``). Here each chunk's manifest is streamed over ssh as one tar, the
+same way ``compress_pull_extract``'s ``pipe`` mode does, and every member is
+matched in memory as it arrives. Only matching papers are written (to
+``matches_dir``, flattened and collision-safe like the move stage), or none at
+all, next to the usual per-chunk ``results.json``, summaries and ``stats.txt``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+# The stage is built from the move and filter modules next to this folder
+_EXAMPLE_DIR = Path(__file__).resolve().parent.parent
+for _sibling in ("filter", "move"):
+    if str(_EXAMPLE_DIR / _sibling) not in sys.path:
+        sys.path.append(str(_EXAMPLE_DIR / _sibling))
+
+from category_query import CategoryQuery, parse_query
+from compress_pull_extract import (
+    TransferLayout,
+    build_layout,
+    choose_codec,
+    flattened_filename,
+    in_stream_slot,
+    load_transfer_config,
+    open_remote_members,
+    plan_streams,
+    retry_stream,
+)
+from keyword_filter import PK_KEYWORDS, KeywordMatcher, build_matcher
+from keyword_filter_runner import load_input_spec, match_text, write_outputs
+from result_io import RESULT_FORMATS
+from run_metrics import RunMetrics
+from transfer_ledger import read_manifest
+
+
+class StreamOutcome(NamedTuple):
+    matches: dict[str, tuple[str, dict[str, list[str]]]]  # remote path -> (result key, found terms)
+    seen: set[str]  # remote paths that arrived in the stream
+    written: list[str]  # names placed in matches_dir
+    bytes_scanned: int
+
+
+def stream_filter(
+    *,
+    hostname: str,
+    username: str,
+    key_filename: str,
+    file_list_path: str,
+    output_dir: str,
+    matches_dir: str | None = None,
+    case_sensitive: bool = False,
+    query: str | None = None,
+    full_detail: bool = False,
+    output_format: str = "json",
+    streams: int = 1,
+    stream_retries: int = 2,
+    codec: str = "gzip",
+    codec_level: int | str | None = None,
+    codec_threads: int | str | None = None,
+    ssh_multiplex: bool = True,
+    ssh_max_connections: int = 0,
+    ssh_slots_dir: str | None = None,
+    metrics: RunMetrics | None = None,
+) -> dict[str, dict[str, list[str]]]:
+    """Filter the remote files of one manifest without storing the non-matching ones.
+
+    Results are keyed by the local path of each written match, or by the remote
+    path when ``matches_dir`` is None.
+    """
+    metrics = metrics or RunMetrics()
+    manifest = read_manifest(file_list_path)
+    if not manifest:
+        raise ValueError("No files found in manifest; nothing to filter.")
+    output = Path(output_dir).expanduser().resolve()
+    output.mkdir(parents=True, exist_ok=True)
+    matcher = build_matcher(PK_KEYWORDS, case_sensitive)
+    category_query = parse_query(query, PK_KEYWORDS)
+
+    layout = build_layout(
+        hostname=hostname,
+        username=username,
+        key_filename=key_filename,
+        local_output_dir=matches_dir or str(output),
+        transfer_mode="pipe",
+        ssh_multiplex=ssh_multiplex,
+        ssh_max_connections=ssh_max_connections,
+        ssh_slots_dir=ssh_slots_dir,
+        metrics=metrics,
+    )
+    remote_paths = list(manifest)
+    with ExitStack() as stack:
+        with metrics.phase("ssh_connect"):
+            stack.enter_context(layout.connection)
+        with metrics.phase("_choose_codec"):
+            layout = choose_codec(layout, remote_paths, codec, codec_level, codec_threads)
+        scan = partial(
+            _filter_stream,
+            matcher=matcher,
+            query=category_query,
+            full_detail=full_detail,
+            keep=matches_dir is not None,
+            retries=stream_retries,
+        )
+        planned = plan_streams(layout, remote_paths, manifest, streams)
+        if len(planned) == 1:
+            outcomes = [scan(*planned[0])]
+        else:
+            print(f"Filtering {len(remote_paths)} files in {len(planned)} parallel streams...")
+            with ThreadPoolExecutor(max_workers=len(planned)) as pool:
+                futures = [pool.submit(in_stream_slot, scan, stream_layout, group) for stream_layout, group in planned]
+                errors = [future.exception() for future in futures]
+            failed = [error for error in errors if error is not None]
+            if failed:
+                for future in futures:
+                    if future.exception() is None:
+                        for name in future.result().written:
+                            layout.destinations.release(layout.payload_dir / name)
+                raise failed[0]
+            outcomes = [future.result() for future in futures]
+
+    matches = {path: match for outcome in outcomes for path, match in outcome.matches.items()}
+    seen = set().union(*(outcome.seen for outcome in outcomes))
+    results = {matches[path][0]: matches[path][1] for path in remote_paths if path in matches}
+    missing_files = [path for path in remote_paths if path not in seen]
+    for path in missing_files:
+        print(f"Warning: expected file {path} missing in archive")
+    written = sum(len(outcome.written) for outcome in outcomes)
+    bytes_scanned = sum(outcome.bytes_scanned for outcome in outcomes)
+
+    with metrics.phase("write_outputs"):
+        write_outputs(
+            results,
+            output,
+            len(remote_paths),
+            missing_files,
+            f"Files written: {written}\nBytes scanned: {bytes_scanned}\n",
+            output_format,
+        )
+    metrics.count(
+        files_listed=len(remote_paths),
+        files_processed=len(seen),
+        files_matched=len(results),
+        files_written=written,
+        bytes_scanned=bytes_scanned,
+    )
+    return results
+
+
+def _filter_stream(
+    layout: TransferLayout,
+    remote_paths: list[str],
+    matcher: KeywordMatcher,
+    query: CategoryQuery | None,
+    full_detail: bool,
+    keep: bool,
+    retries: int,
+) -> StreamOutcome:
+    """Match one (sub-)manifest's tar stream, retrying just this stream on failure."""
+
+    def attempt() -> StreamOutcome:
+        with layout.metrics.phase("_filter_stream"):
+            return _scan_tar_stream(layout, remote_paths, matcher, query, full_detail, keep)
+
+    return retry_stream(layout, attempt, retries)
+
+
+def _scan_tar_stream(
+    layout: TransferLayout,
+    remote_paths: list[str],
+    matcher: KeywordMatcher,
+    query: CategoryQuery | None,
+    full_detail: bool,
+    keep: bool,
+) -> StreamOutcome:
+    """Read each member once from the remote tar, match it in memory and write it only if it matches.
+
+    Matches written by a failed attempt are removed so a retry starts clean.
+    """
+    print(f"{layout.label}Streaming remote tar through the keyword matcher...")
+    outcome = StreamOutcome({}, set(), [], 0)
+    bytes_scanned = 0
+    try:
+        with open_remote_members(layout, remote_paths) as members:
+            for remote_path, member, source in members:
+                outcome.seen.add(remote_path)
+                data = source.read()
+                bytes_scanned += len(data)
+                match = match_text(data.decode("utf-8", errors="ignore"), matcher, query, full_detail)
+                if not match.matched:
+                    continue
+                key = remote_path
+                if keep:
+                    dest, handle = layout.destinations.place(flattened_filename(remote_path), partial(open, mode="xb"))
+                    outcome.written.append(dest.name)
+                    with handle:
+                        handle.write(data)
+                    os.chmod(dest, member.mode)
+                    os.utime(dest, (member.mtime, member.mtime))
+                    key = str(dest)
+                outcome.matches[remote_path] = (key, match.results)
+    except BaseException:
+        for name in outcome.written:
+            layout.destinations.release(layout.payload_dir / name)
+        raise
+    return outcome._replace(bytes_scanned=bytes_scanned)
+
+
+def stream_filter_from_yaml(
+    input_yaml: str,
+    output_dir: str,
+    output_format: str = "json",
+    metrics: RunMetrics | None = None,
+) -> dict[str, dict[str, list[str]]]:
+    """Read connection and filter settings from a chunk YAML and run ``stream_filter``.
+
+    The YAML is a move-stage input plus the filter keys ``case_sensitive``,
+    ``query`` and ``matches_dir`` (omit it to write no papers at all).
+    """
+    config = load_transfer_config(input_yaml)
+    spec = load_input_spec(Path(input_yaml))
+    matches_dir = spec.get("matches_dir") or None
+    if matches_dir:
+        candidate = Path(os.path.expanduser(matches_dir))
+        matches_dir = str(candidate if candidate.is_absolute() else (Path(input_yaml).parent / candidate).resolve())
+    return stream_filter(
+        hostname=config["hostname"],  # type: ignore[arg-type]
+        username=config["username"],  # type: ignore[arg-type]
+        key_filename=config["key_filename"],  # type: ignore[arg-type]
+        file_list_path=config["file_list_path"],  # type: ignore[arg-type]
+        output_dir=output_dir,
+        matches_dir=matches_dir,
+        case_sensitive=spec.get("case_sensitive", "false").lower() in {"1", "true", "yes", "on"},
+        query=spec.get("query") or None,
+        full_detail=spec.get("full_detail", "false").lower() in {"1", "true", "yes", "on"},
+        output_format=output_format,
+        streams=config["streams"],  # type: ignore[arg-type]
+        stream_retries=config["stream_retries"],  # type: ignore[arg-type]
+        codec=config["codec"],  # type: ignore[arg-type]
+        codec_level=config["codec_level"],  # type: ignore[arg-type]
+        codec_threads=config["codec_threads"],  # type: ignore[arg-type]
+        ssh_multiplex=config["ssh_multiplex"],  # type: ignore[arg-type]
+        ssh_max_connections=config["ssh_max_connections"],  # type: ignore[arg-type]
+        ssh_slots_dir=config["ssh_slots_dir"],  # type: ignore[arg-type]
+        metrics=metrics,
+    )
+
+
+def parse_args(argv: Iterable[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Stream one chunk of remote papers through the keyword filter.")
+    parser.add_argument("--input-yaml", required=True, help="Chunk YAML (move-stage connection settings plus filter keys).")
+    parser.add_argument("--output-dir", required=True, help="Directory to write results and stats into.")
+    parser.add_argument(
+        "--output-format",
+        choices=RESULT_FORMATS,
+        default="json",
+        help="Format of the per-file results: indented json, compact jsonl, or parquet (needs pyarrow).",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        default=None,
+        help="Append a JSON line of timings and resource use for this chunk to this file.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Iterable[str] | None = None) -> None:
+    args = parse_args(argv)
+    metrics = RunMetrics(args.metrics_file, "stream_filter")
+    try:
+        stream_filter_from_yaml(args.input_yaml, args.output_dir, args.output_format, metrics)
+    except BaseException:
+        metrics.write("error")
+        raise
+    metrics.write()
+
+
+if __name__ == "__main__":
+    main()
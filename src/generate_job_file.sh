@@ -3,7 +3,7 @@
 ### The internal job file generation script ###
 
 # USAGE: 
-# ./generate_job_file.sh <run_simulation_script> <slurm_defaults_file> <num_jobs> <prefix>
+# ./generate_job_file.sh <run_simulation_script> <slurm_defaults_file> <num_jobs> <prefix> [time_limit]
 
 # DESCRIPTION:
 # Internal script to generate the job array submission script.
@@ -12,11 +12,12 @@ RUN_SIMULATION_SCRIPT=$1
 SLURM_DEFAULTS_FILE=$2
 NUM_JOBS=$3
 PREFIX=$4
+TIME_LIMIT=${5:-}
 
 # Validate inputs
 if [ -z "$RUN_SIMULATION_SCRIPT" ] || [ -z "$SLURM_DEFAULTS_FILE" ] || [ -z "$NUM_JOBS" ] || [ -z "$PREFIX" ]; then
     echo "Error: Missing arguments"
-    echo "Usage: $0 <run_simulation_script> <slurm_defaults_file> <num_jobs> <prefix>"
+    echo "Usage: $0 <run_simulation_script> <slurm_defaults_file> <num_jobs> <prefix> [time_limit]"
     exit 1
 fi
 
@@ -32,6 +33,17 @@ fi
 
 # Get absolute path to simulation script
 ABS_RUN_SCRIPT=$(readlink -f "$RUN_SIMULATION_SCRIPT")
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
+# Optional Python handler that runs all of a task's inputs in one process (see run_batch.py)
+ABS_BATCH_HANDLER=""
+if [ -n "${BATCH_HANDLER:-}" ]; then
+    if [ ! -f "$BATCH_HANDLER" ]; then
+        echo "Error: Batch handler $BATCH_HANDLER does not exist"
+        exit 1
+    fi
+    ABS_BATCH_HANDLER=$(readlink -f "$BATCH_HANDLER")
+fi
 
 # Define paths
 GROUPED_FOLDER="${PREFIX}grouped_input_paths"
@@ -44,6 +56,8 @@ print(os.path.abspath(os.path.expanduser(sys.argv[1])))
 PY
 )
 mkdir -p "$SHARED_TRANSFER_DIR_PATH"
+# Per-sim wall times, read back by plan_inputs.py (--cost runtime) and plan_report.py
+RUNTIMES_PATH="$(readlink -f "$(dirname "${PREFIX}runtimes.tsv")")/$(basename "${PREFIX}runtimes.tsv")"
 
 # Check if required folders exist
 if [ ! -d "$GROUPED_FOLDER" ]; then
@@ -75,8 +89,13 @@ if ! grep -q "^\s*#SBATCH\s*--error" "$SLURM_DEFAULTS_FILE"; then
     echo "#SBATCH --error=logs/job_%A_%a.err" >> "$JOB_FILE"
 fi
 
-# Add user's SLURM defaults
-cat "$SLURM_DEFAULTS_FILE" >> "$JOB_FILE"
+# Add user's SLURM defaults (a planned time limit replaces theirs)
+if [ -n "$TIME_LIMIT" ]; then
+    grep -v "^\s*#SBATCH\s*\(--time\|-t\)\b" "$SLURM_DEFAULTS_FILE" >> "$JOB_FILE"
+    echo "#SBATCH --time=${TIME_LIMIT}" >> "$JOB_FILE"
+else
+    cat "$SLURM_DEFAULTS_FILE" >> "$JOB_FILE"
+fi
 
 # Add job array directive
 echo "" >> "$JOB_FILE"
@@ -98,7 +117,25 @@ echo ""
 EOF
 
 # Add the specific paths (these need variable expansion)
-cat >> "$JOB_FILE" << EOF
+if [ -f "${GROUPED_FOLDER}/manifest.idx" ]; then
+    # Indexed manifest: seek to this task's fixed-width <offset> <count> record
+    cat >> "$JOB_FILE" << EOF
+MANIFEST_FILE="${GROUPED_FOLDER}/manifest.txt"
+MANIFEST_INDEX="${GROUPED_FOLDER}/manifest.idx"
+SHARED_TRANSFER_DIR="$SHARED_TRANSFER_DIR_PATH"
+mkdir -p "\$SHARED_TRANSFER_DIR"
+
+read -r GROUP_OFFSET GROUP_COUNT < <(dd if="\$MANIFEST_INDEX" bs=32 skip=\$((SLURM_ARRAY_TASK_ID - 1)) count=1 status=none)
+if [ -z "\$GROUP_COUNT" ]; then
+    echo "Error: No manifest entry for task \$SLURM_ARRAY_TASK_ID in \$MANIFEST_INDEX"
+    exit 1
+fi
+list_group_inputs() {
+    tail -c +\$((10#\$GROUP_OFFSET + 1)) "\$MANIFEST_FILE" | head -n \$((10#\$GROUP_COUNT))
+}
+EOF
+else
+    cat >> "$JOB_FILE" << EOF
 INPUT_GROUP_FILE="${GROUPED_FOLDER}/input_group_\$(printf '%04d' \$SLURM_ARRAY_TASK_ID).txt"
 SHARED_TRANSFER_DIR="$SHARED_TRANSFER_DIR_PATH"
 mkdir -p "\$SHARED_TRANSFER_DIR"
@@ -108,33 +145,167 @@ if [ ! -f "\$INPUT_GROUP_FILE" ]; then
     echo "Error: Input group file \$INPUT_GROUP_FILE not found"
     exit 1
 fi
+list_group_inputs() {
+    cat "\$INPUT_GROUP_FILE"
+}
+EOF
+fi
 
-# Read each line from the input group file and run simulation
-while IFS= read -r input_yaml; do
-    if [ -z "\$input_yaml" ]; then
-        continue
+# Inputs of one task run up to SIMS_IN_PARALLEL at a time; unless set here at
+# setup time, run.sh defaults to the CPUs SLURM gave the task
+DEFAULT_SIMS_IN_PARALLEL=${SIMS_IN_PARALLEL:-'${SLURM_CPUS_PER_TASK:-1}'}
+
+cat >> "$JOB_FILE" << EOF
+RUNTIMES_FILE="$RUNTIMES_PATH"
+RUN_ID="\${SLURM_ARRAY_JOB_ID:-\${SLURM_JOB_ID:-local}}"
+RERUN_COMPLETED="\${RERUN_COMPLETED:-false}"
+NODE=\$(hostname)
+
+# Seconds this task waited in the queue, when scontrol can tell (recorded in each sim's metrics.jsonl)
+QUEUE_WAIT=null
+if [ -n "\$SLURM_JOB_ID" ] && command -v scontrol > /dev/null; then
+    read -r SUBMIT_TIME START_TIME < <(scontrol show job -o "\$SLURM_JOB_ID" | grep -o '\(SubmitTime\|StartTime\)=[^ ]*' | cut -d= -f2 | tr '\n' ' ')
+    if SUBMIT_EPOCH=\$(date -d "\$SUBMIT_TIME" +%s 2> /dev/null) && START_EPOCH=\$(date -d "\$START_TIME" +%s 2> /dev/null); then
+        QUEUE_WAIT=\$((START_EPOCH - SUBMIT_EPOCH))
     fi
-    
-    # Extract simulation ID from input filename
-    sim_id=\$(basename "\$input_yaml" | sed 's/input_\(.*\)\.yaml/\1/')
+fi
+SIMS_IN_PARALLEL="\${SIMS_IN_PARALLEL:-$DEFAULT_SIMS_IN_PARALLEL}"
+if ! [[ "\$SIMS_IN_PARALLEL" =~ ^[1-9][0-9]*$ ]]; then
+    echo "Error: SIMS_IN_PARALLEL must be a positive integer, got '\$SIMS_IN_PARALLEL'"
+    exit 1
+fi
+# CPUs each concurrent simulation may use, so sims that size their own worker pools
+# (e.g. from SLURM_CPUS_PER_TASK) share the task's CPUs instead of each taking all of them
+TASK_CPUS="\${SLURM_CPUS_PER_TASK:-1}"
+[[ "\$TASK_CPUS" =~ ^[1-9][0-9]*$ ]] || TASK_CPUS=1
+export SIM_CPUS=\$(( TASK_CPUS / SIMS_IN_PARALLEL > 0 ? TASK_CPUS / SIMS_IN_PARALLEL : 1 ))
+SIM_LOGS=\$(mktemp -d)
+trap 'rm -rf "\$SIM_LOGS"' EXIT
+
+# Run one simulation, printing its usual log block and returning its exit status
+run_sim() {
+    local input_yaml=\$1 sim_id=\$2 output_dir sim_start sim_status sim_times TIMEFORMAT='%3R %3U %3S'
     output_dir="${OUTPUTS_FOLDER}/output_\${sim_id}"
     
+    # Skip sims an earlier run finished (RERUN_COMPLETED=true redoes them)
+    if [ "\$RERUN_COMPLETED" != "true" ] && [ -f "\$output_dir/.completed" ]; then
+        echo "Skipping simulation \$sim_id (already completed)"
+        echo ""
+        return 0
+    fi
+    
     echo "Running simulation: \$input_yaml -> \$output_dir (shared: \$SHARED_TRANSFER_DIR)"
     
-    # Run the simulation
-    SHARED_TRANSFER_DIR="\$SHARED_TRANSFER_DIR" bash "$ABS_RUN_SCRIPT" "\$input_yaml" "\$output_dir"
+    # A rerun that fails must not keep the marker of an earlier success
+    rm -f "\$output_dir/.completed"
+    
+    # Run the simulation (timed by bash; its own output still goes to the task log)
+    sim_start=\$(date +%s.%N)
+    { sim_times=\$( { time SIM_ID="\$sim_id" SIM_START="\$sim_start" SHARED_TRANSFER_DIR="\$SHARED_TRANSFER_DIR" bash "$ABS_RUN_SCRIPT" "\$input_yaml" "\$output_dir" 1>&3 2>&4; } 2>&1 ); } 3>&1 4>&2
+    sim_status=\$?
+    printf '%s\t%s\t%s\t%s\t%s\t%s\n' "\$sim_id" "\$SLURM_ARRAY_TASK_ID" "\$sim_start" "\$(date +%s.%N)" "\$sim_status" "\$RUN_ID" >> "\$RUNTIMES_FILE"
+    read -r sim_wall sim_user sim_system <<< "\$sim_times"
+    printf '{"source": "run.sh", "sim_id": "%s", "task_id": "%s", "run_id": "%s", "node": "%s", "exit_status": %s, "started_at": %s, "wall_seconds": %s, "cpu_user_seconds": %s, "cpu_system_seconds": %s, "queue_wait_seconds": %s, "sims_in_parallel": %s}\n' \\
+        "\$sim_id" "\$SLURM_ARRAY_TASK_ID" "\$RUN_ID" "\$NODE" "\$sim_status" "\$sim_start" "\${sim_wall:-null}" "\${sim_user:-null}" "\${sim_system:-null}" "\$QUEUE_WAIT" "\$SIMS_IN_PARALLEL" >> "\$output_dir/metrics.jsonl"
     
     # Check exit status
-    if [ \$? -eq 0 ]; then
+    if [ \$sim_status -eq 0 ]; then
+        # Written to a temporary name and renamed, so a killed task never leaves a partial marker
+        printf '%s\t%s\t%s\n' "\$RUN_ID" "\$SLURM_ARRAY_TASK_ID" "\$(date +%s.%N)" > "\$output_dir/.completed.tmp" &&
+            mv -f "\$output_dir/.completed.tmp" "\$output_dir/.completed"
         echo "Simulation \$sim_id completed successfully"
     else
         echo "Error: Simulation \$sim_id failed"
     fi
     echo ""
-done < "\$INPUT_GROUP_FILE"
+    return \$sim_status
+}
+
+if [ "\$SIMS_IN_PARALLEL" -gt 1 ]; then
+    echo "Running up to \$SIMS_IN_PARALLEL simulations at a time"
+    echo ""
+fi
+
+BATCH_HANDLER="$ABS_BATCH_HANDLER"
+BATCH_MODE="\${BATCH_MODE:-inprocess}"
 
+# Run a list of inputs through the batch handler in one Python process
+run_batch() {
+    SHARED_TRANSFER_DIR="\$SHARED_TRANSFER_DIR" python3 "$SCRIPT_DIR/run_batch.py" "\$1" "${OUTPUTS_FOLDER}" \\
+        --handler "\$BATCH_HANDLER" \\
+        --runtimes-file "\$RUNTIMES_FILE" \\
+        --status-file "\$SIM_LOGS/status.tsv" \\
+        --run-id "\$RUN_ID" \\
+        --rerun-completed "\$RERUN_COMPLETED" \\
+        --queue-wait "\$QUEUE_WAIT" \\
+        --sims-in-parallel "\$SIMS_IN_PARALLEL" && return
+    echo "Error: Batch runner failed for \$1"
+    # Count the inputs it never reached as failed
+    touch "\$SIM_LOGS/status.tsv"
+    awk -F'\t' 'FILENAME == ARGV[1] { seen[\$1]; next } { id = \$0; sub(/.*\//, "", id); sub(/^input_/, "", id); sub(/\.yaml\$/, "", id); if (!(id in seen)) print id "\t1" }' \\
+        "\$SIM_LOGS/status.tsv" "\$1" >> "\$SIM_LOGS/status.tsv"
+}
+
+if [ -n "\$BATCH_HANDLER" ] && [ "\$BATCH_MODE" != "subprocess" ]; then
+    # In-process mode: one interpreter per worker, each taking every SIMS_IN_PARALLEL-th input
+    list_group_inputs | grep -v '^\$' > "\$SIM_LOGS/inputs.txt"
+    if [ "\$SIMS_IN_PARALLEL" -eq 1 ]; then
+        run_batch "\$SIM_LOGS/inputs.txt"
+    else
+        for ((worker = 0; worker < SIMS_IN_PARALLEL; worker++)); do
+            worker_log="\$SIM_LOGS/worker_\$worker"
+            awk -v n="\$SIMS_IN_PARALLEL" -v k="\$worker" '(NR - 1) % n == k' "\$SIM_LOGS/inputs.txt" > "\$worker_log.txt"
+            if [ ! -s "\$worker_log.txt" ]; then
+                continue
+            fi
+            (
+                run_batch "\$worker_log.txt" > "\$worker_log.out" 2> "\$worker_log.err" < /dev/null
+                flock 9
+                cat "\$worker_log.out"
+                cat "\$worker_log.err" >&2
+            ) 9> "\$SIM_LOGS/output.lock" &
+        done
+        wait
+    fi
+else
+    # Read each line from the input group file and run simulation
+    while IFS= read -r input_yaml; do
+        if [ -z "\$input_yaml" ]; then
+            continue
+        fi
+    
+        # Extract simulation ID from input filename
+        sim_id=\$(basename "\$input_yaml" | sed 's/input_\(.*\)\.yaml/\1/')
+    
+        if [ "\$SIMS_IN_PARALLEL" -eq 1 ]; then
+            run_sim "\$input_yaml" "\$sim_id"
+            printf '%s\t%s\n' "\$sim_id" \$? >> "\$SIM_LOGS/status.tsv"
+            continue
+        fi
+    
+        # Wait for a free slot, then run in the background with output buffered per sim
+        while [ "\$(jobs -rp | wc -l)" -ge "\$SIMS_IN_PARALLEL" ]; do
+            wait -n
+        done
+        sim_log="\$SIM_LOGS/sim_\$sim_id"
+        (
+            run_sim "\$input_yaml" "\$sim_id" > "\$sim_log.out" 2> "\$sim_log.err" < /dev/null
+            printf '%s\t%s\n' "\$sim_id" \$? >> "\$SIM_LOGS/status.tsv"
+            # Replay the finished sim's output as one block so concurrent sims do not interleave
+            flock 9
+            cat "\$sim_log.out"
+            cat "\$sim_log.err" >&2
+        ) 9> "\$SIM_LOGS/output.lock" &
+    done < <(list_group_inputs)
+    wait
+fi
+
+FAILED_SIMS=\$(awk -F'\t' '\$2 != 0 { printf "%s%s", sep, \$1; sep = " " }' "\$SIM_LOGS/status.tsv" 2>/dev/null)
 echo "=========================================="
 echo "All simulations in task \$SLURM_ARRAY_TASK_ID completed"
+if [ -n "\$FAILED_SIMS" ]; then
+    echo "Failed simulations: \$FAILED_SIMS"
+fi
 echo "Finished at: \$(date)"
 echo "=========================================="
 EOF
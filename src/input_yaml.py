@@ -0,0 +1,39 @@
+"""Reader for the flat ``key: value`` input YAML files the examples generate.
+
+Values may be bare, single-quoted (a literal ``'`` is written as ``''``) or
+double-quoted (backslash escapes the next character). A ``#`` starts a comment
+only outside quotes and, for bare values, after whitespace, as in YAML, so a
+query or path containing ``#`` survives. The examples' entry points share this
+module, like ``run_metrics.py``.
+"""
+
+from __future__ import annotations
+
+import re
+from pathlib import Path
+
+_QUOTED = re.compile(r"""'((?:[^']|'')*)'|"((?:[^"\\]|\\.)*)\"""")
+_COMMENT = re.compile(r"(?:^|\s)#")
+
+
+def parse_value(text: str) -> str:
+    """The scalar in ``text`` (what follows ``key:``), unquoted and without its comment."""
+    text = text.strip()
+    match = _QUOTED.match(text)
+    if match is None:
+        return _COMMENT.split(text, 1)[0].strip()
+    if match.group(1) is not None:
+        return match.group(1).replace("''", "'")
+    return re.sub(r"\\(.)", r"\1", match.group(2))
+
+
+def read_input_yaml(path: str | Path) -> dict[str, str]:
+    """``key: value`` pairs of an input YAML; comment lines and lines without a key are skipped."""
+    config: dict[str, str] = {}
+    for raw in Path(path).read_text(encoding="utf-8").splitlines():
+        line = raw.strip()
+        if not line or line.startswith("#") or ":" not in line:
+            continue
+        key, value = line.split(":", 1)
+        config[key.strip()] = parse_value(value)
+    return config
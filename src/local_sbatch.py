@@ -0,0 +1,359 @@
+"""Run a job array script on this machine the way SLURM would, for throughput testing off-cluster.
+
+Reads the ``#SBATCH`` directives of a job script such as ``<prefix>run.sh``:
+``--array`` (ranges, ``:step`` and a ``%N`` throttle), ``--cpus-per-task``,
+``--time``, ``--output``/``--error`` filename patterns, ``--job-name`` and
+``--chdir``. The array tasks then run under ``bash`` through a pool sized to the
+CPUs available here. Each task gets the environment SLURM sets
+(``SLURM_JOB_ID``, ``SLURM_ARRAY_JOB_ID``, ``SLURM_ARRAY_TASK_ID``,
+``SLURM_CPUS_PER_TASK``, ...), is pinned to its own ``--cpus-per-task`` CPUs,
+is cancelled at its time limit with the line slurmstepd writes, and logs to the
+same ``logs/job_%A_%a.*`` files. A timing summary ends the run: makespan,
+per-task durations and CPU utilization.
+"""
+
+from __future__ import annotations
+
+import argparse
+import getpass
+import os
+import re
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+# Seconds between SIGTERM and SIGKILL when a task reaches its time limit (SLURM's KillWait)
+KILL_WAIT_SECONDS = 5
+
+# Short options sbatch accepts, mapped to their long names
+_SHORT_OPTIONS = {"a": "array", "c": "cpus-per-task", "t": "time", "o": "output", "e": "error", "J": "job-name", "D": "chdir"}
+
+_PATTERN = re.compile(r"%(\d*)([AajJxuNnts%])")
+
+
+class TaskResult(NamedTuple):
+    task: int
+    job_id: int
+    cpus: tuple[int, ...]
+    start: float
+    end: float
+    exit_status: int
+    timed_out: bool
+    cpu_seconds: float  # user + system time of the task and the processes it waited for
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start
+
+
+def read_directives(script: Path) -> dict[str, str]:
+    """Long option -> value of the ``#SBATCH`` lines before the script's first command."""
+    directives: dict[str, str] = {}
+    for line in script.read_text(encoding="utf-8").splitlines()[1:]:
+        stripped = line.strip()
+        if stripped and not stripped.startswith("#"):
+            break
+        match = re.match(r"#SBATCH\s+(\S+)(?:\s+(\S+))?", stripped)
+        if not match:
+            continue
+        option, value = match.group(1), match.group(2) or ""
+        if option.startswith("--"):
+            name, _, inline = option[2:].partition("=")
+            directives[name] = inline or value
+        elif option.startswith("-") and option[1:2] in _SHORT_OPTIONS:
+            directives[_SHORT_OPTIONS[option[1:2]]] = option[2:] or value
+    return directives
+
+
+def parse_array_spec(spec: str) -> tuple[list[int], int | None]:
+    """``1-10:2,15%4`` -> ``([1, 3, 5, 7, 9, 15], 4)``: task IDs and the throttle, if any."""
+    spec, _, throttle = spec.partition("%")
+    tasks: list[int] = []
+    for part in spec.split(","):
+        bounds, _, step = part.partition(":")
+        first, _, last = bounds.partition("-")
+        tasks.extend(range(int(first), int(last or first) + 1, int(step or 1)))
+    return sorted(set(tasks)), int(throttle) if throttle else None
+
+
+def parse_time_limit(value: str) -> float | None:
+    """Seconds in a ``--time`` value (``M``, ``M:S``, ``H:M:S``, ``D-H``, ``D-H:M``, ``D-H:M:S``); None if unlimited."""
+    value = value.strip()
+    if not value or value.upper() in ("UNLIMITED", "INFINITE"):
+        return None
+    days, _, clock = value.rpartition("-")
+    parts = [int(part) for part in clock.split(":")]
+    if days:
+        hours, minutes, seconds = (parts + [0, 0])[:3]
+    elif len(parts) == 3:
+        hours, minutes, seconds = parts
+    else:
+        hours, minutes, seconds = 0, parts[0], parts[1] if len(parts) == 2 else 0
+    return ((int(days or 0) * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+def expand_pattern(pattern: str, values: dict[str, str]) -> str:
+    """Fill a ``--output``/``--error`` filename pattern (``%A``, ``%a``, ``%j``, ``%x``, ... with optional zero padding)."""
+
+    def fill(match: re.Match) -> str:
+        width, key = match.groups()
+        if key == "%":
+            return "%"
+        text = values.get(key, "")
+        return text.zfill(int(width)) if width and text.isdigit() else text
+
+    return _PATTERN.sub(fill, pattern)
+
+
+def available_cpus(limit: int | None = None) -> list[int]:
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    return cpus[:limit] if limit else cpus
+
+
+class CpuPool:
+    """Hands each running task its own CPUs, so tasks never share a core."""
+
+    def __init__(self, cpus: list[int]) -> None:
+        self.free = list(cpus)
+        self.lock = threading.Lock()
+
+    def take(self, count: int) -> tuple[int, ...]:
+        with self.lock:
+            taken, self.free = tuple(self.free[:count]), self.free[count:]
+            return taken
+
+    def give_back(self, cpus: tuple[int, ...]) -> None:
+        with self.lock:
+            self.free.extend(cpus)
+
+
+def _run_task(
+    script: Path,
+    script_args: list[str],
+    task: int,
+    job_id: int,
+    array_job_id: int,
+    directives: dict[str, str],
+    env_base: dict[str, str],
+    pool: CpuPool,
+    cpus_per_task: int,
+    time_limit: float | None,
+    workdir: Path,
+) -> TaskResult:
+    values = {
+        "A": str(array_job_id),
+        "a": str(task),
+        "j": str(job_id),
+        "J": f"{job_id}.batch",
+        "x": env_base["SLURM_JOB_NAME"],
+        "u": getpass.getuser(),
+        "N": socket.gethostname(),
+        "n": "0",
+        "t": "0",
+    }
+    out_path = workdir / expand_pattern(directives.get("output", "slurm-%A_%a.out"), values)
+    err_path = workdir / expand_pattern(directives["error"], values) if "error" in directives else out_path
+    env = dict(
+        env_base,
+        SLURM_JOB_ID=str(job_id),
+        SLURM_ARRAY_TASK_ID=str(task),
+        SLURM_CPUS_PER_TASK=str(cpus_per_task),
+        SLURMD_NODENAME=values["N"],
+    )
+    cpus = pool.take(cpus_per_task)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    err_path.parent.mkdir(parents=True, exist_ok=True)
+    timed_out = False
+    out = open(out_path, "ab")
+    # Without --error, SLURM writes stderr into the --output file
+    err = open(err_path, "ab") if err_path != out_path else out
+    done = threading.Event()
+
+    def cancel() -> None:
+        nonlocal timed_out
+        timed_out = True
+        # The line slurmstepd writes, which resubmit.py reads as a time-limit kill
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        err.write(f"slurmstepd: error: *** JOB {job_id} ON {values['N']} CANCELLED AT {stamp} DUE TO TIME LIMIT ***\n".encode())
+        err.flush()
+        _kill_group(process.pid, done)
+
+    try:
+        start = time.time()
+        process = subprocess.Popen(
+            ["bash", str(script), *script_args],
+            cwd=workdir,
+            env=env,
+            stdout=out,
+            stderr=err,
+            start_new_session=True,
+        )
+        # Pinned from here rather than in a preexec_fn, which is unsafe with threads;
+        # the script's own children inherit it
+        if cpus and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(process.pid, cpus)
+            except ProcessLookupError:
+                pass
+        timer = threading.Timer(time_limit, cancel) if time_limit is not None else None
+        if timer is not None:
+            timer.start()
+        # wait4 reports the CPU time of the task and every process it reaped
+        _, status, usage = os.wait4(process.pid, 0)
+        done.set()
+        if timer is not None:
+            timer.cancel()
+            timer.join()
+        end = time.time()
+        exit_status = process.returncode = os.waitstatus_to_exitcode(status)
+    finally:
+        pool.give_back(cpus)
+        out.close()
+        if err is not out:
+            err.close()
+    return TaskResult(task, job_id, cpus, start, end, exit_status, timed_out, usage.ru_utime + usage.ru_stime)
+
+
+def _kill_group(pgid: int, done: threading.Event) -> None:
+    """SIGTERM the task's process group, then SIGKILL whatever is left once the script exits or
+    ``KILL_WAIT_SECONDS`` pass."""
+    try:
+        os.killpg(pgid, signal.SIGTERM)
+        done.wait(KILL_WAIT_SECONDS)
+        os.killpg(pgid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def run_array(
+    script: Path,
+    script_args: list[str] | None = None,
+    cpus: int | None = None,
+    array: str | None = None,
+    job_id: int | None = None,
+    enforce_time_limit: bool = True,
+) -> tuple[list[TaskResult], int]:
+    """Run every array task of ``script``; returns the results (in task order) and the CPUs used."""
+    directives = read_directives(script)
+    spec = array or directives.get("array")
+    if not spec:
+        raise ValueError(f"No --array directive in {script} (pass --array)")
+    tasks, throttle = parse_array_spec(spec)
+    cpus_per_task = int(directives.get("cpus-per-task") or 1)
+    cpu_ids = available_cpus(cpus)
+    if cpus_per_task > len(cpu_ids):
+        raise ValueError(f"Tasks need {cpus_per_task} CPUs (--cpus-per-task) but only {len(cpu_ids)} are available")
+    concurrency = min(len(tasks), len(cpu_ids) // cpus_per_task, throttle or len(tasks))
+    time_limit = parse_time_limit(directives.get("time", "")) if enforce_time_limit else None
+    workdir = Path(directives.get("chdir") or os.getcwd())
+    array_job_id = job_id or int(time.time())
+    env_base = dict(
+        os.environ,
+        SLURM_ARRAY_JOB_ID=str(array_job_id),
+        SLURM_ARRAY_TASK_COUNT=str(len(tasks)),
+        SLURM_ARRAY_TASK_MIN=str(tasks[0]),
+        SLURM_ARRAY_TASK_MAX=str(tasks[-1]),
+        SLURM_JOB_NAME=directives.get("job-name") or script.name,
+        SLURM_SUBMIT_DIR=os.getcwd(),
+        SLURM_CPUS_ON_NODE=str(cpus_per_task),
+    )
+    if throttle:
+        env_base["SLURM_ARRAY_TASK_THROTTLE"] = str(throttle)
+
+    print(
+        f"Running {len(tasks)} tasks of {script} as local job {array_job_id}: {concurrency} at a time, "
+        f"{cpus_per_task} CPU(s) each, time limit {directives.get('time') if time_limit else 'none'}"
+    )
+    pool = CpuPool(cpu_ids)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(
+                _run_task,
+                script,
+                script_args or [],
+                task,
+                array_job_id + index,
+                array_job_id,
+                directives,
+                env_base,
+                pool,
+                cpus_per_task,
+                time_limit,
+                workdir,
+            )
+            for index, task in enumerate(tasks)
+        ]
+        results = []
+        for future in futures:
+            result = future.result()
+            status = "TIMEOUT" if result.timed_out else ("COMPLETED" if result.exit_status == 0 else f"FAILED ({result.exit_status})")
+            print(f"Task {result.task}: {status} after {result.seconds:.1f} s")
+            results.append(result)
+    return results, min(len(cpu_ids), concurrency * cpus_per_task)
+
+
+def summarize(results: list[TaskResult], cpus: int) -> str:
+    """Makespan, per-task durations and CPU use of a local array run."""
+    first = min(result.start for result in results)
+    makespan = max(result.end for result in results) - first
+    lines = [f"{'task':>6} {'job_id':>10} {'cpus':>6} {'start_s':>9} {'seconds':>9} {'cpu_s':>9} {'state':>10}"]
+    for result in results:
+        state = "TIMEOUT" if result.timed_out else ("COMPLETED" if result.exit_status == 0 else "FAILED")
+        lines.append(
+            f"{result.task:>6} {result.job_id:>10} {len(result.cpus):>6} {result.start - first:>9.1f} "
+            f"{result.seconds:>9.1f} {result.cpu_seconds:>9.1f} {state:>10}"
+        )
+    durations = [result.seconds for result in results]
+    mean = statistics.fmean(durations)
+    capacity = cpus * makespan
+    allocated = sum(result.seconds * len(result.cpus) for result in results)
+    used = sum(result.cpu_seconds for result in results)
+    failed = sum(1 for result in results if result.exit_status != 0 or result.timed_out)
+    lines += [
+        "",
+        f"Tasks: {len(results)} ({failed} failed or timed out)",
+        f"Makespan (first start to last end): {makespan:.1f} s",
+        f"Task seconds: mean {mean:.1f}  median {statistics.median(durations):.1f}  max {max(durations):.1f}",
+        f"Imbalance (slowest / mean task): {max(durations) / mean if mean > 0 else 1.0:.2f}",
+        f"CPU allocation (pinned CPU-seconds / {cpus} CPUs x makespan): {allocated / capacity if capacity > 0 else 0.0:.0%}",
+        f"CPU utilization (CPU time used / {cpus} CPUs x makespan): {used / capacity if capacity > 0 else 0.0:.0%}",
+    ]
+    return "\n".join(lines)
+
+
+def parse_args(argv: Iterable[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run a SLURM job array script locally and summarise its timing.")
+    parser.add_argument("script", help="Job script, e.g. <prefix>run.sh.")
+    parser.add_argument("script_args", nargs=argparse.REMAINDER, help="Arguments passed on to the script.")
+    parser.add_argument("--cpus", type=int, default=None, help="CPUs to use (default: all available to this process).")
+    parser.add_argument("--array", default=None, help="Array spec overriding the script's, e.g. 1-8%%2.")
+    parser.add_argument("--job-id", type=int, default=None, help="Array job ID (default: derived from the clock).")
+    parser.add_argument("--no-time-limit", action="store_true", help="Do not cancel tasks at their --time limit.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Iterable[str] | None = None) -> None:
+    args = parse_args(argv)
+    sys.stdout.reconfigure(line_buffering=True)
+    try:
+        results, cpus = run_array(
+            Path(args.script), args.script_args, args.cpus, args.array, args.job_id, not args.no_time_limit
+        )
+    except (FileNotFoundError, ValueError) as error:
+        print(f"Error: {error}", file=sys.stderr)
+        raise SystemExit(1) from error
+    print()
+    print(summarize(results, cpus))
+    if any(result.exit_status != 0 or result.timed_out for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Aggregate the per-input ``metrics.jsonl`` records of a run into a timing report.
+
+Each ``<prefix>outputs/output_*/metrics.jsonl`` holds one record from the job
+script (``run.sh``, or ``run_batch`` in in-process mode: wall and CPU time,
+queue wait, node) and one from the Python entry point (start-up time, phase
+timings, files and bytes processed). The latest record of each kind per input
+is used. The report shows where the time goes, throughput percentiles,
+stragglers and a per-node breakdown, and suggests ``SIMS_PER_JOB`` and
+``--time`` values for a target task length.
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import math
+import os
+import statistics
+import sys
+from collections import defaultdict
+from typing import Iterable
+
+from plan_inputs import format_time_limit
+
+JOB_SOURCES = ("run.sh", "run_batch")
+# Counters entry points report as the bytes they worked through
+BYTE_COUNTERS = ("bytes_scanned", "bytes_transferred")
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of ``values`` (``fraction`` in 0..1)."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def load_records(outputs_folder: str) -> dict[str, dict[str, dict]]:
+    """Output dir name -> ``{"job": record, "entry": record}`` (latest of each kind)."""
+    records: dict[str, dict[str, dict]] = {}
+    for path in sorted(glob.glob(os.path.join(outputs_folder, "output_*", "metrics.jsonl"))):
+        sim = os.path.basename(os.path.dirname(path))[len("output_") :]
+        with open(path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                records.setdefault(sim, {})["job" if record.get("source") in JOB_SOURCES else "entry"] = record
+    return records
+
+
+def _spread(values: list[float], unit: str, scale: float = 1.0) -> str:
+    if not values:
+        return "n/a"
+    points = [("p10", 0.1), ("p50", 0.5), ("p90", 0.9), ("p99", 0.99)]
+    shown = "  ".join(f"{name} {percentile(values, fraction) / scale:.2f}" for name, fraction in points)
+    return f"{shown}  max {max(values) / scale:.2f} {unit}"
+
+
+def report(
+    prefix: str,
+    target_seconds: float = 3600.0,
+    straggler_factor: float = 2.0,
+    top: int = 10,
+    time_margin: float = 1.5,
+) -> str:
+    records = load_records(f"{prefix}outputs")
+    if not records:
+        raise FileNotFoundError(f"No metrics.jsonl files under {prefix}outputs/output_*")
+
+    walls: dict[str, float] = {}
+    for sim, kinds in records.items():
+        source = kinds.get("job") or kinds.get("entry")
+        if source and source.get("wall_seconds") is not None:
+            walls[sim] = float(source["wall_seconds"])
+    jobs = [kinds["job"] for kinds in records.values() if "job" in kinds]
+    entries = [kinds["entry"] for kinds in records.values() if "entry" in kinds]
+    failed = [sim for sim, kinds in records.items() if kinds.get("job", {}).get("exit_status", 0) != 0]
+
+    lines = [f"Inputs with metrics: {len(records)} ({len(failed)} failed)"]
+    if walls:
+        lines.append(f"Total sim wall time: {sum(walls.values()):.1f} s")
+    cpu = sum(float(job.get("cpu_user_seconds") or 0) + float(job.get("cpu_system_seconds") or 0) for job in jobs)
+    lines.append(f"Total CPU time (job script view): {cpu:.1f} s")
+
+    # Where the time goes
+    lines += ["", "Where the time goes (summed over inputs):"]
+    queue_waits = {
+        (job.get("run_id"), job.get("task_id")): float(job["queue_wait_seconds"])
+        for job in jobs
+        if job.get("queue_wait_seconds") is not None
+    }
+    if queue_waits:
+        lines.append(f"  {'queue wait (per task)':<28} {statistics.fmean(queue_waits.values()):>10.2f} s mean over {len(queue_waits)} task(s)")
+    startups = [float(entry["startup_seconds"]) for entry in entries if entry.get("startup_seconds") is not None]
+    if startups:
+        lines.append(f"  {'start-up':<28} {sum(startups):>10.2f} s  ({statistics.fmean(startups) * 1000:.1f} ms per input)")
+    phases: dict[str, float] = defaultdict(float)
+    for entry in entries:
+        for name, seconds in (entry.get("phases") or {}).items():
+            phases[name] += float(seconds)
+    for name, seconds in sorted(phases.items(), key=lambda item: -item[1]):
+        lines.append(f"  {name:<28} {seconds:>10.2f} s")
+    overhead = [
+        float(kinds["job"]["wall_seconds"]) - float(kinds["entry"]["wall_seconds"])
+        for kinds in records.values()
+        if "job" in kinds and "entry" in kinds and kinds["job"].get("wall_seconds") is not None
+    ]
+    if overhead:
+        lines.append(f"  {'outside the entry point':<28} {sum(overhead):>10.2f} s  (job script and start-up above)")
+    if any(entry.get("source") == "compress_pull_extract" for entry in entries):
+        lines.append("  (transfer phases are summed over parallel streams)")
+
+    # Throughput
+    lines += ["", "Per-input distributions:"]
+    lines.append(f"  wall time        {_spread(list(walls.values()), 's')}")
+    files_per_second = [
+        float(entry["files_processed"]) / float(entry["wall_seconds"])
+        for entry in entries
+        if entry.get("files_processed") and float(entry.get("wall_seconds") or 0) > 0
+    ]
+    lines.append(f"  files/s          {_spread(files_per_second, 'files/s')}")
+    bytes_per_second = [
+        sum(float(entry.get(counter) or 0) for counter in BYTE_COUNTERS) / float(entry["wall_seconds"])
+        for entry in entries
+        if any(entry.get(counter) for counter in BYTE_COUNTERS) and float(entry.get("wall_seconds") or 0) > 0
+    ]
+    lines.append(f"  MB/s             {_spread(bytes_per_second, 'MB/s', 1e6)}")
+    rss = [float(entry["max_rss_kb"]) for entry in entries if entry.get("max_rss_kb")]
+    lines.append(f"  peak RSS         {_spread(rss, 'MB', 1024)}")
+
+    # Stragglers
+    if walls:
+        median = statistics.median(walls.values())
+        stragglers = sorted(
+            (sim for sim, wall in walls.items() if median > 0 and wall > straggler_factor * median),
+            key=lambda sim: -walls[sim],
+        )
+        lines += ["", f"Stragglers (over {straggler_factor:g}x the median of {median:.2f} s): {len(stragglers)}"]
+        for sim in stragglers[:top]:
+            job = records[sim].get("job") or records[sim].get("entry") or {}
+            lines.append(f"  {sim:<24} task {job.get('task_id', '?'):>6}  node {job.get('node', '?'):<16} {walls[sim]:>9.2f} s  ({walls[sim] / median:.1f}x)")
+
+    # Per node
+    by_node: dict[str, list[dict]] = defaultdict(list)
+    for kinds in records.values():
+        record = kinds.get("job") or kinds.get("entry")
+        if record:
+            by_node[record.get("node", "?")].append(record)
+    lines += ["", f"  {'node':<20} {'inputs':>7} {'failed':>7} {'mean_s':>9} {'p90_s':>9} {'cpu/wall':>9}"]
+    for node, node_records in sorted(by_node.items()):
+        node_walls = [float(record["wall_seconds"]) for record in node_records if record.get("wall_seconds") is not None]
+        node_cpu = sum(float(record.get("cpu_user_seconds") or 0) + float(record.get("cpu_system_seconds") or 0) for record in node_records)
+        node_failed = sum(1 for record in node_records if record.get("exit_status", 0) != 0 or record.get("status") == "error")
+        utilisation = node_cpu / sum(node_walls) if node_walls and sum(node_walls) > 0 else 0.0
+        lines.append(
+            f"  {node:<20} {len(node_records):>7} {node_failed:>7} "
+            f"{statistics.fmean(node_walls) if node_walls else 0:>9.2f} {percentile(node_walls, 0.9) if node_walls else 0:>9.2f} {utilisation:>9.2f}"
+        )
+
+    # Recommendations
+    if walls:
+        typical = percentile(list(walls.values()), 0.9)
+        parallel = max(int(job.get("sims_in_parallel") or 1) for job in jobs) if jobs else 1
+        sims_per_job = max(1, math.floor(target_seconds * parallel / typical)) if typical > 0 else len(walls)
+        predicted = max(max(walls.values()), sims_per_job * typical / parallel)
+        lines += [
+            "",
+            f"Recommended for ~{target_seconds:g} s tasks (p90 input {typical:.2f} s, {parallel} at a time):",
+            f"  SIMS_PER_JOB={sims_per_job}",
+            f"  #SBATCH --time={format_time_limit(predicted * time_margin)}",
+        ]
+    return "\n".join(lines)
+
+
+def parse_args(argv: Iterable[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Summarise per-input metrics of an array run.")
+    parser.add_argument("prefix", help="Run prefix passed to setup.sh.")
+    parser.add_argument("--target-seconds", type=float, default=3600.0, help="Desired wall time per task.")
+    parser.add_argument("--straggler-factor", type=float, default=2.0, help="Flag inputs slower than this times the median.")
+    parser.add_argument("--top", type=int, default=10, help="Stragglers to list.")
+    parser.add_argument("--time-margin", type=float, default=1.5, help="Safety factor on the suggested --time.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Iterable[str] | None = None) -> None:
+    args = parse_args(argv)
+    try:
+        print(report(args.prefix, args.target_seconds, args.straggler_factor, args.top, args.time_margin))
+    except (FileNotFoundError, ValueError) as error:
+        print(f"Error: {error}", file=sys.stderr)
+        raise SystemExit(1) from error
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""Group input YAMLs into array tasks and create their output directories in one pass.
+
+Replaces the per-file loop of ``setup.sh``: the inputs folder is listed once
+with ``os.scandir`` and every ``input_group_%04d.txt`` is written in a single
+write, byte-for-byte the same as the shell loop produced. With
+``--indexed-manifest`` the groups instead go into one ``manifest.txt`` plus a
+fixed-width ``manifest.idx`` (one ``<byte offset> <count>`` record per task) that
+``run.sh`` seeks into by ``SLURM_ARRAY_TASK_ID``.
+
+With ``--pack lpt`` inputs are weighed by a cost model (input size, size of
+the chunk's ``file_list``, or runtimes recorded by earlier runs) and spread
+over tasks with the longest-processing-time-first heuristic, optionally sized
+so each task lands near ``--target-seconds``; the predicted per-task cost goes
+to ``plan.tsv`` for ``plan_report.py``.
+
+Prints the number of array tasks on stdout, followed by a suggested
+``--time`` limit when the plan's runtime can be predicted.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import locale
+import math
+import os
+import statistics
+import sys
+from pathlib import Path
+from typing import Iterable
+
+from input_yaml import read_input_yaml
+
+GROUP_FILE_TEMPLATE = "input_group_{:04d}.txt"
+MANIFEST_NAME = "manifest.txt"
+INDEX_NAME = "manifest.idx"
+# "<20-digit offset> <10-digit count>\n"; run.sh reads record N with dd bs=32 skip=N-1
+INDEX_RECORD = "{:020d} {:010d}\n"
+INDEX_RECORD_SIZE = 32
+PLAN_NAME = "plan.tsv"
+RUNTIMES_SUFFIX = "runtimes.tsv"
+
+PACK_MODES = ("even", "lpt")
+COST_MODELS = ("size", "file-list", "runtime")
+
+
+def list_inputs(inputs_folder: str) -> list[str]:
+    """``input_*.yaml`` files in ``inputs_folder``, ordered like ``ls "$folder"/input_*.yaml | sort``."""
+    with os.scandir(inputs_folder) as entries:
+        paths = [
+            f"{inputs_folder}/{entry.name}"
+            for entry in entries
+            if entry.name.startswith("input_") and entry.name.endswith(".yaml") and entry.is_file()
+        ]
+    # sort(1) collates in the current locale and breaks ties bytewise
+    return sorted(paths, key=lambda path: (locale.strxfrm(path), path))
+
+
+def sim_id(input_path: str) -> str:
+    """``input_0001.yaml`` -> ``0001`` (same as the ``sed`` in setup.sh and run.sh)."""
+    name = os.path.basename(input_path)
+    return name[len("input_") : -len(".yaml")]
+
+
+def group_evenly(inputs: list[str], sims_per_job: int) -> list[list[str]]:
+    """Consecutive groups of ``sims_per_job`` inputs in sorted order."""
+    return [inputs[start : start + sims_per_job] for start in range(0, len(inputs), sims_per_job)]
+
+
+def load_runtimes(path: Path) -> dict[str, float]:
+    """Seconds per sim ID from a ``runtimes.tsv`` written by run.sh (latest successful run wins)."""
+    runtimes: dict[str, float] = {}
+    if not path.exists():
+        return runtimes
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            fields = line.rstrip("\n").split("\t")
+            # sim_id, task_id, start, end, exit_status, run_id
+            if len(fields) >= 5 and fields[4] == "0":
+                runtimes[fields[0]] = float(fields[3]) - float(fields[2])
+    return runtimes
+
+
+def _file_list_path(input_path: str) -> str | None:
+    """The ``file_list:`` an input YAML points at, resolved against the YAML's folder."""
+    value = read_input_yaml(input_path).get("file_list")
+    return os.path.join(os.path.dirname(input_path), os.path.expanduser(value)) if value else None
+
+
+def input_costs(inputs: list[str], cost_model: str, runtimes: dict[str, float]) -> list[float]:
+    """Relative cost of each input under ``cost_model``."""
+    if cost_model == "size":
+        return [float(os.stat(path).st_size) for path in inputs]
+    if cost_model == "file-list":
+        costs = []
+        for path in inputs:
+            file_list = _file_list_path(path)
+            costs.append(float(os.stat(file_list).st_size) if file_list and os.path.exists(file_list) else 0.0)
+        return costs
+    known = [runtimes[sim_id(path)] for path in inputs if sim_id(path) in runtimes]
+    if not known:
+        raise ValueError("The runtime cost model needs runtimes recorded by an earlier run")
+    # Inputs that never ran are assumed to take the median recorded time
+    fallback = statistics.median(known)
+    return [runtimes.get(sim_id(path), fallback) for path in inputs]
+
+
+def seconds_per_cost(inputs: list[str], costs: list[float], runtimes: dict[str, float]) -> float | None:
+    """Seconds per unit of cost, calibrated on inputs that have a recorded runtime."""
+    pairs = [(cost, runtimes[sim_id(path)]) for path, cost in zip(inputs, costs) if sim_id(path) in runtimes]
+    total_cost = sum(cost for cost, _ in pairs)
+    return sum(seconds for _, seconds in pairs) / total_cost if total_cost > 0 else None
+
+
+def group_lpt(inputs: list[str], costs: list[float], num_tasks: int) -> tuple[list[list[str]], list[float]]:
+    """Longest-processing-time-first packing into ``num_tasks`` groups.
+
+    Each input goes to the currently lightest task, heaviest input first. Tasks
+    are returned heaviest first (so the longest ones start first) with their
+    inputs in sorted order, together with each task's total cost.
+    """
+    loads = [(0.0, task) for task in range(num_tasks)]
+    members: list[list[int]] = [[] for _ in range(num_tasks)]
+    for position in sorted(range(len(inputs)), key=lambda i: -costs[i]):
+        load, task = heapq.heappop(loads)
+        members[task].append(position)
+        heapq.heappush(loads, (load + costs[position], task))
+    totals = [sum(costs[i] for i in group) for group in members]
+    order = sorted((task for task in range(num_tasks) if members[task]), key=lambda task: -totals[task])
+    return [[inputs[i] for i in sorted(members[task])] for task in order], [totals[task] for task in order]
+
+
+def concurrent_seconds(costs: list[float], lanes: int) -> float:
+    """Finish time of ``costs`` run in order, each starting on whichever of ``lanes`` frees up first."""
+    finish = [0.0] * max(1, min(lanes, len(costs)))
+    for cost in costs:
+        heapq.heapreplace(finish, finish[0] + cost)
+    return max(finish)
+
+
+def format_time_limit(seconds: float) -> str:
+    """SLURM ``--time`` value (``[D-]HH:MM:SS``), rounded up to whole minutes."""
+    minutes = max(1, math.ceil(seconds / 60))
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{days}-{hours:02d}:{minutes:02d}:00" if days else f"{hours:02d}:{minutes:02d}:00"
+
+
+def write_plan(
+    groups: list[list[str]], predicted: list[float], grouped_folder: Path, unit: str, sims_in_parallel: int = 1
+) -> None:
+    """One row per task; ``sims_in_parallel`` records the concurrency the prediction assumed."""
+    with open(grouped_folder / PLAN_NAME, "w", encoding="utf-8") as handle:
+        handle.write(f"task\tinputs\tpredicted_{unit}\tsims_in_parallel\n")
+        for task, (group, value) in enumerate(zip(groups, predicted), start=1):
+            handle.write(f"{task}\t{len(group)}\t{value:.3f}\t{sims_in_parallel}\n")
+
+
+def write_group_files(groups: list[list[str]], grouped_folder: Path) -> None:
+    for index, group in enumerate(groups, start=1):
+        (grouped_folder / GROUP_FILE_TEMPLATE.format(index)).write_text("".join(f"{path}\n" for path in group), encoding="utf-8")
+    # Drop group files left over from an earlier, larger plan
+    stale = len(groups) + 1
+    while (grouped_folder / GROUP_FILE_TEMPLATE.format(stale)).exists():
+        (grouped_folder / GROUP_FILE_TEMPLATE.format(stale)).unlink()
+        stale += 1
+
+
+def write_indexed_manifest(groups: list[list[str]], grouped_folder: Path) -> None:
+    """All groups in one manifest plus a fixed-width offset/count record per task."""
+    offset = 0
+    with open(grouped_folder / MANIFEST_NAME, "wb") as manifest, open(grouped_folder / INDEX_NAME, "w", encoding="ascii") as index:
+        for group in groups:
+            block = "".join(f"{path}\n" for path in group).encode("utf-8")
+            manifest.write(block)
+            index.write(INDEX_RECORD.format(offset, len(group)))
+            offset += len(block)
+
+
+def read_group(grouped_folder: Path, task_id: int) -> list[str]:
+    """Inputs of array task ``task_id`` (1-based), from group files or the indexed manifest."""
+    index_path = grouped_folder / INDEX_NAME
+    if not index_path.exists():
+        return (grouped_folder / GROUP_FILE_TEMPLATE.format(task_id)).read_text(encoding="utf-8").splitlines()
+    with open(index_path, "rb") as index:
+        index.seek((task_id - 1) * INDEX_RECORD_SIZE)
+        offset, count = (int(field) for field in index.read(INDEX_RECORD_SIZE).split())
+    with open(grouped_folder / MANIFEST_NAME, "rb") as manifest:
+        manifest.seek(offset)
+        return [manifest.readline().decode("utf-8").rstrip("\n") for _ in range(count)]
+
+
+def plan(
+    inputs_folder: str,
+    sims_per_job: int,
+    prefix: str,
+    indexed_manifest: bool = False,
+    pack: str = "even",
+    cost_model: str = "size",
+    runtimes_path: str | None = None,
+    target_seconds: float | None = None,
+    time_margin: float = 1.5,
+    sims_in_parallel: int = 1,
+) -> tuple[int, str | None]:
+    """
+    Write the task groups and output directories for ``prefix``.
+
+    Args:
+        inputs_folder: Folder holding ``input_*.yaml`` files
+        sims_per_job: Inputs per task (``even``), or the task count hint for ``lpt`` without a target
+        prefix: Run prefix naming the grouped inputs and outputs folders
+        indexed_manifest: Write manifest.txt + manifest.idx instead of group files
+        pack: ``even`` (consecutive groups) or ``lpt`` (cost-balanced)
+        cost_model: ``size``, ``file-list`` or ``runtime`` (``lpt`` only)
+        runtimes_path: Runtimes recorded by earlier runs (defaults to ``<prefix>runtimes.tsv``)
+        target_seconds: Aim for tasks of about this many seconds (``lpt`` only)
+        time_margin: Factor applied to the predicted makespan for ``--time``
+        sims_in_parallel: Inputs each task runs at a time (``SIMS_IN_PARALLEL``), for predicted seconds
+
+    Returns:
+        Number of tasks, and a ``--time`` value when the makespan can be predicted
+    """
+    inputs = list_inputs(inputs_folder)
+    if not inputs:
+        raise FileNotFoundError(f"No input_*.yaml files found in {inputs_folder}")
+
+    grouped_folder = Path(f"{prefix}grouped_input_paths")
+    outputs_folder = f"{prefix}outputs"
+    grouped_folder.mkdir(parents=True, exist_ok=True)
+    resolved = [os.path.realpath(path) for path in inputs]
+
+    time_limit = None
+    if pack == "lpt":
+        runtimes = load_runtimes(Path(runtimes_path or f"{prefix}{RUNTIMES_SUFFIX}"))
+        costs = input_costs(inputs, cost_model, runtimes)
+        rate = 1.0 if cost_model == "runtime" else seconds_per_cost(inputs, costs, runtimes)
+        if target_seconds is not None:
+            if rate is None:
+                raise ValueError(f"--target-seconds with the {cost_model} cost model needs runtimes from an earlier run")
+            num_tasks = math.ceil(sum(costs) * rate / (target_seconds * sims_in_parallel))
+        else:
+            num_tasks = math.ceil(len(inputs) / sims_per_job)
+        groups, loads = group_lpt(resolved, costs, max(1, min(num_tasks, len(inputs))))
+        if rate is not None:
+            # A task runs its inputs sims_in_parallel at a time, so its wall time is less than its summed load
+            cost_of = dict(zip(resolved, costs))
+            seconds = [concurrent_seconds([cost_of[path] * rate for path in group], sims_in_parallel) for group in groups]
+            write_plan(groups, seconds, grouped_folder, "seconds", sims_in_parallel)
+            time_limit = format_time_limit(max(seconds) * time_margin)
+        else:
+            write_plan(groups, loads, grouped_folder, cost_model.replace("-", "_"))
+    else:
+        (grouped_folder / PLAN_NAME).unlink(missing_ok=True)
+        groups = group_evenly(resolved, sims_per_job)
+
+    if indexed_manifest:
+        write_indexed_manifest(groups, grouped_folder)
+    else:
+        (grouped_folder / INDEX_NAME).unlink(missing_ok=True)
+        write_group_files(groups, grouped_folder)
+
+    for path in inputs:
+        os.makedirs(f"{outputs_folder}/output_{sim_id(path)}", exist_ok=True)
+    return len(groups), time_limit
+
+
+def parse_args(argv: Iterable[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Group input YAMLs into job array tasks.")
+    parser.add_argument("inputs_folder", help="Folder holding input_*.yaml files.")
+    parser.add_argument("sims_per_job", type=int, help="Inputs per array task.")
+    parser.add_argument("prefix", help="Run prefix (names the grouped inputs and outputs folders).")
+    parser.add_argument(
+        "--indexed-manifest",
+        action="store_true",
+        help="Write one manifest.txt + manifest.idx instead of one input_group file per task.",
+    )
+    parser.add_argument("--pack", choices=PACK_MODES, default="even", help="How inputs are grouped into tasks.")
+    parser.add_argument("--cost", choices=COST_MODELS, default="size", help="Cost model for --pack lpt.")
+    parser.add_argument("--runtimes", default=None, help="Recorded runtimes (default <prefix>runtimes.tsv).")
+    parser.add_argument("--target-seconds", type=float, default=None, help="Target wall time per task for --pack lpt.")
+    parser.add_argument("--time-margin", type=float, default=1.5, help="Safety factor on the predicted makespan.")
+    parser.add_argument(
+        "--sims-in-parallel",
+        type=int,
+        default=1,
+        help="Inputs each task runs at a time (SIMS_IN_PARALLEL), for the predicted seconds and --time.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Iterable[str] | None = None) -> None:
+    args = parse_args(argv)
+    if args.sims_per_job < 1:
+        raise SystemExit("Error: sims_per_job must be a positive integer")
+    if args.sims_in_parallel < 1:
+        raise SystemExit("Error: --sims-in-parallel must be a positive integer")
+    locale.setlocale(locale.LC_COLLATE, "")
+    try:
+        num_jobs, time_limit = plan(
+            args.inputs_folder,
+            args.sims_per_job,
+            args.prefix,
+            args.indexed_manifest,
+            args.pack,
+            args.cost,
+            args.runtimes,
+            args.target_seconds,
+            args.time_margin,
+            args.sims_in_parallel,
+        )
+    except (FileNotFoundError, ValueError) as error:
+        print(f"Error: {error}", file=sys.stderr)
+        raise SystemExit(1) from error
+    print(num_jobs if time_limit is None else f"{num_jobs} {time_limit}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Compare a run's predicted per-task load against what the tasks actually took.
+
+Reads ``<prefix>grouped_input_paths/plan.tsv`` (written by ``plan_inputs.py
+--pack lpt``) and the per-sim wall times ``run.sh`` appends to
+``<prefix>runtimes.tsv``, and prints per-task predicted vs actual seconds, the
+predicted and actual makespan, and how unevenly the work was spread
+(slowest task / mean task). Without a plan, only the actual side is reported,
+which is what to compare an ``even`` run against.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+from plan_inputs import PLAN_NAME, RUNTIMES_SUFFIX
+
+
+class TaskTimes(NamedTuple):
+    start: float
+    end: float
+    sims: int
+    failed: int
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start
+
+
+def read_plan(path: Path) -> tuple[str, dict[int, float]]:
+    """Unit of the prediction (``seconds`` or a raw cost) and the predicted value per task."""
+    with path.open("r", encoding="utf-8") as handle:
+        header = handle.readline().rstrip("\n").split("\t")
+        unit = header[2].removeprefix("predicted_")
+        predicted = {}
+        for line in handle:
+            # Plans written before sims_in_parallel was recorded have three columns
+            task, _inputs, value, *_ = line.rstrip("\n").split("\t")
+            predicted[int(task)] = float(value)
+    return unit, predicted
+
+
+def read_task_times(path: Path, run_id: str | None = None) -> tuple[str, dict[int, TaskTimes]]:
+    """Per-task span of one run in ``runtimes.tsv`` (the last run recorded unless ``run_id`` is given)."""
+    rows = []
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) >= 5:
+                rows.append(fields)
+    if not rows:
+        raise ValueError(f"No runtimes recorded in {path}")
+    if run_id is None:
+        run_id = rows[-1][5] if len(rows[-1]) > 5 else ""
+    tasks: dict[int, TaskTimes] = {}
+    for fields in rows:
+        if (fields[5] if len(fields) > 5 else "") != run_id:
+            continue
+        task, start, end, failed = int(fields[1]), float(fields[2]), float(fields[3]), fields[4] != "0"
+        if task in tasks:
+            previous = tasks[task]
+            start, end = min(start, previous.start), max(end, previous.end)
+            tasks[task] = TaskTimes(start, end, previous.sims + 1, previous.failed + failed)
+        else:
+            tasks[task] = TaskTimes(start, end, 1, int(failed))
+    return run_id, tasks
+
+
+def imbalance(seconds: list[float]) -> float:
+    """Slowest task over the mean task (1.0 is perfectly balanced)."""
+    mean = statistics.fmean(seconds)
+    return max(seconds) / mean if mean > 0 else 1.0
+
+
+def report(prefix: str, run_id: str | None = None) -> str:
+    plan_path = Path(f"{prefix}grouped_input_paths") / PLAN_NAME
+    unit, predicted = read_plan(plan_path) if plan_path.exists() else ("", {})
+    run_id, tasks = read_task_times(Path(f"{prefix}{RUNTIMES_SUFFIX}"), run_id)
+
+    lines = [f"Run: {run_id or '(unlabelled)'}"]
+    header = f"{'task':>6} {'sims':>6} {'failed':>6} {'actual_s':>10}"
+    if predicted:
+        header += f" {'predicted_' + unit:>20}"
+    lines.append(header)
+    for task in sorted(set(tasks) | set(predicted)):
+        times = tasks.get(task)
+        line = f"{task:>6} " + (f"{times.sims:>6} {times.failed:>6} {times.seconds:>10.1f}" if times else f"{'-':>6} {'-':>6} {'-':>10}")
+        if predicted:
+            line += f" {predicted.get(task, float('nan')):>20.1f}"
+        lines.append(line)
+
+    actual = [times.seconds for times in tasks.values()]
+    span = max(times.end for times in tasks.values()) - min(times.start for times in tasks.values())
+    lines.append("")
+    lines.append(f"Actual makespan (slowest task): {max(actual):.1f} s")
+    lines.append(f"Actual span (first start to last end): {span:.1f} s")
+    lines.append(f"Actual imbalance (slowest / mean task): {imbalance(actual):.2f}")
+    if predicted and unit == "seconds":
+        lines.append(f"Predicted makespan: {max(predicted.values()):.1f} s")
+        lines.append(f"Predicted imbalance: {imbalance(list(predicted.values())):.2f}")
+    elif predicted:
+        lines.append(f"Predicted imbalance ({unit}): {imbalance(list(predicted.values())):.2f}")
+    return "\n".join(lines)
+
+
+def parse_args(argv: Iterable[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare planned and actual per-task runtimes.")
+    parser.add_argument("prefix", help="Run prefix passed to setup.sh.")
+    parser.add_argument("--run-id", default=None, help="SLURM array job ID to report (default: the last recorded run).")
+    return parser.parse_args(argv)
+
+
+def main(argv: Iterable[str] | None = None) -> None:
+    args = parse_args(argv)
+    try:
+        print(report(args.prefix, args.run_id))
+    except (FileNotFoundError, ValueError) as error:
+        print(f"Error: {error}", file=sys.stderr)
+        raise SystemExit(1) from error
+
+
+if __name__ == "__main__":
+    main()
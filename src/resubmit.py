@@ -0,0 +1,198 @@
+"""Build a job script that reruns only the array tasks with unfinished inputs.
+
+Every sim that succeeds leaves a ``.completed`` marker in its output directory
+(and ``run.sh`` skips sims that have one), so after a timeout, node failure or
+failed sims the inputs still to do are exactly those without a marker. This
+script finds them, reads the tasks' SLURM logs to say why each task fell short,
+and writes ``<prefix>resubmit_run.sh``: a copy of ``<prefix>run.sh`` whose
+``--array`` lists only the affected tasks. With ``--tasks N`` the unfinished
+inputs are instead repacked (longest recorded runtime first) into N new tasks
+under ``<prefix>grouped_input_paths/resubmit/``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Iterable
+
+from plan_inputs import (
+    INDEX_NAME,
+    RUNTIMES_SUFFIX,
+    group_lpt,
+    input_costs,
+    load_runtimes,
+    read_group,
+    sim_id,
+    write_group_files,
+    write_indexed_manifest,
+)
+from run_batch import is_completed
+
+RESUBMIT_FOLDER = "resubmit"
+RESUBMIT_JOB_SUFFIX = "resubmit_run.sh"
+
+# Lines slurmstepd writes to a task's stderr when it is killed
+_KILL_REASONS = (
+    ("DUE TO TIME LIMIT", "time limit"),
+    ("DUE TO NODE FAIL", "node failure"),
+    ("oom-kill", "out of memory"),
+    ("DUE TO PREEMPTION", "preempted"),
+    ("CANCELLED", "cancelled"),
+)
+
+
+def array_tasks(job_file: Path) -> list[int]:
+    """Task IDs in the ``#SBATCH --array`` line of ``job_file``."""
+    for line in job_file.read_text(encoding="utf-8").splitlines():
+        match = re.match(r"\s*#SBATCH\s+--array=([0-9,\-]+)", line)
+        if match:
+            return parse_array(match.group(1))
+    raise ValueError(f"No #SBATCH --array line in {job_file}")
+
+
+def parse_array(spec: str) -> list[int]:
+    tasks = []
+    for part in spec.split(","):
+        first, _, last = part.partition("-")
+        tasks.extend(range(int(first), int(last or first) + 1))
+    return tasks
+
+
+def format_array(tasks: list[int]) -> str:
+    """``[1, 2, 3, 7]`` -> ``1-3,7``."""
+    ranges = []
+    for task in sorted(tasks):
+        if ranges and task == ranges[-1][1] + 1:
+            ranges[-1][1] = task
+        else:
+            ranges.append([task, task])
+    return ",".join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+def unfinished_inputs(grouped_folder: Path, outputs_folder: str, tasks: list[int]) -> dict[int, list[str]]:
+    """Task ID -> inputs of that task without a completion marker (tasks with none left are omitted)."""
+    unfinished = {}
+    for task in tasks:
+        pending = [path for path in read_group(grouped_folder, task) if not is_completed(f"{outputs_folder}/output_{sim_id(path)}")]
+        if pending:
+            unfinished[task] = pending
+    return unfinished
+
+
+def _latest_log(logs_dir: str, task: int, extension: str) -> str | None:
+    def job_id(path: str) -> int:
+        match = re.search(r"_(\d+)_\d+\.\w+$", path)
+        return int(match.group(1)) if match else -1
+
+    candidates = glob.glob(os.path.join(logs_dir, f"*_{task}.{extension}"))
+    return max(candidates, key=job_id) if candidates else None
+
+
+def failure_reason(logs_dir: str, task: int) -> str:
+    """Why a task left inputs unfinished, going by its latest SLURM logs."""
+    out_log = _latest_log(logs_dir, task, "out")
+    err_log = _latest_log(logs_dir, task, "err")
+    if out_log is None and err_log is None:
+        return "no log (never ran?)"
+    if err_log is not None:
+        errors = Path(err_log).read_text(encoding="utf-8", errors="replace")
+        for pattern, reason in _KILL_REASONS:
+            if pattern in errors:
+                return reason
+    if out_log is not None:
+        output = Path(out_log).read_text(encoding="utf-8", errors="replace")
+        failed = len(re.findall(r"^Error: Simulation \S+ failed", output, re.MULTILINE))
+        if "All simulations in task" not in output:
+            return "did not finish"
+        if failed:
+            return f"{failed} failed sim(s)"
+    return "unknown"
+
+
+def write_job_file(job_file: Path, target: Path, tasks: list[int], grouped_folder: str | None = None) -> None:
+    """Copy ``job_file`` to ``target`` with a new ``--array`` (and group folder, when repacked).
+
+    A ``%N`` throttle on the original ``--array`` line is kept.
+    """
+    script = job_file.read_text(encoding="utf-8")
+    script = re.sub(
+        r"(?m)^(\s*#SBATCH\s+--array=)[0-9,\-]*(%\d+)?.*$",
+        lambda match: match.group(1) + format_array(tasks) + (match.group(2) or ""),
+        script,
+    )
+    if grouped_folder is not None:
+        script = script.replace(f'"{grouped_folder}/', f'"{grouped_folder}/{RESUBMIT_FOLDER}/')
+    target.write_text(script, encoding="utf-8")
+    target.chmod(0o755)
+
+
+def resubmit(prefix: str, logs_dir: str = "logs", num_tasks: int | None = None) -> Path | None:
+    """
+    Write ``<prefix>resubmit_run.sh`` covering the unfinished inputs of ``<prefix>run.sh``.
+
+    Args:
+        prefix: Run prefix passed to setup.sh
+        logs_dir: Folder with the tasks' ``*_<task>.out``/``.err`` logs
+        num_tasks: Repack the unfinished inputs into this many tasks instead of rerunning their tasks
+
+    Returns:
+        The job script, or None when every input has completed
+    """
+    job_file = Path(f"{prefix}run.sh")
+    grouped_folder = f"{prefix}grouped_input_paths"
+    unfinished = unfinished_inputs(Path(grouped_folder), f"{prefix}outputs", array_tasks(job_file))
+    if not unfinished:
+        print("All inputs have completed; nothing to resubmit")
+        return None
+
+    print(f"{'task':>6} {'unfinished':>10}  reason")
+    for task, pending in unfinished.items():
+        print(f"{task:>6} {len(pending):>10}  {failure_reason(logs_dir, task)}")
+
+    target = Path(f"{prefix}{RESUBMIT_JOB_SUFFIX}")
+    if num_tasks is None:
+        write_job_file(job_file, target, list(unfinished))
+        print(f"Rerunning {len(unfinished)} task(s); completed sims in them are skipped")
+    else:
+        inputs = [path for pending in unfinished.values() for path in pending]
+        runtimes = load_runtimes(Path(f"{prefix}{RUNTIMES_SUFFIX}"))
+        cost_model = "runtime" if any(sim_id(path) in runtimes for path in inputs) else "size"
+        groups, _ = group_lpt(inputs, input_costs(inputs, cost_model, runtimes), max(1, min(num_tasks, len(inputs))))
+        resubmit_folder = Path(grouped_folder) / RESUBMIT_FOLDER
+        resubmit_folder.mkdir(parents=True, exist_ok=True)
+        if (Path(grouped_folder) / INDEX_NAME).exists():
+            write_indexed_manifest(groups, resubmit_folder)
+        else:
+            write_group_files(groups, resubmit_folder)
+        write_job_file(job_file, target, list(range(1, len(groups) + 1)), grouped_folder)
+        print(f"Repacked {len(inputs)} unfinished input(s) into {len(groups)} task(s)")
+    print(f"Submit with: sbatch {target}")
+    return target
+
+
+def parse_args(argv: Iterable[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Resubmit only the array tasks with missing or failed inputs.")
+    parser.add_argument("prefix", help="Run prefix passed to setup.sh.")
+    parser.add_argument("--logs-dir", default="logs", help="Folder holding the tasks' SLURM .out/.err logs.")
+    parser.add_argument("--tasks", type=int, default=None, help="Repack the unfinished inputs into this many tasks.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Iterable[str] | None = None) -> None:
+    args = parse_args(argv)
+    if args.tasks is not None and args.tasks < 1:
+        raise SystemExit("Error: --tasks must be a positive integer")
+    try:
+        resubmit(args.prefix, args.logs_dir, args.tasks)
+    except (FileNotFoundError, ValueError) as error:
+        print(f"Error: {error}", file=sys.stderr)
+        raise SystemExit(1) from error
+
+
+if __name__ == "__main__":
+    main()
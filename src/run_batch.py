@@ -0,0 +1,217 @@
+"""Run a task's inputs in one Python process instead of one script per input.
+
+``run.sh`` normally starts ``bash <run_simulation_script>`` for every input,
+which for Python workloads means a fresh interpreter, fresh imports and a
+fresh YAML parse each time. When ``setup.sh`` is given a ``BATCH_HANDLER`` (a
+Python file defining ``run_input(input_yaml, output_dir)``), ``run.sh`` instead
+hands the task's input list to this script, which imports the handler once and
+calls it per input. Each input keeps its ``output_<sim_id>`` directory, its
+block in the task log and its row in ``runtimes.tsv``, exactly as in the
+per-input mode.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import os
+import socket
+import sys
+import time
+import traceback
+from pathlib import Path
+from typing import Callable, Iterable
+
+from plan_inputs import sim_id
+from run_metrics import cpu_seconds
+
+Handler = Callable[[Path, Path], object]
+
+# Written into an output directory once its sim succeeds; run.sh and resubmit.py read it too
+COMPLETION_MARKER = ".completed"
+
+
+def load_handler(path: str) -> Handler:
+    """``run_input`` from the Python file at ``path`` (its folder goes on ``sys.path`` for sibling imports)."""
+    module_path = Path(path).resolve()
+    sys.path.insert(0, str(module_path.parent))
+    spec = importlib.util.spec_from_file_location(module_path.stem, module_path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Cannot load batch handler {path}")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_path.stem] = module
+    spec.loader.exec_module(module)
+    handler = getattr(module, "run_input", None)
+    if not callable(handler):
+        raise ImportError(f"Batch handler {path} does not define run_input(input_yaml, output_dir)")
+    return handler
+
+
+def is_completed(output_dir: str | Path) -> bool:
+    return os.path.isfile(os.path.join(output_dir, COMPLETION_MARKER))
+
+
+def mark_completed(output_dir: str | Path, run_id: str, task_id: str) -> None:
+    """Write the completion marker atomically (temporary file, then rename)."""
+    marker = os.path.join(output_dir, COMPLETION_MARKER)
+    with open(f"{marker}.tmp", "w", encoding="utf-8") as handle:
+        handle.write(f"{run_id}\t{task_id}\t{time.time():.9f}\n")
+    os.replace(f"{marker}.tmp", marker)
+
+
+def clear_completed(output_dir: str | Path) -> None:
+    Path(output_dir, COMPLETION_MARKER).unlink(missing_ok=True)
+
+
+def _run_one(handler: Handler, input_yaml: str, output_dir: str) -> int:
+    try:
+        handler(Path(input_yaml), Path(output_dir))
+    except SystemExit as exit_:
+        # Handlers reuse CLI code that exits on bad input
+        code = exit_.code
+        if code not in (None, 0):
+            print(code if isinstance(code, str) else f"Exited with status {code}", file=sys.stderr)
+            return code if isinstance(code, int) else 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+def run_batch(
+    inputs: list[str],
+    outputs_folder: str,
+    handler: Handler,
+    runtimes_file: str | None = None,
+    status_file: str | None = None,
+    run_id: str = "local",
+    rerun_completed: bool = False,
+    queue_wait: float | None = None,
+    sims_in_parallel: int = 1,
+) -> int:
+    """
+    Run every input through ``handler``, logging like ``run.sh`` does.
+
+    Args:
+        inputs: Input YAML paths, in task order
+        outputs_folder: Folder holding the ``output_<sim_id>`` directories
+        handler: ``run_input(input_yaml, output_dir)``; raising marks the input failed
+        runtimes_file: ``runtimes.tsv`` to append one row per input to
+        status_file: File to append ``<sim_id>\\t<exit status>`` rows to
+        run_id: SLURM array job ID recorded in ``runtimes.tsv``
+        rerun_completed: Also run inputs whose output directory holds a completion marker
+        queue_wait: Seconds the task waited in the queue, recorded in each input's ``metrics.jsonl``
+        sims_in_parallel: Batch runners the task started side by side, recorded for ``metrics_report.py``
+
+    Returns:
+        Number of failed inputs
+    """
+    task_id = os.environ.get("SLURM_ARRAY_TASK_ID", "")
+    shared = os.environ.get("SHARED_TRANSFER_DIR", "")
+    node = socket.gethostname()
+    failed = 0
+    for input_yaml in inputs:
+        current = sim_id(input_yaml)
+        output_dir = f"{outputs_folder}/output_{current}"
+        if not rerun_completed and is_completed(output_dir):
+            print(f"Skipping simulation {current} (already completed)")
+            print("")
+            if status_file:
+                with open(status_file, "a", encoding="utf-8") as handle:
+                    handle.write(f"{current}\t0\n")
+            continue
+        print(f"Running simulation: {input_yaml} -> {output_dir} (shared: {shared})")
+        # A rerun that fails must not keep the marker of an earlier success
+        clear_completed(output_dir)
+        start = time.time()
+        cpu_before = cpu_seconds()
+        # Handlers record their start-up time against this, as under run.sh
+        os.environ["SIM_ID"] = current
+        os.environ["SIM_START"] = f"{start:.9f}"
+        status = _run_one(handler, input_yaml, output_dir)
+        end = time.time()
+        cpu_after = cpu_seconds()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        record = {
+            "source": "run_batch",
+            "sim_id": current,
+            "task_id": task_id,
+            "run_id": run_id,
+            "node": node,
+            "exit_status": status,
+            "started_at": round(start, 6),
+            "wall_seconds": round(end - start, 6),
+            "cpu_user_seconds": round(cpu_after[0] - cpu_before[0], 6),
+            "cpu_system_seconds": round(cpu_after[1] - cpu_before[1], 6),
+            "queue_wait_seconds": queue_wait,
+            "sims_in_parallel": sims_in_parallel,
+        }
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, "metrics.jsonl"), "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(record) + "\n")
+        if runtimes_file:
+            with open(runtimes_file, "a", encoding="utf-8") as handle:
+                handle.write(f"{current}\t{task_id}\t{start:.9f}\t{end:.9f}\t{status}\t{run_id}\n")
+        if status_file:
+            with open(status_file, "a", encoding="utf-8") as handle:
+                handle.write(f"{current}\t{status}\n")
+        if status == 0:
+            mark_completed(output_dir, run_id, task_id)
+            print(f"Simulation {current} completed successfully")
+        else:
+            print(f"Error: Simulation {current} failed")
+            failed += 1
+        print("")
+    return failed
+
+
+def read_inputs(path: str) -> list[str]:
+    with open(path, "r", encoding="utf-8") as handle:
+        return [line.rstrip("\n") for line in handle if line.strip()]
+
+
+def parse_args(argv: Iterable[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run a task's inputs through a Python handler in one process.")
+    parser.add_argument("input_list", help="File with one input YAML path per line (e.g. input_group_0001.txt).")
+    parser.add_argument("outputs_folder", help="Folder holding the output_<sim_id> directories.")
+    parser.add_argument("--handler", required=True, help="Python file defining run_input(input_yaml, output_dir).")
+    parser.add_argument("--runtimes-file", default=None, help="runtimes.tsv to append per-input timings to.")
+    parser.add_argument("--status-file", default=None, help="File to append per-input exit statuses to.")
+    parser.add_argument("--run-id", default="local", help="Array job ID recorded in the runtimes file.")
+    parser.add_argument(
+        "--rerun-completed",
+        default="false",
+        help="Run inputs that already have a completion marker too (true/false).",
+    )
+    parser.add_argument("--queue-wait", default=None, help="Seconds the task waited in the queue (for metrics).")
+    parser.add_argument(
+        "--sims-in-parallel",
+        type=int,
+        default=1,
+        help="Batch runners the task runs side by side (SIMS_IN_PARALLEL, for metrics).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Iterable[str] | None = None) -> None:
+    args = parse_args(argv)
+    # Keep this process's lines in order with the output of the subprocesses handlers start
+    sys.stdout.reconfigure(line_buffering=True)
+    handler = load_handler(args.handler)
+    run_batch(
+        read_inputs(args.input_list),
+        args.outputs_folder,
+        handler,
+        args.runtimes_file,
+        args.status_file,
+        args.run_id,
+        args.rerun_completed.strip().lower() in {"1", "true", "yes", "on"},
+        float(args.queue_wait) if args.queue_wait not in (None, "", "null") else None,
+        args.sims_in_parallel,
+    )
+
+
+if __name__ == "__main__":
+    main()
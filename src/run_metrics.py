@@ -0,0 +1,106 @@
+"""Per-input performance record appended to ``metrics.jsonl`` in the output directory.
+
+One JSON object per run of an entry point: wall and CPU time (this process plus
+its reaped children), peak RSS, bytes read and written through system calls
+(``/proc/self/io``, this process only), named phase timings and counters such
+as files processed. ``run.sh`` exports ``SIM_START`` and ``SIM_ID`` so the
+record also carries the start-up time between the job script launching the
+input and this code starting on it. ``metrics_report.py`` aggregates the
+records across a run. The examples' entry points and ``run_batch.py`` share this
+module.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import resource
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+
+def cpu_seconds() -> tuple[float, float]:
+    """User and system CPU seconds of this process plus its reaped children."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + children.ru_utime, own.ru_stime + children.ru_stime
+
+
+def _max_rss_kb() -> int:
+    # Linux reports kilobytes; the peak covers the whole process, not just this input
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max(own, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+def _io_bytes() -> tuple[int, int]:
+    try:
+        with open("/proc/self/io", "r", encoding="ascii") as handle:
+            fields = dict(line.split(": ") for line in handle.read().splitlines())
+    except OSError:
+        return 0, 0
+    return int(fields.get("rchar", 0)), int(fields.get("wchar", 0))
+
+
+class RunMetrics:
+    """Collects one input's metrics; ``write`` appends them to ``path`` (a no-op without one)."""
+
+    def __init__(self, path: str | Path | None = None, source: str = "") -> None:
+        self.path = Path(path) if path else None
+        self.source = source
+        self.phases: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+        self.lock = threading.Lock()
+        self._started = time.time()
+        self._clock = time.perf_counter()
+        self._cpu = cpu_seconds()
+        self._io = _io_bytes()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Add the time spent in the block to phase ``name`` (summed over threads and repeats)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def count(self, **values: int) -> None:
+        with self.lock:
+            for name, value in values.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def record(self, status: str = "ok") -> dict[str, object]:
+        user, system = cpu_seconds()
+        read, written = _io_bytes()
+        sim_start = os.environ.get("SIM_START", "")
+        return {
+            "source": self.source,
+            "sim_id": os.environ.get("SIM_ID", ""),
+            "task_id": os.environ.get("SLURM_ARRAY_TASK_ID", ""),
+            "run_id": os.environ.get("SLURM_ARRAY_JOB_ID") or os.environ.get("SLURM_JOB_ID") or "local",
+            "node": socket.gethostname(),
+            "status": status,
+            "started_at": round(self._started, 6),
+            "startup_seconds": round(self._started - float(sim_start), 6) if sim_start else None,
+            "wall_seconds": round(time.perf_counter() - self._clock, 6),
+            "cpu_user_seconds": round(user - self._cpu[0], 6),
+            "cpu_system_seconds": round(system - self._cpu[1], 6),
+            "max_rss_kb": _max_rss_kb(),
+            "io_read_bytes": read - self._io[0],
+            "io_write_bytes": written - self._io[1],
+            "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            **self.counters,
+        }
+
+    def write(self, status: str = "ok") -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(self.record(status)) + "\n")
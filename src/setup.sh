@@ -38,54 +38,49 @@ if [ ! -d "$INPUTS_FOLDER" ]; then
     exit 1
 fi
 
-# Create grouped input paths folder
-GROUPED_FOLDER="${PREFIX}grouped_input_paths"
-mkdir -p "$GROUPED_FOLDER"
-
-# Create outputs folder
-OUTPUTS_FOLDER="${PREFIX}outputs"
-mkdir -p "$OUTPUTS_FOLDER"
-
-# Get all input yaml files sorted
-INPUT_FILES=($(ls "$INPUTS_FOLDER"/input_*.yaml 2>/dev/null | sort))
-TOTAL_SIMS=${#INPUT_FILES[@]}
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 
-if [ $TOTAL_SIMS -eq 0 ]; then
-    echo "Error: No input_*.yaml files found in $INPUTS_FOLDER"
-    exit 1
+# Group inputs into tasks, write the group files and create output directories
+# (INDEXED_MANIFEST=true writes one seekable manifest instead of one file per task)
+PLAN_ARGS=("$INPUTS_FOLDER" "$SIMS_PER_JOB" "$PREFIX")
+if [ "${INDEXED_MANIFEST:-false}" = "true" ]; then
+    PLAN_ARGS+=(--indexed-manifest)
 fi
-
-# Calculate number of jobs needed
-NUM_JOBS=$(( (TOTAL_SIMS + SIMS_PER_JOB - 1) / SIMS_PER_JOB ))
-
-# Create grouped input files and output directories
-job_num=1
-sim_count=0
-
-for input_file in "${INPUT_FILES[@]}"; do
-    # Extract simulation number from filename (e.g., input_0001.yaml -> 0001)
-    sim_id=$(basename "$input_file" | sed 's/input_\(.*\)\.yaml/\1/')
-    
-    # Determine which job group this belongs to
-    job_num=$(( (sim_count / SIMS_PER_JOB) + 1 ))
-    job_file=$(printf "${GROUPED_FOLDER}/input_group_%04d.txt" $job_num)
-    
-    # Get absolute path of input file
-    abs_input_file=$(readlink -f "$input_file")
-    
-    # Append to the appropriate job group file
-    echo "$abs_input_file" >> "$job_file"
-    
-    # Create output directory for this simulation
-    output_dir="${OUTPUTS_FOLDER}/output_${sim_id}"
-    mkdir -p "$output_dir"
-    
-    sim_count=$((sim_count + 1))
-done
+# PACK_MODE=lpt balances tasks by cost (PACK_COST=size|file-list|runtime) instead of
+# taking SIMS_PER_JOB consecutive inputs; PACK_TARGET_SECONDS sizes tasks by wall time
+if [ -n "${PACK_MODE:-}" ]; then
+    PLAN_ARGS+=(--pack "$PACK_MODE")
+fi
+if [ -n "${PACK_COST:-}" ]; then
+    PLAN_ARGS+=(--cost "$PACK_COST")
+fi
+if [ -n "${PACK_RUNTIMES:-}" ]; then
+    PLAN_ARGS+=(--runtimes "$PACK_RUNTIMES")
+fi
+if [ -n "${PACK_TARGET_SECONDS:-}" ]; then
+    PLAN_ARGS+=(--target-seconds "$PACK_TARGET_SECONDS")
+fi
+if [ -n "${PACK_TIME_MARGIN:-}" ]; then
+    PLAN_ARGS+=(--time-margin "$PACK_TIME_MARGIN")
+fi
+# Predicted task times assume the concurrency run.sh will use: SIMS_IN_PARALLEL if set now,
+# else the --cpus-per-task of the defaults file
+PLAN_PARALLEL=${SIMS_IN_PARALLEL:-$(sed -n 's/^#SBATCH[[:space:]]*\(--cpus-per-task=\|-c[[:space:]]*\)\([0-9][0-9]*\).*/\2/p' "$SLURM_DEFAULTS_FILE" | tail -n 1)}
+if [[ "${PLAN_PARALLEL:-}" =~ ^[1-9][0-9]*$ ]]; then
+    PLAN_ARGS+=(--sims-in-parallel "$PLAN_PARALLEL")
+fi
+PLAN_OUTPUT=$(python3 "$SCRIPT_DIR/plan_inputs.py" "${PLAN_ARGS[@]}") || exit 1
+read -r NUM_JOBS TIME_LIMIT <<< "$PLAN_OUTPUT"
 
 # Generate the job file
-SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
-bash "$SCRIPT_DIR/generate_job_file.sh" "$RUN_SIMULATION_SCRIPT" "$SLURM_DEFAULTS_FILE" "$NUM_JOBS" "$PREFIX"
+bash "$SCRIPT_DIR/generate_job_file.sh" "$RUN_SIMULATION_SCRIPT" "$SLURM_DEFAULTS_FILE" "$NUM_JOBS" "$PREFIX" "$TIME_LIMIT"
 
 echo "Created $NUM_JOBS job groups"
+if [ -n "$TIME_LIMIT" ]; then
+    echo "Planned time limit per task: $TIME_LIMIT (see ${PREFIX}grouped_input_paths/plan.tsv)"
+fi
+COMPLETED=$(find "${PREFIX}outputs" -mindepth 2 -maxdepth 2 -name .completed | wc -l)
+if [ "$COMPLETED" -gt 0 ]; then
+    echo "Note: $COMPLETED sims already completed in ${PREFIX}outputs and will be skipped (RERUN_COMPLETED=true reruns them)"
+fi
 echo "Submit with: sbatch ${PREFIX}run.sh"
@@ -0,0 +1,13 @@
+"""Put the framework scripts and the filter-papers example modules on ``sys.path``.
+
+The example stages import their siblings by bare module name, as they do when
+run from their own folders.
+"""
+
+import sys
+from pathlib import Path
+
+_ROOT = Path(__file__).resolve().parent.parent
+for _folder in ("src", "examples/filter-papers/filter", "examples/filter-papers/move"):
+    if str(_ROOT / _folder) not in sys.path:
+        sys.path.insert(0, str(_ROOT / _folder))
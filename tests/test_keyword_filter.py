@@ -0,0 +1,76 @@
+"""KeywordMatcher must report exactly what the original per-term ``re.search`` loop found."""
+
+import io
+import random
+import re
+
+import pytest
+
+from keyword_filter import PK_KEYWORDS, KeywordMatcher, search_file_for_keywords
+
+
+def reference_search(content, keywords, case_sensitive):
+    """The baseline loop: one word-boundary search per term over the (lowercased) text."""
+    flags = 0 if case_sensitive else re.IGNORECASE
+    text = content if case_sensitive else content.lower()
+    return {
+        category: [
+            term
+            for term in terms
+            if re.search(r"\b" + re.escape(term if case_sensitive else term.lower()) + r"\b", text, flags)
+        ]
+        for category, terms in keywords.items()
+    }
+
+
+def random_texts(count, seed=0):
+    """Texts mixing terms (with case variants and fused neighbours) and filler words."""
+    rng = random.Random(seed)
+    terms = [term for terms in PK_KEYWORDS.values() for term in terms]
+    filler = ["the", "model", "patients", "dose", "xPK", "PKs", "compartments", "ka-", "-ke", "ſ", "ı", "İ"]
+    separators = [" ", " ", ", ", "\n", "-", "/", "", "_"]
+    texts = []
+    for _ in range(count):
+        words = []
+        for _ in range(rng.randint(0, 30)):
+            word = rng.choice(terms) if rng.random() < 0.4 else rng.choice(filler)
+            if rng.random() < 0.3:
+                word = "".join(char.upper() if rng.random() < 0.5 else char for char in word)
+            words.append(word + rng.choice(separators))
+        texts.append("".join(words))
+    return texts
+
+
+@pytest.mark.parametrize("case_sensitive", [False, True])
+def test_matches_reference_search(case_sensitive):
+    matcher = KeywordMatcher(PK_KEYWORDS, case_sensitive)
+    for text in random_texts(400):
+        expected = reference_search(text, PK_KEYWORDS, case_sensitive)
+        assert matcher.search(text) == expected, text
+        assert matcher.search_stream(io.StringIO(text), window_size=16) == expected, text
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "pharmacokineticſ",  # long s folds to 's' under IGNORECASE
+        "PHARMACOKINETIſ and pharmacokineticſ data",
+        "elımination phaſe",  # dotless i folds to 'i'
+        "populatıon PK with Mıchaelis-Menten clearance",
+        "PHARMACOKİNETIC",
+    ],
+)
+def test_non_ascii_case_folds_match_reference(text):
+    matcher = KeywordMatcher(PK_KEYWORDS)
+    expected = reference_search(text, PK_KEYWORDS, False)
+    assert matcher.search(text) == expected
+    assert matcher.search_stream(io.StringIO(text), window_size=8) == expected
+
+
+def test_file_search_keeps_matches_next_to_folded_characters(tmp_path):
+    paper = tmp_path / "paper.txt"
+    paper.write_text("A pharmacokineticſ study of elımination in a two-compartment model\n", encoding="utf-8")
+    results = search_file_for_keywords(paper, PK_KEYWORDS)
+    assert results == reference_search(paper.read_text(encoding="utf-8"), PK_KEYWORDS, False)
+    assert results["pharmacokinetics"] == ["pharmacokinetics"]
+    assert results["parameters"] == ["elimination"]
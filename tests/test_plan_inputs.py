@@ -0,0 +1,17 @@
+"""Cost inputs of ``plan_inputs.py`` read the chunk YAMLs the examples write."""
+
+from plan_inputs import input_costs
+
+
+def test_file_list_cost_follows_quoted_paths(tmp_path):
+    folder = tmp_path / "it's #1"
+    folder.mkdir()
+    file_list = folder / "chunk_000000"
+    file_list.write_text("a\nb\nc\n", encoding="utf-8")
+    quoted = str(file_list).replace("'", "''")
+    spec = tmp_path / "input_0001.yaml"
+    spec.write_text(f"file_list: '{quoted}'  # written by _1_prepare_inputs.sh\ncase_sensitive: false\n", encoding="utf-8")
+    relative = folder / "input_0002.yaml"
+    relative.write_text("file_list: chunk_000000\n", encoding="utf-8")
+
+    assert input_costs([str(spec), str(relative)], "file-list", {}) == [6.0, 6.0]
@@ -0,0 +1,58 @@
+"""Reruns with the scan cache return the same results and only rescan what changed."""
+
+import os
+
+from keyword_filter_runner import run_keyword_search
+
+PAPERS = {
+    "a.txt": "A two-compartment model with first-order absorption.\n",
+    "b.txt": "Nothing relevant here.\n",
+    "c.txt": "Population PK analysis in NONMEM estimated clearance.\n",
+}
+
+
+def cache_stats(output_dir):
+    lines = (output_dir / "stats.txt").read_text(encoding="utf-8").splitlines()
+    return {key: int(value) for key, value in (line.split(": ") for line in lines if line.startswith("Cache"))}
+
+
+def test_cached_rerun_matches_fresh_scan(tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    for name, text in PAPERS.items():
+        (corpus / name).write_text(text, encoding="utf-8")
+    file_list = tmp_path / "chunk_000000"
+    file_list.write_text("".join(f"{corpus / name}\n" for name in PAPERS), encoding="utf-8")
+    cache = tmp_path / "cache.sqlite"
+
+    fresh = run_keyword_search(file_list, tmp_path / "fresh", False)
+    first = run_keyword_search(file_list, tmp_path / "first", False, cache_path=cache)
+    assert first == fresh
+    assert cache_stats(tmp_path / "first") == {"Cache hits": 0, "Cache partial hits": 0, "Cache misses": 3}
+
+    second = run_keyword_search(file_list, tmp_path / "second", False, cache_path=cache)
+    assert second == fresh
+    assert cache_stats(tmp_path / "second") == {"Cache hits": 3, "Cache partial hits": 0, "Cache misses": 0}
+
+    changed = corpus / "b.txt"
+    changed.write_text("Now about bioavailability and Cmax.\n", encoding="utf-8")
+    os.utime(changed, (1_800_000_000, 1_800_000_000))
+    third = run_keyword_search(file_list, tmp_path / "third", False, cache_path=cache)
+    assert third == run_keyword_search(file_list, tmp_path / "fresh_again", False)
+    assert str(changed) in third
+    assert cache_stats(tmp_path / "third") == {"Cache hits": 2, "Cache partial hits": 0, "Cache misses": 1}
+
+
+def test_query_then_full_scan_reuses_cached_terms(tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    for name, text in PAPERS.items():
+        (corpus / name).write_text(text, encoding="utf-8")
+    file_list = tmp_path / "chunk_000000"
+    file_list.write_text("".join(f"{corpus / name}\n" for name in PAPERS), encoding="utf-8")
+    cache = tmp_path / "cache.sqlite"
+
+    queried = run_keyword_search(file_list, tmp_path / "query", False, cache_path=cache, query="compartment")
+    assert set(queried) == {str(corpus / "a.txt")}
+    full = run_keyword_search(file_list, tmp_path / "full", False, cache_path=cache)
+    assert full == run_keyword_search(file_list, tmp_path / "fresh", False)
@@ -0,0 +1,102 @@
+"""Shards written by the move stage read back byte for byte through their index offsets."""
+
+import io
+import os
+import tarfile
+
+import pytest
+
+import shard_reader
+from keyword_filter import PK_KEYWORDS, KeywordMatcher
+from keyword_filter_runner import load_file_list
+from shard_reader import ShardMember, read_member, scan_member_forms, shard_available
+from shard_store import ShardWriter
+
+PAPERS = {
+    "/data/a/one.txt": b"A two-compartment pharmacokinetic model.\n",
+    "/data/b/empty.txt": b"",
+    "/data/b/block.txt": b"x" * tarfile.BLOCKSIZE,  # exactly one block: no padding
+    "/data/c/long.txt": ("clearance " * 300 + "été\n").encode("utf-8"),
+}
+
+
+def write_shard(directory, name="chunk_000000"):
+    with ShardWriter(directory, name) as shard:
+        for mtime, (remote_path, data) in enumerate(PAPERS.items(), start=1_700_000_000):
+            member = tarfile.TarInfo(remote_path.lstrip("/"))
+            member.size = len(data)
+            member.mtime = mtime
+            shard.add(remote_path, member, io.BytesIO(data))
+    return shard
+
+
+def file_list_from_index(shard, tmp_path):
+    """Index rows with the shard column made absolute, as ``_1_prepare_inputs.sh`` writes them."""
+    rows = []
+    for line in shard.index_path.read_text(encoding="utf-8").splitlines():
+        fields = line.split("\t")
+        fields[1] = str(shard.path.parent / fields[1])
+        rows.append("\t".join(fields) + "\n")
+    file_list = tmp_path / "chunk_000000"
+    file_list.write_text("".join(rows), encoding="utf-8")
+    return file_list
+
+
+def test_members_read_back_from_their_offsets(tmp_path):
+    shard = write_shard(tmp_path)
+    assert not list(tmp_path.glob(".*.part"))
+    members = load_file_list(file_list_from_index(shard, tmp_path))
+
+    assert [member.path for member in members] == list(PAPERS)
+    for member in members:
+        assert isinstance(member, ShardMember)
+        assert shard_available(member)
+        assert read_member(member) == PAPERS[member.path]
+    # The shard is still an ordinary tar
+    with tarfile.open(shard.path) as archive:
+        assert {name: archive.extractfile(name).read() for name in archive.getnames()} == {
+            path.lstrip("/"): data for path, data in PAPERS.items()
+        }
+
+
+def test_member_scan_matches_whole_text_search(tmp_path):
+    shard = write_shard(tmp_path)
+    matcher = KeywordMatcher(PK_KEYWORDS)
+    for member in load_file_list(file_list_from_index(shard, tmp_path)):
+        text = PAPERS[member.path].decode("utf-8")
+        assert matcher.results_for(scan_member_forms(member, matcher)) == matcher.search(text)
+
+
+def test_failed_shard_is_not_committed(tmp_path):
+    with pytest.raises(RuntimeError):
+        with ShardWriter(tmp_path, "chunk_000001") as shard:
+            member = tarfile.TarInfo("data/x.txt")
+            member.size = 3
+            shard.add("/data/x.txt", member, io.BytesIO(b"abc"))
+            raise RuntimeError("stream broke")
+    assert os.listdir(tmp_path) == []
+
+
+def test_truncated_shard_raises(tmp_path):
+    shard = write_shard(tmp_path, "chunk_000002")
+    members = load_file_list(file_list_from_index(shard, tmp_path))
+    long = members[-1]
+    with open(shard.path, "r+b") as handle:
+        handle.truncate(long.offset + 10)
+    shard_reader._map_shard.cache_clear()
+    with pytest.raises(OSError):
+        read_member(long)
+
+
+def test_missing_shard_is_opened_once(tmp_path, monkeypatch):
+    opened = []
+    real_map = shard_reader._map_shard
+
+    def counting_map(shard):
+        opened.append(shard)
+        return real_map(shard)
+
+    monkeypatch.setattr(shard_reader, "_map_shard", counting_map)
+    missing = [ShardMember(f"/data/{index}.txt", str(tmp_path / "gone.tar"), 512 * index, 10, 0) for index in range(5)]
+    assert not any(shard_available(member) for member in missing)
+    assert opened == [str(tmp_path / "gone.tar")]
@@ -0,0 +1,48 @@
+"""Index queries must return what a full scan of the same files returns."""
+
+import random
+
+import pytest
+
+from keyword_filter import PK_KEYWORDS
+from keyword_filter_runner import run_keyword_search
+from term_index import build_shard, run_index_query
+
+
+def write_corpus(root, count, seed=0):
+    rng = random.Random(seed)
+    terms = [term for terms in PK_KEYWORDS.values() for term in terms]
+    filler = ["the", "dose", "model", "PKs", "compartments", "volume", "of", "ſ", "ı", "été"]
+    paths = []
+    for index in range(count):
+        words = []
+        for _ in range(rng.randint(0, 25)):
+            word = rng.choice(terms) if rng.random() < 0.3 else rng.choice(filler)
+            if rng.random() < 0.3:
+                word = word.upper()
+            words.append(word + rng.choice([" ", ", ", "\n", "-", "/"]))
+        path = root / f"paper_{index:03d}.txt"
+        path.write_text("".join(words), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+@pytest.mark.parametrize("case_sensitive", [False, True])
+def test_index_query_matches_full_scan(tmp_path, case_sensitive):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    paths = write_corpus(corpus, 120)
+    lists = []
+    for number, start in enumerate(range(0, len(paths), 50)):
+        file_list = tmp_path / f"chunk_{number:06d}"
+        file_list.write_text("".join(f"{path}\n" for path in paths[start : start + 50]), encoding="utf-8")
+        lists.append(file_list)
+        build_shard(file_list, tmp_path / "index" / f"shard_{file_list.name}", window_size=64)
+
+    scanned = {}
+    for file_list in lists:
+        scanned.update(run_keyword_search(file_list, tmp_path / "scan" / file_list.name, case_sensitive))
+    indexed = run_index_query(tmp_path / "index", tmp_path / "query", PK_KEYWORDS, case_sensitive, window_size=64)
+
+    assert scanned
+    assert indexed == scanned
@@ -0,0 +1,119 @@
+"""Manifests and the per-chunk transfer ledger survive a write/read round trip and drive reruns."""
+
+import os
+
+import pytest
+
+from transfer_ledger import LedgerEntry, TransferLedger, read_manifest
+
+# Runs the "remote" command locally: enough for compress_pull_extract's pipe mode
+STANDIN_SSH = """#!/bin/bash
+while [ $# -gt 1 ]; do shift; done
+exec bash -c "$1"
+"""
+
+
+def test_read_manifest_keeps_order_metadata_and_first_duplicate(tmp_path):
+    manifest = tmp_path / "chunk.txt"
+    manifest.write_text(
+        "# written by _1_prepare_inputs.sh\n"
+        "/data/b.txt\t120\t1700000000.5\n"
+        "\n"
+        "/data/a.txt\n"
+        "/data/b.txt\t999\t1\n"
+        "  /data/c d.txt  \t7\t1700000001\n",
+        encoding="utf-8",
+    )
+    assert read_manifest(str(manifest)) == {
+        "/data/b.txt": ("120", "1700000000.5"),
+        "/data/a.txt": None,
+        "/data/c d.txt": ("7", "1700000001"),
+    }
+
+
+def test_ledger_round_trip(tmp_path):
+    path = tmp_path / "ledgers" / "chunk.tsv"
+    manifest = {"/data/a.txt": ("10", "100"), "/data/b.txt": ("20", "200"), "/data/plain.txt": None}
+    ledger = TransferLedger(path)
+    ledger.record({"/data/a.txt": "data___a.txt", "/data/b.txt": "data___b_1.txt", "/data/plain.txt": "p.txt"}, manifest)
+
+    reloaded = TransferLedger(path)
+    assert reloaded.entries == {
+        "/data/a.txt": LedgerEntry("10", "100", "data___a.txt"),
+        "/data/b.txt": LedgerEntry("20", "200", "data___b_1.txt"),
+    }
+    # The rewrite goes through a temporary file that is renamed into place
+    assert os.listdir(path.parent) == ["chunk.tsv"]
+
+    present = {"data___a.txt", "data___b_1.txt"}
+    assert reloaded.is_current("/data/a.txt", ("10", "100"), present)
+    assert not reloaded.is_current("/data/a.txt", ("11", "100"), present)  # changed size
+    assert not reloaded.is_current("/data/a.txt", ("10", "101"), present)  # changed mtime
+    assert not reloaded.is_current("/data/b.txt", ("20", "200"), {"data___a.txt"})  # local copy gone
+    assert not reloaded.is_current("/data/plain.txt", None, present)  # no metadata to compare
+    assert not reloaded.is_current("/data/new.txt", ("1", "1"), present)
+
+
+def test_ledger_record_updates_entries(tmp_path):
+    path = tmp_path / "chunk.tsv"
+    ledger = TransferLedger(path)
+    ledger.record({"/data/a.txt": "data___a.txt"}, {"/data/a.txt": ("10", "100")})
+    ledger.record({"/data/a.txt": "data___a.txt"}, {"/data/a.txt": ("12", "150")})
+    assert TransferLedger(path).entries == {"/data/a.txt": LedgerEntry("12", "150", "data___a.txt")}
+
+
+@pytest.fixture
+def standin_ssh(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    ssh = bin_dir / "ssh"
+    ssh.write_text(STANDIN_SSH, encoding="utf-8")
+    ssh.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+
+def write_remote_manifest(tmp_path, files):
+    lines = []
+    for path in files:
+        stat = path.stat()
+        lines.append(f"{path}\t{stat.st_size}\t{stat.st_mtime}\n")
+    manifest = tmp_path / "chunk_000000"
+    manifest.write_text("".join(lines), encoding="utf-8")
+    return str(manifest)
+
+
+def test_rerun_sends_only_changed_files(tmp_path, standin_ssh):
+    from compress_pull_extract import compress_pull_extract
+
+    remote = tmp_path / "remote"
+    remote.mkdir()
+    files = [remote / f"paper_{index}.txt" for index in range(3)]
+    for index, path in enumerate(files):
+        path.write_text(f"paper {index}\n", encoding="utf-8")
+    output = tmp_path / "out"
+    stats = tmp_path / "stats.txt"
+
+    def transfer():
+        compress_pull_extract(
+            hostname="standin",
+            username="check",
+            key_filename="/dev/null",
+            file_list_path=write_remote_manifest(tmp_path, files),
+            local_output_dir=str(output),
+            transfer_mode="pipe",
+            ssh_multiplex=False,
+            stats_file=str(stats),
+        )
+        return stats.read_text(encoding="utf-8")
+
+    assert "Files sent: 3" in transfer()
+    assert "Files sent: 0" in transfer()
+
+    files[1].write_text("paper 1, revised\n", encoding="utf-8")
+    os.utime(files[1], (1_800_000_000, 1_800_000_000))
+    assert "Files sent: 1" in transfer()
+
+    local = sorted(name for name in os.listdir(output) if not name.startswith("."))
+    assert len(local) == 3  # the changed file replaced its old copy instead of landing as name_1
+    revised = [name for name in local if name.endswith("paper_1.txt")]
+    assert (output / revised[0]).read_text(encoding="utf-8") == "paper 1, revised\n"